@@ -1,7 +1,7 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from flask_mail import Message
+from flask_mail import Mail, Message
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta, date
 from flask import request, jsonify, make_response, send_file
@@ -12,19 +12,42 @@ import json
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
 import shutil
+import tempfile
 import zipfile
 import platform
 import time
 import math
+import random
+import uuid
+import bisect
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import click
+import logging
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from collections import deque, namedtuple
+from array import array
+import html
+import hmac
+import copy
+import sys
+import atexit
 from sqlalchemy import func, extract, text
 import csv
 import io
-from flask import send_from_directory, Response
+from flask import send_from_directory, Response, stream_with_context
+from flask.logging import default_handler
 from functools import wraps
-from sqlalchemy import func, or_, and_, text, extract
+from sqlalchemy import func, or_, and_, text, extract, case
 from sqlalchemy import desc, asc
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import Session as SQLAlchemySession
+from sqlalchemy import event, type_coerce
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
 import pandas as pd
+import numpy as np
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.units import inch
@@ -51,6 +74,8 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///cuea_mindconnect.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+app.config['SETTINGS_CACHE_TTL'] = 300  # seconds before cached settings are reloaded
+app.config['SETTINGS_VERSION_CHECK_INTERVAL'] = 5  # seconds between cross-process version checks, 0 disables
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -137,17 +162,17 @@ class Counselor(UserMixin, db.Model):
             method='pbkdf2:sha256',
             salt_length=8
         )
-        print(f"🔐 Password set for {self.username} with hash: {self.password_hash[:30]}...")
+        app.logger.debug("Password set for counselor %s", self.id)
 
     def check_password(self, password):
         """FIXED password checking method - ensures consistency"""
         from werkzeug.security import check_password_hash
         if not self.password_hash:
-            print(f"⚠️ No password hash found for {self.username}")
+            app.logger.warning("No password hash stored for counselor %s", self.id)
             return False
         
         result = check_password_hash(self.password_hash, password)
-        print(f"🔍 Password check for {self.username}: {result}")
+        app.logger.debug("Password check for counselor %s: %s", self.id, result)
         return result
     
     def get_id(self):
@@ -205,6 +230,9 @@ class CounselorScheduleBlock(db.Model):
 class AppointmentReminder(db.Model):
     """Model for appointment reminders"""
     __tablename__ = 'appointment_reminder'
+    __table_args__ = (
+        db.Index('ix_appointment_reminder_sent_time', 'sent', 'reminder_time'),  # due-reminder scan
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     appointment_id = db.Column(db.Integer, db.ForeignKey('appointment_request.id'), nullable=False)
@@ -218,7 +246,7 @@ class AppointmentReminder(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    appointment = db.relationship('AppointmentRequest', backref='reminders')        
+    appointment = db.relationship('AppointmentRequest', backref=db.backref('reminders', cascade='all, delete-orphan'))
   
 
 
@@ -439,28 +467,102 @@ class SystemSettings(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+SETTINGS_VERSION_KEY = '_settings_version'
+
+# In-process settings cache, shared by all threads of this worker
+_settings_cache = {
+    'values': None,
+    'version': None,
+    'loaded_at': 0.0,
+    'checked_at': 0.0,
+    'hits': 0,
+    'misses': 0
+}
+_settings_cache_lock = threading.Lock()
+
+def _load_settings_cache(now):
+    """Reload every setting into the cache with a single SELECT"""
+    rows = db.session.query(SystemSettings.name, SystemSettings.value).all()
+    values = dict(rows)
+    _settings_cache['values'] = values
+    _settings_cache['version'] = values.get(SETTINGS_VERSION_KEY)
+    _settings_cache['loaded_at'] = now
+    _settings_cache['checked_at'] = now
+
+def _settings_cache_values():
+    """Return the cached settings, reloading them when stale or invalidated"""
+    now = time.monotonic()
+    ttl = app.config.get('SETTINGS_CACHE_TTL', 300)
+    check_interval = app.config.get('SETTINGS_VERSION_CHECK_INTERVAL', 5)
+
+    with _settings_cache_lock:
+        if _settings_cache['values'] is None or now - _settings_cache['loaded_at'] >= ttl:
+            _settings_cache['misses'] += 1
+            _load_settings_cache(now)
+        elif check_interval and now - _settings_cache['checked_at'] >= check_interval:
+            # Another worker may have changed a setting; compare version counters
+            version = db.session.query(SystemSettings.value).filter_by(name=SETTINGS_VERSION_KEY).scalar()
+            if version != _settings_cache['version']:
+                _settings_cache['misses'] += 1
+                _load_settings_cache(now)
+            else:
+                _settings_cache['hits'] += 1
+                _settings_cache['checked_at'] = now
+        else:
+            _settings_cache['hits'] += 1
+        return _settings_cache['values']
+
+def invalidate_settings_cache():
+    """Drop this worker's cached settings so the next read reloads them"""
+    with _settings_cache_lock:
+        _settings_cache['values'] = None
+        _settings_cache['version'] = None
+
+def _bump_settings_version():
+    """Increment the version counter row so other workers reload their cache"""
+    version = SystemSettings.query.filter_by(name=SETTINGS_VERSION_KEY).first()
+    if version:
+        try:
+            version.value = str(int(version.value or 0) + 1)
+        except ValueError:
+            version.value = '1'
+        version.updated_at = datetime.utcnow()
+    else:
+        db.session.add(SystemSettings(name=SETTINGS_VERSION_KEY, value='1'))
+
 def get_setting(name, default=None):
     """Get a system setting value"""
     try:
-        setting = SystemSettings.query.filter_by(name=name).first()
-        return setting.value if setting else default
+        return _settings_cache_values().get(name, default)
     except:
         return default
 
-def set_setting(name, value):
-    """Set a system setting value"""
+def set_settings(values):
+    """Set several system settings in one transaction"""
     try:
-        setting = SystemSettings.query.filter_by(name=name).first()
-        if setting:
-            setting.value = str(value)
-            setting.updated_at = datetime.utcnow()
-        else:
-            setting = SystemSettings(name=name, value=str(value))
-            db.session.add(setting)
+        existing = {
+            setting.name: setting
+            for setting in SystemSettings.query.filter(SystemSettings.name.in_(list(values.keys()))).all()
+        }
+        for name, value in values.items():
+            setting = existing.get(name)
+            if setting:
+                setting.value = str(value)
+                setting.updated_at = datetime.utcnow()
+            else:
+                setting = SystemSettings(name=name, value=str(value))
+                db.session.add(setting)
+        _bump_settings_version()
         db.session.commit()
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Error setting {name}: {str(e)}")
+        app.logger.error(f"Error saving settings {', '.join(values.keys())}: {str(e)}")
+    finally:
+        invalidate_settings_cache()
+
+def set_setting(name, value):
+    """Set a system setting value"""
+    set_settings({name: value})
 
 class WellnessResource(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -537,6 +639,36 @@ def validate_cuea_email(email):
     """Validate that email is from CUEA domain"""
     return email.endswith('@cuea.edu') or email.endswith('@student.cuea.edu')
 
+def day_range(first_day, last_day=None):
+    """Return the half-open [start, end) datetimes covering first_day..last_day inclusive"""
+    if isinstance(first_day, datetime):
+        first_day = first_day.date()
+    if last_day is None:
+        last_day = first_day
+    elif isinstance(last_day, datetime):
+        last_day = last_day.date()
+    start = datetime.combine(first_day, datetime.min.time())
+    end = datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+    return start, end
+
+def datetime_range_filter(column, start, end):
+    """Half-open range predicate (start <= column < end) that can use an index on column"""
+    return and_(column >= start, column < end)
+
+def day_range_filter(column, first_day, last_day=None):
+    """Match DateTime values falling on first_day..last_day (a single day by default).
+
+    Use this instead of func.date(column) == day, which wraps the column in a
+    function and stops SQLite from using an index on it.
+    """
+    start, end = day_range(first_day, last_day)
+    return datetime_range_filter(column, start, end)
+
+def hour_range_filter(column, moment):
+    """Match DateTime values in the same clock hour as moment"""
+    start = moment.replace(minute=0, second=0, microsecond=0)
+    return datetime_range_filter(column, start, start + timedelta(hours=1))
+
 def role_required(role):
     """Decorator to require specific roles"""
     def decorator(f):
@@ -705,48 +837,62 @@ def format_file_size(size_bytes):
     s = round(size_bytes / p, 2)
     return f"{s} {size_names[i]}"
 
-def get_comprehensive_health_data():
-    """Get comprehensive system health data"""
+def get_comprehensive_health_data(refresh=False):
+    """Get comprehensive system health data from the sampler's latest snapshot.
+
+    With refresh=True the checks are run now (concurrently, with deadlines)
+    instead of reading the last background sample.
+    """
     try:
         overall_status = "HEALTHY"
         critical_alerts = []
         warnings = []
         
+        snapshot = health_sampler.refresh() if refresh else health_sampler.latest()
+        checks = snapshot['checks']
+        sampled_at = snapshot['sampled_at'].strftime('%H:%M:%S')
+        
         # Basic system info
         uptime = get_system_uptime()
-        active_connections = get_active_connections()
-        last_check = datetime.utcnow().strftime('%H:%M:%S')
+        active_connections = checks['active_connections']
+        last_check = sampled_at
         
         # Health checks
-        database_health = check_database_health()
-        server_health = check_server_health()
-        memory_health = check_memory_health()
-        disk_health = check_disk_health()
-        network_health = check_network_health()
-        backup_health = check_backup_health()
+        database_health = checks['database']
+        server_health = checks['server']
+        memory_health = checks['memory']
+        disk_health = checks['disk']
+        network_health = checks['network']
+        backup_health = checks['backup']
         
         # Check for issues
         if server_health['cpu_usage'] > 80:
             warnings.append({
                 'message': f"High CPU usage: {server_health['cpu_usage']}%",
-                'timestamp': datetime.utcnow().strftime('%H:%M:%S')
+                'timestamp': sampled_at
             })
         
         if memory_health['usage_percent'] > 85:
             warnings.append({
                 'message': f"High memory usage: {memory_health['usage_percent']}%",
-                'timestamp': datetime.utcnow().strftime('%H:%M:%S')
+                'timestamp': sampled_at
             })
         
         if disk_health['usage_percent'] > 90:
             critical_alerts.append({
                 'message': f"Critical disk space: {disk_health['usage_percent']}% used",
-                'timestamp': datetime.utcnow().strftime('%H:%M:%S')
+                'timestamp': sampled_at
             })
         elif disk_health['usage_percent'] > 80:
             warnings.append({
                 'message': f"Low disk space: {disk_health['usage_percent']}% used",
-                'timestamp': datetime.utcnow().strftime('%H:%M:%S')
+                'timestamp': sampled_at
+            })
+        
+        for name in snapshot['timed_out']:
+            warnings.append({
+                'message': f"Health check '{name}' missed its deadline; showing the last known value",
+                'timestamp': sampled_at
             })
         
         # Determine overall status
@@ -780,7 +926,9 @@ def get_comprehensive_health_data():
             'version': '1.0.0',
             'python_version': platform.python_version(),
             'db_version': 'SQLite 3.x',
-            'server_time': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
+            'server_time': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC'),
+            'sampled_at': snapshot['sampled_at'].isoformat(),
+            'sample_duration_ms': snapshot['duration_ms']
         }
         
     except Exception as e:
@@ -835,7 +983,9 @@ def check_server_health():
     """Check server CPU and process health"""
     if PSUTIL_AVAILABLE:
         try:
-            cpu_usage = psutil.cpu_percent(interval=1)
+            # Non-blocking: utilisation since the previous call, which the
+            # health sampler makes every HEALTH_SAMPLE_SECONDS
+            cpu_usage = psutil.cpu_percent(interval=None)
             
             try:
                 load_avg = os.getloadavg()[0]
@@ -1012,11 +1162,14 @@ def check_network_health():
     try:
         import socket
         
+        host, port = app.config['HEALTH_NETWORK_PROBE']
         try:
-            socket.create_connection(("8.8.8.8", 53), timeout=3)
-            status = "healthy"
-            status_class = "healthy"
-            latency = "< 50"
+            started = time.perf_counter()
+            with socket.create_connection((host, port), timeout=app.config['HEALTH_CHECK_TIMEOUTS']['network']):
+                latency_ms = (time.perf_counter() - started) * 1000
+            status = "healthy" if latency_ms < 300 else "warning"
+            status_class = status
+            latency = f"{latency_ms:.0f}"
         except (socket.timeout, socket.error):
             status = "warning"
             status_class = "warning"
@@ -1113,88 +1266,59 @@ def add_password_changed_column_to_counselor():
             print(f"⚠️ Error adding password_changed column: {str(e)}")
 
 def get_active_connections():
-    """Get number of active database/user connections"""
-    try:
-        one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-        active_users = User.query.filter(User.last_login >= one_hour_ago).count()
-        return active_users
-    except:
-        return 12  # Fallback
+    """Requests in progress plus connected event streams, for this process"""
+    return requests_in_flight() + len(event_hub.subscribers)
 
-def get_recent_system_logs():
-    """Get recent system logs"""
+def get_recent_system_logs(limit=50):
+    """Most recent entries from the system log, newest first"""
     try:
-        # Sample log entries 
-        logs = [
-            {
-                'timestamp': (datetime.utcnow() - timedelta(minutes=2)).strftime('%H:%M:%S'),
-                'level': 'info',
-                'message': 'User authentication successful'
-            },
-            {
-                'timestamp': (datetime.utcnow() - timedelta(minutes=5)).strftime('%H:%M:%S'),
-                'level': 'info',
-                'message': 'Health check completed successfully'
-            },
-            {
-                'timestamp': (datetime.utcnow() - timedelta(minutes=8)).strftime('%H:%M:%S'),
-                'level': 'info',
-                'message': 'Database backup completed'
-            },
-            {
-                'timestamp': (datetime.utcnow() - timedelta(minutes=15)).strftime('%H:%M:%S'),
-                'level': 'warning',
-                'message': 'High memory usage detected: 78%'
-            },
-            {
-                'timestamp': (datetime.utcnow() - timedelta(minutes=30)).strftime('%H:%M:%S'),
-                'level': 'info',
-                'message': 'New user registration: student@cuea.edu'
-            },
-            {
-                'timestamp': (datetime.utcnow() - timedelta(hours=1)).strftime('%H:%M:%S'),
-                'level': 'info',
-                'message': 'Scheduled maintenance completed'
-            },
-            {
-                'timestamp': (datetime.utcnow() - timedelta(hours=2)).strftime('%H:%M:%S'),
-                'level': 'error',
-                'message': 'Failed login attempt from suspicious IP'
-            }
-        ]
-        
-        return logs
-        
-    except Exception:
+        return [dict(entry, timestamp=entry['ts'][11:19]) for entry in tail_system_log(limit)]
+    except Exception as e:
+        app.logger.error(f"Error reading system log: {str(e)}")
         return []
 
 def get_performance_metrics():
-    """Get system performance metrics"""
+    """Get system performance metrics from the request profiler"""
     try:
-        # Calculate metrics 
-        avg_response_time = 250  # ms
-        response_time_percent = min(100, (avg_response_time / 1000) * 100)
+        summary = request_profiler.summary()
         
-        error_rate = 0.5  # percentage
+        avg_response_time = summary['avg_response_time']  # ms
+        response_time_percent = min(100, (avg_response_time / 1000) * 100)
         
-        requests_per_minute = 120
+        requests_per_minute = summary['requests_per_minute']
         throughput_percent = min(100, (requests_per_minute / 200) * 100)
         
         return {
             'avg_response_time': avg_response_time,
             'response_time_percent': response_time_percent,
-            'error_rate': error_rate,
+            'p50_response_time': summary['p50_response_time'],
+            'p95_response_time': summary['p95_response_time'],
+            'p99_response_time': summary['p99_response_time'],
+            'error_rate': summary['error_rate'],
             'requests_per_minute': requests_per_minute,
-            'throughput_percent': throughput_percent
+            'throughput_percent': throughput_percent,
+            'total_requests': summary['total_requests'],
+            'endpoints': request_profiler.endpoint_stats(limit=10),
+            'slow_requests': [
+                {key: value for key, value in entry.items() if key != 'queries'}
+                for entry in list(request_profiler.slow_requests)[:10]
+            ]
         }
         
-    except Exception:
+    except Exception as e:
+        app.logger.error(f"Error reading performance metrics: {str(e)}")
         return {
-            'avg_response_time': 250,
-            'response_time_percent': 25,
-            'error_rate': 0.5,
-            'requests_per_minute': 120,
-            'throughput_percent': 60
+            'avg_response_time': 0,
+            'response_time_percent': 0,
+            'p50_response_time': 0,
+            'p95_response_time': 0,
+            'p99_response_time': 0,
+            'error_rate': 0,
+            'requests_per_minute': 0,
+            'throughput_percent': 0,
+            'total_requests': 0,
+            'endpoints': [],
+            'slow_requests': []
         }
 
 def get_fallback_health_data():
@@ -1266,6 +1390,159 @@ def get_fallback_health_data():
         'server_time': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
     }
 
+# =============================================================================
+# HEALTH SAMPLER
+# =============================================================================
+
+app.config.setdefault('HEALTH_SAMPLE_SECONDS', 30)
+app.config.setdefault('HEALTH_SAMPLER_ENABLED', True)
+app.config.setdefault('HEALTH_NETWORK_PROBE', ('8.8.8.8', 53))
+# Checks left out of the periodic passes and run only by a manual check; the network probe
+# dials an outside host, which every worker would otherwise do every HEALTH_SAMPLE_SECONDS.
+# Set to () to opt in to periodic network probing
+app.config.setdefault('HEALTH_ON_DEMAND_CHECKS', ('network',))
+# Per-check deadlines in seconds; a check that misses its deadline keeps its previous value
+app.config.setdefault('HEALTH_CHECK_TIMEOUTS', {
+    'database': 2.0,
+    'server': 1.0,
+    'memory': 1.0,
+    'disk': 1.0,
+    'network': 3.0,
+    'backup': 2.0,
+    'active_connections': 2.0
+})
+
+HEALTH_CHECKS = {
+    'database': check_database_health,
+    'server': check_server_health,
+    'memory': check_memory_health,
+    'disk': check_disk_health,
+    'network': check_network_health,
+    'backup': check_backup_health,
+    'active_connections': get_active_connections
+}
+
+
+class HealthSampler:
+    """Background thread that runs the health checks on a fixed interval.
+
+    Pages and AJAX refreshes read the latest snapshot instead of running
+    the checks inline. Each pass runs the collectors concurrently in a
+    small thread pool and waits for each only until its own deadline; a
+    check that is late keeps its previous value and is reported in
+    'timed_out'. Checks in HEALTH_ON_DEMAND_CHECKS only run on refresh();
+    periodic passes carry their last result forward.
+    """
+
+    def __init__(self, checks):
+        self.checks = checks
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stopping = threading.Event()
+        self.snapshot = None
+        # Room for a second pass while a slow check from the previous one finishes
+        self.executor = ThreadPoolExecutor(max_workers=2 * len(checks), thread_name_prefix='health-check')
+        if PSUTIL_AVAILABLE:
+            psutil.cpu_percent(interval=None)  # prime the non-blocking CPU counter
+
+    def start(self):
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self._run, name='health-sampler', daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join(timeout)
+
+    def _run_check(self, check):
+        with app.app_context():
+            started = time.perf_counter()
+            result = check()
+            return result, round((time.perf_counter() - started) * 1000, 2)
+
+    def collect(self, include_on_demand=False):
+        """Run the checks concurrently and store the result as the new snapshot"""
+        started = time.perf_counter()
+        sampled_at = datetime.utcnow()
+        timeouts = app.config['HEALTH_CHECK_TIMEOUTS']
+        skipped = () if include_on_demand else app.config['HEALTH_ON_DEMAND_CHECKS']
+        futures = {name: self.executor.submit(self._run_check, check)
+                   for name, check in self.checks.items() if name not in skipped}
+
+        previous = self.snapshot['checks'] if self.snapshot else {}
+        results, durations, timed_out = {}, {}, []
+        for name in self.checks:
+            if name not in futures:
+                results[name] = previous.get(name) or self._unchecked_result(name)
+        for name, future in futures.items():
+            remaining = started + timeouts.get(name, 2.0) - time.perf_counter()
+            try:
+                results[name], durations[name] = future.result(timeout=max(0.0, remaining))
+            except FutureTimeoutError:
+                timed_out.append(name)
+                results[name] = self._stale_result(name, previous.get(name))
+            except Exception as e:
+                app.logger.error(f"Health check '{name}' failed: {str(e)}")
+                results[name] = self._stale_result(name, previous.get(name))
+
+        snapshot = {
+            'checks': results,
+            'sampled_at': sampled_at,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'check_durations_ms': durations,
+            'timed_out': timed_out
+        }
+        self.snapshot = snapshot
+        record_health_metrics(snapshot)
+        return snapshot
+
+    @staticmethod
+    def _unchecked_result(name):
+        return dict(get_fallback_health_data()[name], status='Not Checked', status_class='offline')
+
+    @staticmethod
+    def _stale_result(name, previous):
+        if previous is None:
+            previous = get_fallback_health_data()[name]
+        if isinstance(previous, dict):
+            return dict(previous, status='Timeout', status_class='warning')
+        return previous
+
+    def latest(self):
+        """The most recent snapshot; sampled on the spot before the first pass completes"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            snapshot = self.collect()
+        return snapshot
+
+    def refresh(self):
+        return self.collect(include_on_demand=True)
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                snapshot = self.collect()
+                if snapshot['timed_out']:
+                    app.logger.warning(f"Health checks past deadline: {', '.join(snapshot['timed_out'])}")
+            except Exception as e:
+                app.logger.error(f"Health sampling failed: {str(e)}")
+            self.stopping.wait(app.config['HEALTH_SAMPLE_SECONDS'])
+
+
+health_sampler = HealthSampler(HEALTH_CHECKS)
+
+
+@app.before_request
+def start_health_sampler():
+    """Start sampling with the first request so CLI commands don't spawn it"""
+    if app.config['HEALTH_SAMPLER_ENABLED'] and not (health_sampler.thread and health_sampler.thread.is_alive()):
+        health_sampler.start()
+
+
 def fix_database_schema():
     """Fix database schema issues"""
     with app.app_context():
@@ -1576,107 +1853,1708 @@ def initialize_existing_system():
     return True
 
 # =============================================================================
-# MAINTENANCE MODE MIDDLEWARE
+# SYSTEM LOG
 # =============================================================================
 
+app.config.setdefault('SYSTEM_LOG', os.path.join(app.instance_path, 'system.log'))
+app.config.setdefault('SYSTEM_LOG_MAX_BYTES', 50 * 1024 * 1024)
+app.config.setdefault('SYSTEM_LOG_BACKUPS', 5)
+app.config.setdefault('SYSTEM_LOG_LEVEL', os.environ.get('MINDCONNECT_LOG_LEVEL', 'INFO').upper())
+app.config.setdefault('SYSTEM_LOG_CONSOLE', True)  # also echo records to stderr, from the listener thread
+app.config.setdefault('LOG_QUEUE_SIZE', 10000)  # records beyond this are dropped rather than blocking a request
+app.config.setdefault('LOG_REDACT', True)
+# Share of requests whose DEBUG records are kept; changed at runtime from the health page
+app.config.setdefault('LOG_DEBUG_SAMPLE_RATE', float(os.environ.get('MINDCONNECT_DEBUG_SAMPLE_RATE', 0) or 0))
+
+LOG_LEVELS = ('debug', 'info', 'warning', 'error', 'critical')
+LOG_TIMESTAMP = slice(7, 30)  # every line starts with {"ts":"YYYY-MM-DDTHH:MM:SS.mmm"
+LOG_READ_BLOCK = 64 * 1024
+DEBUG_SAMPLE_RATE_SETTING = 'debug_log_sample_rate'
+
+LOG_REDACTIONS = [
+    (re.compile(r'(?i)\b(password|passwd|pwd|secret|token|api[_-]?key)(\s*[=:]\s*)\S+'), r'\1\2[REDACTED]'),
+    (re.compile(r'(?i)\bbearer\s+[\w.~+/-]+=*'), 'Bearer [REDACTED]'),
+    (re.compile(r'\b([A-Za-z0-9._%+-])[A-Za-z0-9._%+-]*@([A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,})\b'), r'\1***@\2'),
+    (re.compile(r'(?<![\w+])\+\d{1,3}[\s-]?\d{2,4}[\s-]?\d{3}[\s-]?\d{3,4}\b'), '[PHONE]')
+]
+
+log_state = {
+    'debug_sample_rate': app.config['LOG_DEBUG_SAMPLE_RATE'],
+    'applied_setting': None,
+    'dropped': 0
+}
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the endpoint, path and user of the request that logged them"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.endpoint = request.endpoint
+            record.method = request.method
+            record.path = request.path
+            # Read the already-loaded user only; going through current_user here
+            # could run the user loader, which logs, from inside a log call
+            user = g.get('_login_user')
+            record.user_id = user.get_id() if user is not None and user.is_authenticated else None
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One compact JSON object per line, "ts" first, so the tail reader can
+    range-check and pre-filter lines without parsing them"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}',
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key in ('endpoint', 'method', 'path', 'user_id'):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, separators=(',', ':'), default=str)
+
+
+class DebugSampleFilter(logging.Filter):
+    """Keep DEBUG records for a sample of requests: all of a sampled request's, none of the others"""
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = log_state['debug_sample_rate']
+        if rate >= 1:
+            return True
+        if not has_request_context():
+            return random.random() < rate
+        sampled = g.get('log_debug_sampled')
+        if sampled is None:
+            sampled = g.log_debug_sampled = random.random() < rate
+        return sampled
+
+
+def redact_log_text(value):
+    """`value` with passwords, tokens, email addresses and phone numbers masked"""
+    for pattern, replacement in LOG_REDACTIONS:
+        value = pattern.sub(replacement, value)
+    return value
+
+
+class RedactionFilter(logging.Filter):
+    """Mask passwords, tokens, email addresses and phone numbers in the rendered message.
+
+    Tracebacks are redacted by StructuredQueueHandler.prepare, once they are rendered.
+    """
+
+    def filter(self, record):
+        record.msg, record.args = redact_log_text(record.getMessage()), None
+        record.redact = True
+        return True
+
+
+class StructuredQueueHandler(QueueHandler):
+    """Hands records to the listener thread, which does the formatting and file I/O.
+
+    The message and traceback are rendered here on the request thread, so
+    the listener never touches request-bound objects. A full queue drops the
+    record and counts it instead of blocking the request.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if record.exc_text and getattr(record, 'redact', False):
+            # Exception messages (SQLAlchemy bound parameters, SMTP replies) carry PII too
+            record.exc_text = redact_log_text(record.exc_text)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_state['dropped'] += 1
+
+
+def configure_system_log():
+    """Route the app logger through a queue to the JSON-lines file and the console.
+
+    Returns the file handler (or None when the log file can't be opened).
+    """
+    handlers = []
+    file_handler = None
+    path = app.config.get('SYSTEM_LOG')
+    if path:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file_handler = RotatingFileHandler(path, maxBytes=app.config['SYSTEM_LOG_MAX_BYTES'],
+                                               backupCount=app.config['SYSTEM_LOG_BACKUPS'], encoding='utf-8')
+            file_handler.setFormatter(JsonLinesFormatter())
+            handlers.append(file_handler)
+        except OSError as e:
+            app.logger.warning(f"System log disabled: {str(e)}")
+    if app.config['SYSTEM_LOG_CONSOLE']:
+        console_handler = logging.StreamHandler(sys.stderr)
+        console_handler.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s in %(module)s: %(message)s'))
+        handlers.append(console_handler)
+    if not handlers:
+        return None
+
+    queue_handler = StructuredQueueHandler(queue.Queue(app.config['LOG_QUEUE_SIZE']))
+    queue_handler.addFilter(DebugSampleFilter())
+    queue_handler.addFilter(RequestContextFilter())
+    if app.config['LOG_REDACT']:
+        queue_handler.addFilter(RedactionFilter())
+
+    listener = QueueListener(queue_handler.queue, *handlers)
+    listener.start()
+    atexit.register(listener.stop)  # drain what is still queued
+    log_state['listener'] = listener
+
+    app.logger.removeHandler(default_handler)  # the console handler above replaces Flask's synchronous one
+    app.logger.addHandler(queue_handler)
+    apply_debug_sample_rate(log_state['debug_sample_rate'])
+    return file_handler
+
+
+def _restart_log_listener():
+    """Listener threads don't survive a fork (gunicorn --preload); start a fresh one in the child"""
+    listener = log_state.get('listener')
+    if listener is not None:
+        log_state['listener'] = QueueListener(listener.queue, *listener.handlers)
+        log_state['listener'].start()
+
+
+def system_log_queue_size():
+    listener = log_state.get('listener')
+    return listener.queue.qsize() if listener is not None else 0
+
+
+def apply_debug_sample_rate(rate):
+    """Switch sampled DEBUG output on (rate > 0) or off for this process"""
+    rate = min(max(float(rate), 0.0), 1.0)
+    log_state['debug_sample_rate'] = rate
+    app.logger.setLevel(logging.DEBUG if rate > 0 else app.config['SYSTEM_LOG_LEVEL'])
+    return rate
+
+
+system_log_handler = configure_system_log()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_log_listener)
+
+
 @app.before_request
-def check_maintenance_mode():
-    """Check if maintenance mode is enabled"""
-    # Skip maintenance check for admin routes and static files
-    if (request.endpoint and 
-        (request.endpoint.startswith('admin') or 
-         request.endpoint.startswith('static') or
-         request.endpoint in ['admin_login', 'logout'])):
+def sync_debug_sample_rate():
+    """Pick up a sample rate changed by another worker (settings are cached, so this is a dict lookup)"""
+    value = get_setting(DEBUG_SAMPLE_RATE_SETTING)
+    if value is not None and value != log_state['applied_setting']:
+        log_state['applied_setting'] = value
+        try:
+            apply_debug_sample_rate(value)
+        except ValueError:
+            pass
+
+
+def system_log_files():
+    """The active log file followed by its rotated backups, newest first"""
+    path = app.config['SYSTEM_LOG']
+    candidates = [path] + [f"{path}.{index}" for index in range(1, app.config['SYSTEM_LOG_BACKUPS'] + 1)]
+    return [candidate for candidate in candidates if os.path.exists(candidate)]
+
+
+def _line_start_after(handle, offset):
+    """Offset of the first line starting at or after `offset`"""
+    if offset == 0:
+        return 0
+    handle.seek(offset - 1)
+    handle.readline()
+    return handle.tell()
+
+
+def _offset_after_time(handle, size, key):
+    """Offset of the first line with a timestamp later than `key`, by bisecting the file.
+
+    Lines are appended in time order, so this is O(log size) seeks.
+    """
+    low, high = 0, size
+    while low < high:
+        middle = (low + high) // 2
+        handle.seek(_line_start_after(handle, middle))
+        line = handle.readline()
+        if not line or line[LOG_TIMESTAMP] > key:
+            high = middle
+        else:
+            low = middle + 1
+    return _line_start_after(handle, low)
+
+
+def _read_lines_backward(handle, end):
+    """Yield complete lines before byte offset `end`, last line first"""
+    position = end
+    remainder = b''
+    while position > 0:
+        size = min(LOG_READ_BLOCK, position)
+        position -= size
+        handle.seek(position)
+        lines = (handle.read(size) + remainder).split(b'\n')
+        remainder = lines[0]
+        for line in reversed(lines[1:]):
+            if line:
+                yield line
+    if remainder:
+        yield remainder
+
+
+def _log_time_key(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S.%f')[:23].encode() if value else None
+
+
+def tail_system_log(limit=100, levels=None, endpoint=None, since=None, until=None, files=None):
+    """Yield log entries newest first, reading the files backwards from the end.
+
+    Only the blocks holding the returned entries are read: `until` is found
+    by bisecting the file, scanning stops at the first line older than
+    `since`, and level/endpoint filters are checked on the raw bytes before
+    a line is parsed. `since` and `until` are naive UTC datetimes.
+    """
+    levels = {level.lower() for level in levels} if levels else None
+    level_tokens = [f'"level":"{level}"'.encode() for level in levels] if levels else None
+    endpoint_token = f'"endpoint":{json.dumps(endpoint)}'.encode() if endpoint else None
+    since_key, until_key = _log_time_key(since), _log_time_key(until)
+
+    found = 0
+    for path in (files if files is not None else system_log_files()):
+        try:
+            handle = open(path, 'rb')
+        except OSError:
+            continue  # rotated away since it was listed
+        with handle:
+            size = os.fstat(handle.fileno()).st_size
+            end = _offset_after_time(handle, size, until_key) if until_key else size
+            for line in _read_lines_backward(handle, end):
+                if since_key and line[LOG_TIMESTAMP] < since_key:
+                    return
+                if level_tokens and not any(token in line for token in level_tokens):
+                    continue
+                if endpoint_token and endpoint_token not in line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if (levels and entry.get('level') not in levels) or (endpoint and entry.get('endpoint') != endpoint):
+                    continue
+                yield entry
+                found += 1
+                if limit and found >= limit:
+                    return
+
+
+def clear_system_log_files():
+    """Truncate the active log and delete its rotated backups; returns bytes removed"""
+    removed = 0
+    if system_log_handler is None:
+        return removed
+    system_log_handler.acquire()
+    try:
+        for path in system_log_files()[1:]:
+            removed += os.path.getsize(path)
+            os.remove(path)
+        if system_log_handler.stream:
+            system_log_handler.stream.flush()
+            removed += system_log_handler.stream.tell()
+            system_log_handler.stream.seek(0)
+            system_log_handler.stream.truncate()
+    finally:
+        system_log_handler.release()
+    return removed
+
+
+@app.cli.command('benchmark-log-tail')
+@click.option('--size-mb', type=int, default=512, help='Size of the synthetic log file.')
+@click.option('--repeat', type=int, default=5, help='Best-of-N timing.')
+def benchmark_log_tail_command(size_mb, repeat):
+    """Time tail queries against a synthetic JSON-lines log of the given size."""
+    formatter = JsonLinesFormatter()
+    lines = []
+    for index in range(2000):
+        level = logging.ERROR if index % 97 == 0 else logging.WARNING if index % 13 == 0 else logging.INFO
+        record = logging.LogRecord('mindconnect', level, __file__, 0, 'Request handled in %d ms', (index % 250,), None)
+        record.endpoint = ('dashboard', 'api_student_appointments', 'community', 'admin_system_health')[index % 4]
+        record.method, record.path = 'GET', '/'
+        lines.append(formatter.format(record))
+    # One chunk of lines is written repeatedly with a later timestamp each time,
+    # so the file stays in time order
+    chunk = ''.join(line[:LOG_TIMESTAMP.start] + '@TS@' + line[LOG_TIMESTAMP.stop:] + '\n' for line in lines)
+    chunk_size = len(chunk.replace('@TS@', '2026-01-01T00:00:00.000').encode())
+    chunks = max(1, size_mb * 1024 * 1024 // chunk_size)
+    started = datetime(2026, 1, 1)
+
+    workdir = tempfile.mkdtemp(prefix='mindconnect-logbench-')
+    path = os.path.join(workdir, 'system.log')
+    try:
+        click.echo(f"📝 Writing {chunks * chunk_size / 1024 ** 2:.0f} MB to {path}...")
+        with open(path, 'w', encoding='utf-8') as handle:
+            for index in range(chunks):
+                stamp = (started + timedelta(seconds=index)).strftime('%Y-%m-%dT%H:%M:%S.000')
+                handle.write(chunk.replace('@TS@', stamp))
+        last = started + timedelta(seconds=chunks - 1)
+
+        cases = [
+            ('last 100', {}),
+            ('last 100 errors', {'levels': ['error']}),
+            ('last 50 for one endpoint', {'limit': 50, 'endpoint': 'community'}),
+            ('since last 2 seconds', {'limit': 0, 'since': last - timedelta(seconds=1)}),
+            ('100 before the midpoint', {'until': started + timedelta(seconds=chunks // 2)})
+        ]
+        for label, options in cases:
+            options = dict({'limit': 100}, **options)
+            timings = []
+            for _ in range(repeat):
+                begin = time.perf_counter()
+                count = sum(1 for _ in tail_system_log(files=[path], **options))
+                timings.append(time.perf_counter() - begin)
+            click.echo(f"   {label:<26} {min(timings) * 1000:8.3f} ms  ({count} entries)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@app.cli.command('benchmark-request-logging')
+@click.option('--requests', 'count', type=int, default=200, help='Timed requests per page and mode.')
+def benchmark_request_logging_command(count):
+    """Time the dashboards with file logging on the request thread vs through the queue."""
+    with app.app_context():
+        student = User.query.filter_by(role='student', is_active=True).first()
+        admin = User.query.filter_by(role='admin', is_active=True).first()
+        log_state['applied_setting'] = get_setting(DEBUG_SAMPLE_RATE_SETTING)
+    pages = [(user.id, url) for user, url in ((student, '/dashboard'), (admin, '/admin-dashboard')) if user]
+    if not pages:
+        click.echo("❌ Needs an active student or admin account to log in as")
         return
-    
-    # Check if maintenance mode is enabled
-    if get_setting('maintenance_mode', 'false') == 'true':
-        # Only allow admin users
-        if not current_user.is_authenticated or (hasattr(current_user, 'role') and current_user.role != 'admin'):
-            return render_template('maintenance.html'), 503
+
+    workdir = tempfile.mkdtemp(prefix='mindconnect-logbench-')
+    file_handler = logging.FileHandler(os.path.join(workdir, 'system.log'), encoding='utf-8')
+    file_handler.setFormatter(JsonLinesFormatter())
+    sync_handler = logging.FileHandler(os.path.join(workdir, 'system-sync.log'), encoding='utf-8')
+    sync_handler.setFormatter(JsonLinesFormatter())
+    queue_handler = StructuredQueueHandler(queue.Queue(app.config['LOG_QUEUE_SIZE']))
+    for handler in (sync_handler, queue_handler):
+        handler.addFilter(DebugSampleFilter())
+        handler.addFilter(RequestContextFilter())
+        handler.addFilter(RedactionFilter())
+    modes = [
+        ('on request thread, debug on', sync_handler, 1.0),
+        ('queued, debug off', queue_handler, 0.0),
+        ('queued, debug 10%', queue_handler, 0.1),
+        ('queued, debug on', queue_handler, 1.0)
+    ]
+
+    def time_page(client, url):
+        for _ in range(5):
+            client.get(url)
+        timings = []
+        for _ in range(count):
+            begin = time.perf_counter()
+            client.get(url)
+            timings.append(time.perf_counter() - begin)
+        results.extend(sorted(timings))
+
+    saved_handlers, saved_rate = list(app.logger.handlers), log_state['debug_sample_rate']
+    listener = QueueListener(queue_handler.queue, file_handler)
+    listener.start()
+    try:
+        for user_id, url in pages:
+            client = app.test_client()
+            with client.session_transaction() as client_session:
+                client_session['_user_id'] = str(user_id)
+                client_session['_fresh'] = True
+            click.echo(f"📊 {url}")
+            for label, handler, rate in modes:
+                app.logger.handlers[:] = [handler]
+                apply_debug_sample_rate(rate)
+                # CLI commands run inside an app context that test requests would reuse
+                # (sharing g and the db session); a fresh thread gives each request its own
+                results = []
+                worker = threading.Thread(target=time_page, args=(client, url))
+                worker.start()
+                worker.join()
+                click.echo(f"   {label:<28} mean {sum(results) / len(results) * 1000:7.2f} ms"
+                           f"   p95 {results[int(len(results) * 0.95)] * 1000:7.2f} ms")
+    finally:
+        app.logger.handlers[:] = saved_handlers
+        apply_debug_sample_rate(saved_rate)
+        listener.stop()
+        file_handler.close()
+        sync_handler.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
 
 # =============================================================================
-# INITIALIZATION FUNCTIONS
+# REQUEST PROFILING
 # =============================================================================
 
-def create_tables_if_not_exist():
-    """Create settings table and set defaults"""
-    with app.app_context():
-        try:
-            db.create_all()
-            
-            # Set default settings if they don't exist
-            default_settings = {
-                'platform_name': 'CUEA MindConnect',
-                'system_email': 'admin@cuea.edu',
-                'email_notifications': 'true',
-                'registration_alerts': 'true',
-                'appointment_reminders': 'true',
-                'min_password_length': '8',
-                'require_special_chars': 'true',
-                'session_timeout': '60',
-                'require_2fa': 'false',
-                'enable_forum': 'true',
-                'enable_assessments': 'true',
-                'enable_appointments': 'true',
-                'allow_anonymous': 'true',
-                'allow_registration': 'true',
-                'show_crisis_resources': 'true',
-                'auto_backup': 'true',
-                'maintenance_mode': 'false'
+app.config.setdefault('PROFILING_ENABLED', True)
+app.config.setdefault('PROFILING_WINDOW', 1000)  # latest samples kept per endpoint for percentiles
+app.config.setdefault('SLOW_REQUEST_MS', 500)  # requests slower than this go to the slow-request log
+app.config.setdefault('SLOW_REQUEST_LOG', os.path.join(app.instance_path, 'slow_requests.log'))
+app.config.setdefault('SLOW_REQUEST_MAX_QUERIES', 50)  # statements kept per request for the slow log
+
+slow_request_logger = logging.getLogger('mindconnect.slow_requests')
+slow_request_logger.setLevel(logging.INFO)
+slow_request_logger.propagate = False
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class RequestProfiler:
+    """In-memory rolling latency/SQL statistics per endpoint.
+
+    Each endpoint keeps its latest PROFILING_WINDOW samples; percentiles are
+    computed from that window when read, so recording stays O(1).
+    """
+
+    def __init__(self, window=1000, slow_history=50):
+        self.window = window
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.endpoints = {}
+        self.recent = deque(maxlen=10000)  # (finished_at, is_error) for throughput and error rate
+        self.slow_requests = deque(maxlen=slow_history)
+
+    def record(self, endpoint, method, status, wall_ms, query_count, sql_ms):
+        now = time.time()
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = {
+                    'count': 0,
+                    'errors': 0,
+                    'methods': set(),
+                    'samples': deque(maxlen=self.window),
+                    'max_ms': 0.0
+                }
+            stats['count'] += 1
+            stats['errors'] += 1 if status >= 500 else 0
+            stats['methods'].add(method)
+            stats['samples'].append((wall_ms, query_count, sql_ms))
+            stats['max_ms'] = max(stats['max_ms'], wall_ms)
+            self.recent.append((now, status >= 500))
+
+    def record_slow(self, entry):
+        with self.lock:
+            self.slow_requests.appendleft(entry)
+
+    def endpoint_stats(self, limit=None, sort_by='p95_ms'):
+        with self.lock:
+            snapshot = [
+                (endpoint, stats['count'], stats['errors'], sorted(stats['methods']), list(stats['samples']), stats['max_ms'])
+                for endpoint, stats in self.endpoints.items()
+            ]
+
+        rows = []
+        for endpoint, count, errors, methods, samples, max_ms in snapshot:
+            latencies = sorted(sample[0] for sample in samples)
+            rows.append({
+                'endpoint': endpoint,
+                'methods': methods,
+                'count': count,
+                'errors': errors,
+                'p50_ms': round(percentile(latencies, 50), 1),
+                'p95_ms': round(percentile(latencies, 95), 1),
+                'p99_ms': round(percentile(latencies, 99), 1),
+                'max_ms': round(max_ms, 1),
+                'avg_queries': round(sum(sample[1] for sample in samples) / len(samples), 1),
+                'avg_sql_ms': round(sum(sample[2] for sample in samples) / len(samples), 1)
+            })
+        if sort_by not in ('count', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'avg_queries', 'avg_sql_ms'):
+            sort_by = 'p95_ms'
+        rows.sort(key=lambda row: row[sort_by], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def summary(self, window_seconds=60):
+        """Overall latency, error rate and throughput, as shown on the system health page."""
+        now = time.time()
+        with self.lock:
+            latencies = sorted(
+                sample[0]
+                for stats in self.endpoints.values()
+                for sample in stats['samples']
+            )
+            total = sum(stats['count'] for stats in self.endpoints.values())
+            errors = sum(stats['errors'] for stats in self.endpoints.values())
+            recent = [is_error for finished_at, is_error in self.recent if finished_at >= now - window_seconds]
+
+        # Until a full window has elapsed, scale by the time we have actually been up
+        elapsed = min(window_seconds, max(now - self.started_at, 1))
+        return {
+            'total_requests': total,
+            'avg_response_time': round(sum(latencies) / len(latencies), 1) if latencies else 0,
+            'p50_response_time': round(percentile(latencies, 50), 1),
+            'p95_response_time': round(percentile(latencies, 95), 1),
+            'p99_response_time': round(percentile(latencies, 99), 1),
+            'error_rate': round(errors / total * 100, 2) if total else 0,
+            'requests_per_minute': round(len(recent) * 60 / elapsed, 1)
+        }
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+            self.recent.clear()
+            self.slow_requests.clear()
+            self.started_at = time.time()
+
+
+request_profiler = RequestProfiler(app.config['PROFILING_WINDOW'])
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _profile_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('profile_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _profile_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('profile_query_start')
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    sql_query_duration.observe((sql_operation(statement),), elapsed_ms / 1000)
+    if not has_request_context():
+        return
+    profile = g.get('request_profile')
+    if profile is None:
+        return
+    profile['query_count'] += 1
+    profile['sql_ms'] += elapsed_ms
+    if app.config['N_PLUS_ONE_DETECTION']:
+        record_statement_shape(profile, statement)
+    if len(profile['queries']) < app.config['SLOW_REQUEST_MAX_QUERIES']:
+        profile['queries'].append((statement, elapsed_ms))
+
+
+def _configure_slow_request_log():
+    if slow_request_logger.handlers or not app.config.get('SLOW_REQUEST_LOG'):
+        return
+    try:
+        os.makedirs(os.path.dirname(app.config['SLOW_REQUEST_LOG']), exist_ok=True)
+        handler = RotatingFileHandler(app.config['SLOW_REQUEST_LOG'], maxBytes=5 * 1024 * 1024, backupCount=3)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        slow_request_logger.addHandler(handler)
+    except OSError as e:
+        app.logger.warning(f"Slow request log disabled: {str(e)}")
+
+
+@app.before_request
+def start_request_profile():
+    """Start timing the request and collecting its SQL statements"""
+    if app.config['PROFILING_ENABLED'] or app.config['N_PLUS_ONE_DETECTION']:
+        g.request_profile = {'started': time.perf_counter(), 'query_count': 0, 'sql_ms': 0.0, 'queries': []}
+
+
+@app.after_request
+def finish_request_profile(response):
+    """Record the request in the profiler and log it if it was slow"""
+    profile = g.pop('request_profile', None)
+    if profile is None:
+        return response
+
+    if app.config['N_PLUS_ONE_DETECTION']:
+        report_n_plus_one(profile)
+
+    if not app.config['PROFILING_ENABLED']:
+        return response
+
+    try:
+        wall_ms = (time.perf_counter() - profile['started']) * 1000
+        endpoint = request.endpoint or 'unmatched'
+        request_profiler.record(endpoint, request.method, response.status_code, wall_ms, profile['query_count'], profile['sql_ms'])
+        metrics_store.record('requests', 1.0)
+        record_request_metrics(endpoint, request.method, response.status_code, wall_ms, profile['query_count'])
+        if response.status_code >= 500:
+            metrics_store.record('errors', 1.0)
+
+        if wall_ms >= app.config['SLOW_REQUEST_MS']:
+            entry = {
+                'timestamp': datetime.utcnow().isoformat(),
+                'endpoint': endpoint,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'wall_ms': round(wall_ms, 1),
+                'query_count': profile['query_count'],
+                'sql_ms': round(profile['sql_ms'], 1),
+                'queries': [
+                    {'statement': ' '.join(statement.split()), 'ms': round(ms, 2)}
+                    for statement, ms in profile['queries']
+                ]
             }
-            
-            for name, value in default_settings.items():
-                if not SystemSettings.query.filter_by(name=name).first():
-                    setting = SystemSettings(name=name, value=value)
-                    db.session.add(setting)
-            
-            db.session.commit()
-            print("✅ Settings initialized successfully!")
-            
-        except Exception as e:
-            db.session.rollback()
-            print(f"❌ Error initializing settings: {str(e)}")
+            request_profiler.record_slow(entry)
+            _configure_slow_request_log()
+            slow_request_logger.info(json.dumps(entry))
+    except Exception as e:
+        app.logger.error(f"Error recording request profile: {str(e)}")
+
+    return response
 
-# Initialize on import
-#create_tables_if_not_exist()
 
 # =============================================================================
-# ADDITIONAL UTILITY ROUTES
+# METRICS TIME SERIES
 # =============================================================================
 
-@app.route('/api/system/status')
-def system_status():
-    """Public endpoint to check system status"""
-    maintenance_mode = get_setting('maintenance_mode', 'false') == 'true'
-    return jsonify({
-        'maintenance_mode': maintenance_mode,
-        'status': 'maintenance' if maintenance_mode else 'operational',
-        'timestamp': datetime.utcnow().isoformat()
-    })
+# (seconds per bucket, buckets kept): 1m for a day, 5m for a week, 1h for 90 days
+app.config.setdefault('METRICS_RESOLUTIONS', ((60, 1440), (300, 2016), (3600, 2160)))
+app.config.setdefault('METRICS_MAX_POINTS', 720)  # finest resolution that fits in this many points is used
+
+# name: (kind, unit). Gauges keep avg/min/max per bucket, counters a sum per bucket
+METRIC_DEFINITIONS = {
+    'cpu': ('gauge', '%'),
+    'memory': ('gauge', '%'),
+    'disk': ('gauge', '%'),
+    'db_response_time': ('gauge', 'ms'),
+    'requests': ('counter', 'req'),
+    'errors': ('counter', 'req')
+}
+
+# Series the history API can return; request_rate and error_rate are derived from the counters
+HISTORY_METRICS = {
+    'cpu': '%',
+    'memory': '%',
+    'disk': '%',
+    'db_response_time': 'ms',
+    'request_rate': 'req/min',
+    'error_rate': '%'
+}
+
+
+class RingSeries:
+    """One metric at one resolution: a fixed ring of `slots` buckets `step` seconds wide.
+
+    Every slot records the absolute bucket number it holds, so a slot left
+    over from an earlier lap of the ring reads as empty and is reset on the
+    next write, as in RRDtool. Columns are flat `array` buffers (five
+    doubles per slot); reads index them through zero-copy NumPy views.
+    """
+
+    def __init__(self, step, slots):
+        self.step = step
+        self.slots = slots
+        self.buckets = array('q', [-1]) * slots
+        self.counts = array('d', [0.0]) * slots
+        self.sums = array('d', [0.0]) * slots
+        self.mins = array('d', [0.0]) * slots
+        self.maxs = array('d', [0.0]) * slots
+
+    def add(self, timestamp, value):
+        bucket = int(timestamp // self.step)
+        slot = bucket % self.slots
+        if self.buckets[slot] != bucket:
+            self.buckets[slot] = bucket
+            self.counts[slot] = 1.0
+            self.sums[slot] = self.mins[slot] = self.maxs[slot] = value
+            return
+        self.counts[slot] += 1.0
+        self.sums[slot] += value
+        if value < self.mins[slot]:
+            self.mins[slot] = value
+        if value > self.maxs[slot]:
+            self.maxs[slot] = value
+
+    def read(self, start, end):
+        """Bucket start times plus count/sum/min/max arrays for [start, end]; empty buckets are NaN"""
+        last = int(end // self.step)
+        first = max(int(start // self.step), last - self.slots + 1)
+        wanted = np.arange(first, last + 1, dtype=np.int64)
+        index = wanted % self.slots
+        present = np.frombuffer(self.buckets, dtype=np.int64)[index] == wanted
+
+        def column(values):
+            return np.where(present, np.frombuffer(values, dtype=np.float64)[index], np.nan)
+
+        return wanted * self.step, column(self.counts), column(self.sums), column(self.mins), column(self.maxs)
+
+
+class MetricsStore:
+    """Embedded time-series store: every sample is folded into each resolution as it arrives"""
+
+    def __init__(self, definitions, resolutions):
+        self.definitions = definitions
+        self.resolutions = tuple(step for step, _ in resolutions)
+        self.retention = {step: step * slots for step, slots in resolutions}
+        self.lock = threading.Lock()
+        self.series = {name: {step: RingSeries(step, slots) for step, slots in resolutions} for name in definitions}
+
+    def record(self, name, value, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            for ring in self.series[name].values():
+                ring.add(timestamp, value)
+
+    def resolution_for(self, start, end, max_points):
+        """Finest resolution that still holds `start` and fits the range in max_points buckets"""
+        for step in self.resolutions:
+            if (end - start) / step <= max_points and time.time() - start <= self.retention[step]:
+                return step
+        return self.resolutions[-1]
+
+    def read(self, name, start, end, step):
+        """(timestamps, values) for a counter (sum per bucket, 0 when empty) or (timestamps, avg, min, max) for a gauge"""
+        with self.lock:
+            timestamps, counts, sums, mins, maxs = self.series[name][step].read(start, end)
+        if self.definitions[name][0] == 'counter':
+            return timestamps, np.nan_to_num(sums)
+        return timestamps, sums / counts, mins, maxs
+
+
+metrics_store = MetricsStore(METRIC_DEFINITIONS, app.config['METRICS_RESOLUTIONS'])
+
+
+def record_health_metrics(snapshot):
+    """Feed a health sampler snapshot into the time-series store"""
+    checks = snapshot['checks']
+    timestamp = time.time()
+    samples = []
+    # Without psutil these checks only report placeholder numbers, so they are not stored
+    if PSUTIL_AVAILABLE:
+        samples += [('cpu', checks['server'], 'cpu_usage'),
+                    ('memory', checks['memory'], 'usage_percent'),
+                    ('disk', checks['disk'], 'usage_percent')]
+    samples.append(('db_response_time', checks['database'], 'response_time'))
+    for name, result, key in samples:
+        # Late or failed checks carry their last known value, which is already stored
+        if result.get('status') in ('Timeout', 'Error'):
+            continue
+        metrics_store.record(name, float(result[key]), timestamp)
+
+
+def _series_values(values):
+    return [None if value != value else round(value, 2) for value in values.tolist()]
+
+
+def get_metrics_history(names, start, end, step=None):
+    """Downsampled history of the HISTORY_METRICS series in `names` between two epoch times"""
+    if step not in metrics_store.resolutions:
+        step = metrics_store.resolution_for(start, end, app.config['METRICS_MAX_POINTS'])
+
+    series = {}
+    timestamps = None
+    for name in names:
+        if name in ('request_rate', 'error_rate'):
+            timestamps, requests = metrics_store.read('requests', start, end, step)
+            if name == 'request_rate':
+                series[name] = {'avg': _series_values(requests * 60 / step)}
+            else:
+                _, errors = metrics_store.read('errors', start, end, step)
+                rate = np.divide(errors * 100, requests, out=np.full(len(requests), np.nan), where=requests > 0)
+                series[name] = {'avg': _series_values(rate)}
+        else:
+            timestamps, average, minimum, maximum = metrics_store.read(name, start, end, step)
+            series[name] = {'avg': _series_values(average), 'min': _series_values(minimum), 'max': _series_values(maximum)}
+        series[name]['unit'] = HISTORY_METRICS[name]
 
-@app.route('/admin/system-health/refresh')
+    return {
+        'step': step,
+        'start': start,
+        'end': end,
+        'timestamps': timestamps.tolist() if timestamps is not None else [],
+        'series': series
+    }
+
+
+@app.route('/admin/system-health/history')
 @login_required
 @role_required('admin')
-def refresh_health_data():
-    """Refresh health data for AJAX updates"""
+def admin_metrics_history():
+    """Time-series history for the health page charts.
+
+    ?metrics=cpu,memory&range=3600 (seconds back from now), or explicit
+    ?start=&end= epoch seconds; &step=60|300|3600 forces a resolution.
+    """
     try:
-        health_data = get_comprehensive_health_data()
-        return jsonify({
-            'success': True,
-            'health_data': health_data
-        })
+        names = [name for name in request.args.get('metrics', ','.join(HISTORY_METRICS)).split(',') if name]
+        unknown = [name for name in names if name not in HISTORY_METRICS]
+        if unknown:
+            return jsonify({'success': False, 'message': f"Unknown metrics: {', '.join(unknown)}"}), 400
+
+        end = request.args.get('end', type=float) or time.time()
+        start = request.args.get('start', type=float) or end - request.args.get('range', 3600, type=float)
+        if start >= end:
+            return jsonify({'success': False, 'message': 'start must be before end'}), 400
+
+        history = get_metrics_history(names, start, end, request.args.get('step', type=int))
+        return jsonify({'success': True, **history})
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        app.logger.error(f"Error reading metrics history: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to load metrics history'}), 500
 
-@app.route('/admin/system-health/export')
-@login_required
-@role_required('admin')
-def export_health_report():
-    """Export system health report"""
-    try:
-        health_data = get_comprehensive_health_data()
-        
+
+# =============================================================================
+# PROMETHEUS METRICS
+# =============================================================================
+
+# /metrics needs this bearer token or a signed-in admin; METRICS_PUBLIC opts in to anonymous scrapes
+app.config.setdefault('METRICS_TOKEN', os.environ.get('MINDCONNECT_METRICS_TOKEN'))
+app.config.setdefault('METRICS_PUBLIC', os.environ.get('MINDCONNECT_METRICS_PUBLIC', '').lower() in ('1', 'true', 'yes'))
+app.config.setdefault('METRICS_GAUGE_TTL', 15)  # seconds the domain gauges (COUNT queries) are cached between scrapes
+
+PROMETHEUS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+PROCESS_STARTED_AT = time.time()
+
+
+def _prometheus_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def _prometheus_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class PrometheusCounter:
+    """Monotonic counter keyed by a tuple of label values"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, labels=(), amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def expose(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_prometheus_labels(self.labelnames, labels)} {_prometheus_value(value)}"
+                     for labels, value in items)
+        return lines
+
+
+class PrometheusHistogram:
+    """Histogram with fixed buckets; observe() is a bisect plus two increments"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=PROMETHEUS_LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.values = {}  # labels -> [count per bucket..., count above the last bucket, sum]
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def expose(self):
+        with self.lock:
+            items = sorted((labels, list(state)) for labels, state in self.values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ('le',)
+        for labels, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), state[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_prometheus_labels(names, labels + (_prometheus_value(bound),))} {cumulative}")
+            label_text = _prometheus_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_prometheus_value(state[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+def _prometheus_gauge(name, documentation, samples, labelnames=()):
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    lines.extend(f"{name}{_prometheus_labels(labelnames, labels)} {_prometheus_value(value)}" for labels, value in samples)
+    return lines
+
+
+http_requests_total = PrometheusCounter(
+    'mindconnect_http_requests_total', 'HTTP requests handled, by endpoint, method and status.',
+    ('endpoint', 'method', 'status'))
+http_request_duration = PrometheusHistogram(
+    'mindconnect_http_request_duration_seconds', 'Wall-clock request latency by endpoint.',
+    ('endpoint', 'method'))
+http_request_sql_queries = PrometheusCounter(
+    'mindconnect_http_request_sql_queries_total', 'SQL statements issued while handling requests, by endpoint.',
+    ('endpoint',))
+sql_query_duration = PrometheusHistogram(
+    'mindconnect_sql_query_duration_seconds', 'SQL statement execution time by operation.',
+    ('operation',), PROMETHEUS_SQL_BUCKETS)
+
+_requests_in_flight = {'count': 0}
+_requests_in_flight_lock = threading.Lock()
+
+_domain_gauge_cache = {'values': None, 'loaded_at': 0.0, 'hits': 0, 'misses': 0}
+_domain_gauge_cache_lock = threading.Lock()
+
+
+def sql_operation(statement):
+    operation = statement.lstrip()[:6].lower()
+    return operation if operation in ('select', 'insert', 'update', 'delete') else 'other'
+
+
+def record_request_metrics(endpoint, method, status, wall_ms, query_count):
+    http_requests_total.inc((endpoint, method, str(status)))
+    http_request_duration.observe((endpoint, method), wall_ms / 1000)
+    if query_count:
+        http_request_sql_queries.inc((endpoint,), query_count)
+
+
+@app.before_request
+def track_request_in_flight():
+    with _requests_in_flight_lock:
+        _requests_in_flight['count'] += 1
+    g.in_flight = True
+
+
+@app.teardown_request
+def untrack_request_in_flight(exception=None):
+    if g.pop('in_flight', False):
+        with _requests_in_flight_lock:
+            _requests_in_flight['count'] -= 1
+
+
+def requests_in_flight():
+    return _requests_in_flight['count']
+
+
+def get_domain_gauges():
+    """Queue depth and moderation backlog, recomputed at most every METRICS_GAUGE_TTL seconds.
+
+    Each value is an index-only COUNT (status and is_flagged are indexed), and
+    the cache keeps a burst of scrapes from repeating them.
+    """
+    now = time.monotonic()
+    with _domain_gauge_cache_lock:
+        if _domain_gauge_cache['values'] is not None and now - _domain_gauge_cache['loaded_at'] < app.config['METRICS_GAUGE_TTL']:
+            _domain_gauge_cache['hits'] += 1
+            return _domain_gauge_cache['values']
+
+        _domain_gauge_cache['misses'] += 1
+        values = {
+            'notification_jobs': notification_queue_counts(),
+            'pending_appointments': db.session.query(func.count(AppointmentRequest.id))
+                .filter(AppointmentRequest.status == 'pending').scalar() or 0,
+            'flagged_posts': db.session.query(func.count(ForumPost.id))
+                .filter(ForumPost.is_flagged == True).scalar() or 0
+        }
+        _domain_gauge_cache['values'] = values
+        _domain_gauge_cache['loaded_at'] = now
+        return values
+
+
+def app_cache_stats():
+    """(hits, misses) for each in-process cache"""
+    return {
+        'settings': (_settings_cache['hits'], _settings_cache['misses']),
+        'crisis_phrases': (crisis_detector.phrase_cache_hits, crisis_detector.phrase_cache_misses),
+        'metrics_gauges': (_domain_gauge_cache['hits'], _domain_gauge_cache['misses'])
+    }
+
+
+def database_size_bytes():
+    path = db.engine.url.database
+    total = 0
+    for suffix in ('', '-wal'):
+        try:
+            total += os.path.getsize(path + suffix)
+        except (OSError, TypeError):
+            pass
+    return total
+
+
+def render_prometheus_metrics():
+    """Everything above in the Prometheus text exposition format (0.0.4)"""
+    lines = []
+    for metric in (http_requests_total, http_request_duration, http_request_sql_queries, sql_query_duration):
+        lines.extend(metric.expose())
+
+    lines.extend(_prometheus_gauge('mindconnect_http_requests_in_flight',
+                                   'Requests currently being handled by this process.', [((), requests_in_flight())]))
+    lines.extend(_prometheus_gauge('mindconnect_sse_clients',
+                                   'Server-sent event streams connected to this process.', [((), len(event_hub.subscribers))]))
+    lines.extend(_prometheus_gauge('mindconnect_database_size_bytes',
+                                   'SQLite database file size, including the WAL.', [((), database_size_bytes())]))
+    lines.extend(_prometheus_gauge('mindconnect_process_start_time_seconds',
+                                   'Start time of this process since the Unix epoch.', [((), PROCESS_STARTED_AT)]))
+
+    try:
+        gauges = get_domain_gauges()
+        lines.extend(_prometheus_gauge('mindconnect_notification_jobs', 'Notification jobs by status.',
+                                       [((status,), count) for status, count in sorted(gauges['notification_jobs'].items())],
+                                       ('status',)))
+        lines.extend(_prometheus_gauge('mindconnect_appointment_requests_pending',
+                                       'Appointment requests waiting for assignment.', [((), gauges['pending_appointments'])]))
+        lines.extend(_prometheus_gauge('mindconnect_forum_posts_flagged',
+                                       'Forum posts flagged for moderation.', [((), gauges['flagged_posts'])]))
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error collecting metrics gauges: {str(e)}")
+
+    stats = app_cache_stats()
+    cache_labels = ('cache',)
+    lines.extend(['# HELP mindconnect_cache_hits_total In-process cache hits.', '# TYPE mindconnect_cache_hits_total counter'])
+    lines.extend(f"mindconnect_cache_hits_total{_prometheus_labels(cache_labels, (name,))} {hits}" for name, (hits, _) in stats.items())
+    lines.extend(['# HELP mindconnect_cache_misses_total In-process cache misses.', '# TYPE mindconnect_cache_misses_total counter'])
+    lines.extend(f"mindconnect_cache_misses_total{_prometheus_labels(cache_labels, (name,))} {misses}" for name, (_, misses) in stats.items())
+    lines.extend(_prometheus_gauge('mindconnect_cache_hit_ratio', 'Hit ratio of each in-process cache since start.',
+                                   [((name,), round(hits / (hits + misses), 4) if hits + misses else 0)
+                                    for name, (hits, misses) in stats.items()], cache_labels))
+    return '\n'.join(lines) + '\n'
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    if not app.config.get('METRICS_PUBLIC'):
+        token = app.config.get('METRICS_TOKEN')
+        # Compared as bytes: compare_digest rejects str with non-ASCII characters
+        token_ok = bool(token) and hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                                       f'Bearer {token}'.encode())
+        admin_ok = current_user.is_authenticated and getattr(current_user, 'role', None) == 'admin'
+        if not (token_ok or admin_ok):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain',
+                            headers={'WWW-Authenticate': 'Bearer realm="metrics"'})
+    return Response(render_prometheus_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# =============================================================================
+# N+1 QUERY DETECTION
+# =============================================================================
+
+# Opt-in: set MINDCONNECT_DETECT_N_PLUS_ONE=1 (or the config key) in development and CI
+app.config.setdefault('N_PLUS_ONE_DETECTION', os.environ.get('MINDCONNECT_DETECT_N_PLUS_ONE', '').lower() in ('1', 'true', 'yes'))
+app.config.setdefault('N_PLUS_ONE_THRESHOLD', 5)  # same statement shape this many times in one request is reported
+app.config.setdefault('N_PLUS_ONE_RAISE', False)  # raise instead of just reporting, to fail a test run
+
+n_plus_one_reports = deque(maxlen=200)
+
+_SQL_LITERAL_LIST = re.compile(r'\((?:\s*(?:\?|:\w+|%\(\w+\)s|\d+|\'[^\']*\')\s*,)+\s*(?:\?|:\w+|%\(\w+\)s|\d+|\'[^\']*\')\s*\)')
+_SQL_NUMBER = re.compile(r'\b\d+\b')
+_SQL_STRING = re.compile(r"'[^']*'")
+
+
+class NPlusOneError(Exception):
+    """Raised when N_PLUS_ONE_RAISE is on and a request repeats a statement too often."""
+
+
+def statement_shape(statement):
+    """Normalise a SQL statement so the same query with different values compares equal."""
+    shape = ' '.join(statement.split())
+    shape = _SQL_STRING.sub('?', shape)
+    shape = _SQL_NUMBER.sub('?', shape)
+    return _SQL_LITERAL_LIST.sub('(?)', shape)
+
+
+def record_statement_shape(profile, statement):
+    shapes = profile.setdefault('shapes', {})
+    shape = statement_shape(statement)
+    shapes[shape] = shapes.get(shape, 0) + 1
+
+
+def find_repeated_statements(profile, threshold=None):
+    """Statement shapes that ran at least `threshold` times in one request, most repeated first."""
+    threshold = threshold or app.config['N_PLUS_ONE_THRESHOLD']
+    repeated = [
+        {'statement': shape, 'count': count}
+        for shape, count in profile.get('shapes', {}).items()
+        if count >= threshold
+    ]
+    repeated.sort(key=lambda item: item['count'], reverse=True)
+    return repeated
+
+
+def report_n_plus_one(profile):
+    """Log and remember repeated statements for the current request; optionally raise."""
+    repeated = find_repeated_statements(profile)
+    if not repeated:
+        return []
+
+    endpoint = request.endpoint or 'unmatched'
+    for item in repeated:
+        report = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'statement': item['statement'],
+            'count': item['count']
+        }
+        n_plus_one_reports.appendleft(report)
+        app.logger.warning(f"N+1 query in {endpoint} ({request.method} {request.path}): "
+                           f"{item['count']}x {item['statement'][:200]}")
+
+    if app.config['N_PLUS_ONE_RAISE']:
+        worst = repeated[0]
+        raise NPlusOneError(f"{endpoint} ran the same statement {worst['count']} times: {worst['statement'][:200]}")
+    return repeated
+
+
+# GET pages crawled by `flask check-n-plus-one`; {counselor_id}/{student_id} are filled from the database
+N_PLUS_ONE_CRAWL = [
+    ('admin', '/admin-dashboard'),
+    ('admin', '/admin-dashboard-data'),
+    ('admin', '/admin/analytics'),
+    ('admin', '/admin/users'),
+    ('admin', '/admin/counselors'),
+    ('admin', '/api/admin/appointments'),
+    ('admin', '/api/admin/forum/posts'),
+    ('admin', '/api/admin/counselors/available'),
+    ('admin', '/api/availability/matrix'),
+    ('admin', '/community'),
+    ('counselor', '/counselor-dashboard'),
+    ('counselor', '/api/counselor/dashboard-stats'),
+    ('counselor', '/api/counselor/notifications'),
+    ('counselor', '/api/counselor/calendar/month'),
+    ('counselor', '/api/counselor/schedule'),
+    ('counselor', '/api/counselor/appointments'),
+    ('counselor', '/counselor/students'),
+    ('counselor', '/api/counselor/students/search?q=a'),
+    ('student', '/dashboard'),
+    ('student', '/api/student/appointments'),
+    ('student', '/api/appointments/my-appointments'),
+    ('student', '/community'),
+    ('student', '/resources')
+]
+
+
+def crawl_for_n_plus_one(paths=None, threshold=None):
+    """Request each crawl path as the matching role and collect repeated-statement reports."""
+    with app.app_context():
+        admin = User.query.filter_by(role='admin').first()
+        student = User.query.filter_by(role='student').first()
+        counselor = Counselor.query.filter_by(is_active=True).first()
+    logins = {
+        'admin': (admin.id, None) if admin else None,
+        'student': (student.id, None) if student else None,
+        'counselor': (counselor.id, 'counselor') if counselor else None
+    }
+
+    previous = (app.config['N_PLUS_ONE_DETECTION'], app.config['N_PLUS_ONE_RAISE'], app.config['N_PLUS_ONE_THRESHOLD'])
+    app.config.update(N_PLUS_ONE_DETECTION=True, N_PLUS_ONE_RAISE=False, N_PLUS_ONE_THRESHOLD=threshold or previous[2])
+    n_plus_one_reports.clear()
+    results = []
+    try:
+        for role, path in paths or N_PLUS_ONE_CRAWL:
+            login = logins.get(role)
+            if not login:
+                results.append({'role': role, 'path': path, 'status': None, 'reports': [], 'skipped': True})
+                continue
+
+            client = app.test_client()
+            with client.session_transaction() as client_session:
+                client_session['_user_id'] = str(login[0])
+                client_session['_fresh'] = True
+                if login[1]:
+                    client_session['user_type'] = login[1]
+
+            # A fresh app context per request so `g` (and the logged-in user cached on it) isn't shared
+            seen = len(n_plus_one_reports)
+            with app.app_context():
+                response = client.get(path)
+            reports = list(n_plus_one_reports)[:len(n_plus_one_reports) - seen]
+            results.append({'role': role, 'path': path, 'status': response.status_code, 'reports': reports, 'skipped': False})
+    finally:
+        app.config.update(N_PLUS_ONE_DETECTION=previous[0], N_PLUS_ONE_RAISE=previous[1], N_PLUS_ONE_THRESHOLD=previous[2])
+    return results
+
+
+@app.cli.command('check-n-plus-one')
+@click.option('--threshold', default=5, show_default=True, help='Repeats of one statement shape that count as N+1.')
+@click.option('--fail/--no-fail', default=True, show_default=True, help='Exit non-zero when anything is found.')
+def check_n_plus_one_command(threshold, fail):
+    """Crawl the main pages and report statements repeated within a single request."""
+    results = crawl_for_n_plus_one(threshold=threshold)
+    offenders = 0
+    for result in results:
+        if result['skipped']:
+            click.echo(f"⏭️  {result['role']:<9} {result['path']} (no {result['role']} account)")
+            continue
+        marker = '❌' if result['reports'] else '✅'
+        click.echo(f"{marker} {result['role']:<9} {result['path']} [{result['status']}]")
+        for report in result['reports']:
+            offenders += 1
+            click.echo(f"      {report['count']}x {report['statement'][:160]}")
+
+    crawled = sum(1 for result in results if not result['skipped'])
+    click.echo(f"\n{offenders} repeated statement(s) at threshold {threshold} across {crawled} page(s)")
+    if not crawled and fail:
+        # Nothing was checked, so a clean report would be misleading
+        raise click.ClickException("No pages were crawled; create admin, counselor and student accounts first")
+    if offenders and fail:
+        raise click.ClickException(f"{offenders} repeated statement(s) found; see the report above")
+
+
+# =============================================================================
+# REAL-TIME EVENTS (SERVER-SENT EVENTS)
+# =============================================================================
+
+app.config.setdefault('SSE_KEEPALIVE_SECONDS', 15)  # comment line sent when idle so proxies keep the stream open
+app.config.setdefault('SSE_MAX_CONNECTION_SECONDS', 300)  # streams end after this; EventSource reconnects and resumes
+app.config.setdefault('SSE_RETRY_MS', 3000)
+app.config.setdefault('SSE_QUEUE_SIZE', 100)  # events buffered per client before it is told to resync
+app.config.setdefault('SSE_REPLAY_LIMIT', 500)  # change-log rows replayed to a reconnecting client
+
+
+class EventSubscription:
+    def __init__(self, channels, queue_size):
+        self.channels = frozenset(channels)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+
+class EventHub:
+    """In-process publish/subscribe hub behind the SSE stream.
+
+    Each connected client gets a bounded queue; a client that falls behind is
+    flagged for a resync instead of blocking publishers. Live delivery only
+    reaches clients connected to this process; reconnecting clients catch up
+    from the change log, which every process writes to.
+    """
+
+    def __init__(self, queue_size=100):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.queue_size = queue_size
+
+    def subscribe(self, channels):
+        subscription = EventSubscription(channels, self.queue_size)
+        with self.lock:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def publish(self, event_id, event_type, data, channels):
+        """Fan an event out to matching subscribers; `event_id` is its change-log seq"""
+        channels = frozenset(channels)
+        event = {
+            'id': event_id,
+            'type': event_type,
+            'data': data,
+            'channels': channels,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        with self.lock:
+            targets = [subscription for subscription in self.subscribers if subscription.channels & channels]
+
+        for subscription in targets:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                subscription.overflowed = True
+        return event
+
+    def subscriber_count(self):
+        with self.lock:
+            return len(self.subscribers)
+
+
+event_hub = EventHub(app.config['SSE_QUEUE_SIZE'])
+
+
+def event_channels_for(user):
+    """Channels a logged-in user may listen on."""
+    if isinstance(user, Counselor):
+        return {f'counselor:{user.id}', 'forum'}
+    channels = {f'user:{user.id}', 'forum'}
+    if getattr(user, 'role', None) == 'admin':
+        channels.add('admin')
+    return channels
+
+
+def format_sse(event_type, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(data, default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def _previous_value(obj, attribute):
+    history = db.inspect(obj).attrs[attribute].history
+    return history.deleted[0] if history.deleted else None
+
+
+def describe_model_change(obj, action):
+    """Turn a flushed model change into (event_type, data, channels), or None if it isn't published."""
+    if isinstance(obj, AppointmentRequest):
+        counselor_ids = {obj.counselor_id, _previous_value(obj, 'counselor_id') if action == 'updated' else None}
+        channels = {'admin', f'user:{obj.user_id}'} | {f'counselor:{cid}' for cid in counselor_ids if cid}
+        return f'appointment.{action}', {
+            'id': obj.id,
+            'user_id': obj.user_id,
+            'counselor_id': obj.counselor_id,
+            'status': obj.status,
+            'previous_status': _previous_value(obj, 'status') if action == 'updated' else None,
+            'scheduled_date': obj.scheduled_date.isoformat() if obj.scheduled_date else None
+        }, channels
+
+    if isinstance(obj, ForumPost):
+        # Flagged content is hidden from the community, so only admins hear about it
+        channels = {'admin'} if obj.is_flagged else {'admin', 'forum'}
+        return f'forum.post_{action}', {
+            'id': obj.id,
+            'title': obj.title,
+            'category': obj.category,
+            'is_flagged': bool(obj.is_flagged)
+        }, channels
+
+    if isinstance(obj, ForumReply):
+        channels = {'admin'} if obj.is_flagged else {'admin', 'forum'}
+        return f'forum.reply_{action}', {
+            'id': obj.id,
+            'post_id': obj.post_id,
+            'is_flagged': bool(obj.is_flagged)
+        }, channels
+
+    if isinstance(obj, Assessment) and action == 'created':
+        return 'assessment.submitted', {
+            'id': obj.id,
+            'user_id': obj.user_id,
+            'assessment_type': obj.assessment_type,
+            'risk_level': obj.risk_level
+        }, {'admin', f'user:{obj.user_id}'}
+
+    return None
+
+
+@event.listens_for(SQLAlchemySession, 'after_flush')
+def _collect_model_changes(session, flush_context):
+    """Write tracked model changes to the change log and queue them for SSE.
+
+    The change-log rows go through the flushing connection, so they commit or
+    roll back together with the change itself; live events are published
+    only after the commit.
+    """
+    changes = [(obj, 'created') for obj in session.new]
+    changes += [(obj, 'updated') for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+    changes += [(obj, 'deleted') for obj in session.deleted]
+
+    for obj, action in changes:
+        if not isinstance(obj, (AppointmentRequest, ForumPost, ForumReply, Assessment)):
+            continue
+        try:
+            described = describe_model_change(obj, action)
+        except Exception as e:
+            app.logger.error(f"Error describing {type(obj).__name__} change: {str(e)}")
+            continue
+        if described:
+            event_type, data, channels = described
+            seq = append_change_log(session.connection(), type(obj).__name__, event_type, data, channels)
+            session.info.setdefault('pending_events', []).append((seq, event_type, data, channels))
+
+
+@event.listens_for(SQLAlchemySession, 'after_commit')
+def _publish_model_changes(session):
+    for seq, event_type, data, channels in session.info.pop('pending_events', []):
+        event_hub.publish(seq, event_type, data, channels)
+
+
+@event.listens_for(SQLAlchemySession, 'after_rollback')
+def _discard_model_changes(session):
+    session.info.pop('pending_events', None)
+
+
+@app.route('/api/events/stream')
+@login_required
+def api_event_stream():
+    """Server-sent events feed of appointment, forum and assessment changes for the current user"""
+    channels = event_channels_for(current_user)
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    if last_event_id is None:
+        last_event_id = request.args.get('since', type=int)
+
+    subscription = event_hub.subscribe(channels)
+    backlog = []
+    if last_event_id is not None:
+        backlog = [change_log_entry(row) for row in
+                   changes_since(last_event_id, channels, app.config['SSE_REPLAY_LIMIT'])]
+    keepalive = app.config['SSE_KEEPALIVE_SECONDS']
+    deadline = time.time() + app.config['SSE_MAX_CONNECTION_SECONDS']
+
+    def generate():
+        last_sent = last_event_id or 0
+        try:
+            yield f"retry: {app.config['SSE_RETRY_MS']}\n\n"
+            for event in backlog:
+                last_sent = event['id']
+                yield format_sse(event['type'], event['data'], event['id'])
+
+            while time.time() < deadline:
+                if subscription.overflowed:
+                    yield format_sse('resync', {'reason': 'client fell behind'})
+                    return
+                try:
+                    event = subscription.queue.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if event['id'] <= last_sent:
+                    continue
+                last_sent = event['id']
+                yield format_sse(event['type'], event['data'], event['id'])
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+# =============================================================================
+# CHANGE LOG (OUTBOX)
+# =============================================================================
+
+app.config.setdefault('CHANGE_LOG_RETENTION_DAYS', 30)
+app.config.setdefault('CHANGE_FEED_PAGE_SIZE', 100)
+app.config.setdefault('CHANGE_FEED_MAX_PAGE_SIZE', 1000)
+
+
+class ChangeLog(db.Model):
+    """Append-only record of appointment, forum and assessment writes.
+
+    Rows are written in the same transaction as the change they describe, so
+    `seq` gives consumers a gap-free cursor: everything committed before a row
+    has a lower seq. Channels are stored space-delimited with a leading and
+    trailing space so visibility can be matched with LIKE. Bulk
+    `Query.delete()`/`update()` calls bypass the flush hooks and are not logged.
+    """
+    __tablename__ = 'change_log'
+    __table_args__ = {'sqlite_autoincrement': True}  # never reuse a seq after pruning
+
+    seq = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(50), nullable=False)
+    entity_type = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer)
+    payload = db.Column(db.Text)  # JSON
+    channels = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+def append_change_log(connection, entity_type, event_type, data, channels):
+    """Insert a change-log row on `connection` and return its seq"""
+    result = connection.execute(ChangeLog.__table__.insert().values(
+        event_type=event_type,
+        entity_type=entity_type,
+        entity_id=data.get('id'),
+        payload=json.dumps(data, default=str),
+        channels=' ' + ' '.join(sorted(channels)) + ' ',
+        created_at=datetime.utcnow()
+    ))
+    return result.inserted_primary_key[0]
+
+
+def changes_since(since, channels, limit, event_types=None):
+    """Change-log rows after `since` visible on `channels`, oldest first"""
+    query = ChangeLog.query.filter(
+        ChangeLog.seq > since,
+        or_(*[ChangeLog.channels.like(f'% {channel} %') for channel in channels])
+    )
+    if event_types:
+        # Types ending in '.' match by prefix, like the client-side subscriptions
+        query = query.filter(or_(*[
+            ChangeLog.event_type.startswith(event_type) if event_type.endswith('.')
+            else ChangeLog.event_type == event_type
+            for event_type in event_types
+        ]))
+    return query.order_by(ChangeLog.seq).limit(limit).all()
+
+
+def change_log_entry(row):
+    return {
+        'id': row.seq,
+        'type': row.event_type,
+        'data': json.loads(row.payload) if row.payload else {},
+        'timestamp': row.created_at.isoformat() if row.created_at else None
+    }
+
+
+def latest_change_seq():
+    return db.session.query(func.max(ChangeLog.seq)).scalar() or 0
+
+
+def prune_change_log(days=None):
+    """Delete change-log rows older than the retention window; returns rows removed"""
+    days = app.config['CHANGE_LOG_RETENTION_DAYS'] if days is None else days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    removed = ChangeLog.query.filter(ChangeLog.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+
+@app.route('/api/changes')
+@login_required
+def api_changes():
+    """Cursor-based feed of changes visible to the current user.
+
+    Pass the returned `next_since` back as `since` to get the next page;
+    `types` is an optional comma-separated filter (e.g. `appointment.,forum.`).
+    """
+    try:
+        since = request.args.get('since', 0, type=int)
+        limit = min(max(request.args.get('limit', app.config['CHANGE_FEED_PAGE_SIZE'], type=int), 1),
+                    app.config['CHANGE_FEED_MAX_PAGE_SIZE'])
+        event_types = [t.strip() for t in request.args.get('types', '').split(',') if t.strip()]
+
+        rows = changes_since(since, event_channels_for(current_user), limit + 1, event_types)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return jsonify({
+            'success': True,
+            'changes': [change_log_entry(row) for row in rows],
+            'next_since': rows[-1].seq if rows else since,
+            'has_more': has_more,
+            'latest_seq': latest_change_seq()
+        })
+
+    except Exception as e:
+        app.logger.error(f"Error reading change feed: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to load changes'}), 500
+
+
+@app.cli.command('prune-change-log')
+@click.option('--days', type=int, default=None, help='Keep this many days of changes (default: CHANGE_LOG_RETENTION_DAYS).')
+def prune_change_log_command(days):
+    """Remove change-log rows past the retention window."""
+    removed = prune_change_log(days)
+    click.echo(f"🧹 Removed {removed} change-log row(s)")
+
+
+# =============================================================================
+# MAINTENANCE MODE MIDDLEWARE
+# =============================================================================
+
+@app.before_request
+def check_maintenance_mode():
+    """Check if maintenance mode is enabled"""
+    # Skip maintenance check for admin routes and static files; /metrics checks its
+    # own credentials and stays up so monitoring can see the maintenance window
+    if (request.endpoint and 
+        (request.endpoint.startswith('admin') or 
+         request.endpoint.startswith('static') or
+         request.endpoint in ['admin_login', 'logout', 'prometheus_metrics'])):
+        return
+    
+    # Check if maintenance mode is enabled
+    if get_setting('maintenance_mode', 'false') == 'true':
+        # Only allow admin users
+        if not current_user.is_authenticated or (hasattr(current_user, 'role') and current_user.role != 'admin'):
+            return render_template('maintenance.html'), 503
+
+# =============================================================================
+# INITIALIZATION FUNCTIONS
+# =============================================================================
+
+def create_tables_if_not_exist():
+    """Create settings table and set defaults"""
+    with app.app_context():
+        try:
+            db.create_all()
+            
+            # Set default settings if they don't exist
+            default_settings = {
+                'platform_name': 'CUEA MindConnect',
+                'system_email': 'admin@cuea.edu',
+                'email_notifications': 'true',
+                'registration_alerts': 'true',
+                'appointment_reminders': 'true',
+                'min_password_length': '8',
+                'require_special_chars': 'true',
+                'session_timeout': '60',
+                'require_2fa': 'false',
+                'enable_forum': 'true',
+                'enable_assessments': 'true',
+                'enable_appointments': 'true',
+                'allow_anonymous': 'true',
+                'allow_registration': 'true',
+                'show_crisis_resources': 'true',
+                'auto_backup': 'true',
+                'maintenance_mode': 'false'
+            }
+            
+            for name, value in default_settings.items():
+                if not SystemSettings.query.filter_by(name=name).first():
+                    setting = SystemSettings(name=name, value=value)
+                    db.session.add(setting)
+            
+            db.session.commit()
+            invalidate_settings_cache()
+            print("✅ Settings initialized successfully!")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error initializing settings: {str(e)}")
+
+# Initialize on import
+#create_tables_if_not_exist()
+
+# =============================================================================
+# ADDITIONAL UTILITY ROUTES
+# =============================================================================
+
+@app.route('/api/system/status')
+def system_status():
+    """Public endpoint to check system status"""
+    maintenance_mode = get_setting('maintenance_mode', 'false') == 'true'
+    return jsonify({
+        'maintenance_mode': maintenance_mode,
+        'status': 'maintenance' if maintenance_mode else 'operational',
+        'timestamp': datetime.utcnow().isoformat()
+    })
+
+@app.route('/admin/system-health/refresh')
+@login_required
+@role_required('admin')
+def refresh_health_data():
+    """Refresh health data for AJAX updates"""
+    try:
+        health_data = get_comprehensive_health_data()
+        return jsonify({
+            'success': True,
+            'health_data': health_data
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/admin/system-health/export')
+@login_required
+@role_required('admin')
+def export_health_report():
+    """Export system health report"""
+    try:
+        health_data = get_comprehensive_health_data()
+        
         # Create a simple text report
         report_lines = [
             "CUEA MINDCONNECT SYSTEM HEALTH REPORT",
@@ -1695,6 +3573,7 @@ def export_health_report():
             "",
             "PERFORMANCE METRICS:",
             f"- Average Response Time: {health_data['metrics']['avg_response_time']}ms",
+            f"- Response Time p50/p95/p99: {health_data['metrics']['p50_response_time']}/{health_data['metrics']['p95_response_time']}/{health_data['metrics']['p99_response_time']}ms",
             f"- Error Rate: {health_data['metrics']['error_rate']}%",
             f"- Requests per Minute: {health_data['metrics']['requests_per_minute']}",
             "",
@@ -1731,38 +3610,15 @@ def login():
         password = request.form.get('password')
         remember_me = request.form.get('remember_me')
 
-        print(f"🔍 LOGIN DEBUG: Username: '{username}' (length: {len(username) if username else 'None'})")
-        print(f"🔍 LOGIN DEBUG: Username repr: {repr(username)}")
-        print(f"🔍 LOGIN DEBUG: Password length: {len(password) if password else 'None'}")
-
-        # Check database stats
-        total_users = User.query.count()
-        print(f"🔍 LOGIN DEBUG: Total users in database: {total_users}")
-        
-        # Show all usernames for debugging 
-        if total_users < 20:  # Only show if not too many users
-            all_users = User.query.all()
-            print(f"🔍 LOGIN DEBUG: All users in database:")
-            for u in all_users:
-                print(f"  - ID: {u.id}, Username: '{u.username}', Email: '{u.email}', Role: '{u.role}', Active: {u.is_active}")
-
         # Find user by username (students and admins)
         user = User.query.filter_by(username=username).first()
 
         if user:
-            print(f"✅ LOGIN DEBUG: User found!")
-            print(f"  - ID: {user.id}")
-            print(f"  - Username: '{user.username}'")
-            print(f"  - Full Name: {user.get_full_name()}")
-            print(f"  - Role: {user.role}")
-            print(f"  - Is Active: {user.is_active}")
-            print(f"  - Has password hash: {bool(user.password_hash)}")
+            app.logger.debug("Login attempt for user %s (role %s, active %s)", user.id, user.role, user.is_active)
             
             if user.check_password(password):
-                print("✅ LOGIN DEBUG: Password check passed")
-                
                 if not user.is_active:
-                    print("❌ LOGIN DEBUG: User account is deactivated")
+                    app.logger.info("Login refused for deactivated user %s", user.id)
                     flash('Your account has been deactivated. Please contact support.', 'error')
                     return render_template('login.html')
                 
@@ -1774,7 +3630,7 @@ def login():
                 user.last_login = datetime.utcnow()
                 db.session.commit()
                 
-                print(f"✅ LOGIN SUCCESS: Student/Admin login successful for {user.username}")
+                app.logger.info("Login succeeded for user %s (%s)", user.id, user.role)
                 
                 # Redirect based on user role
                 next_page = request.args.get('next')
@@ -1786,18 +3642,10 @@ def login():
                 else:
                     return redirect(url_for('dashboard'))
             else:
-                print("❌ LOGIN DEBUG: Password check failed")
-                print(f"❌ LOGIN DEBUG: Provided password length: {len(password) if password else 'None'}")
+                app.logger.info("Login failed for user %s: wrong password", user.id)
                 flash('Invalid username or password. Please try again.', 'error')
         else:
-            print(f"❌ LOGIN DEBUG: No user found with username '{username}'")
-            
-            # Check for similar usernames (typos)
-            all_usernames = [u.username for u in User.query.all()]
-            similar = [un for un in all_usernames if un.lower().startswith(username.lower()[:3])]
-            if similar:
-                print(f"❌ LOGIN DEBUG: Similar usernames found: {similar}")
-            
+            app.logger.info("Login failed: unknown username")
             flash('Invalid username or password. Please try again.', 'error')
 
     return render_template('login.html')
@@ -1806,21 +3654,13 @@ def login():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    # Debug logging 
-    print(f"Debug: Dashboard access by user type: {type(current_user)}")
-    print(f"Debug: User ID: {current_user.id}")
-    
     # Check user type and redirect if needed
     if hasattr(current_user, '__class__') and current_user.__class__.__name__ == 'Counselor':
-        print("Debug: Redirecting counselor to counselor dashboard")
         return redirect(url_for('counselor_dashboard'))
     
     if hasattr(current_user, 'role') and current_user.role == 'admin':
-        print("Debug: Redirecting admin to admin dashboard")
         return redirect(url_for('admin_dashboard'))
     
-    print("Debug: Loading student dashboard")
-    
     # Initialize all variables with safe defaults
     enhanced_assessments = []
     upcoming_appointments = []
@@ -1836,17 +3676,13 @@ def dashboard():
     try:
         # Test database connection first
         db.session.execute(text('SELECT 1')).fetchone()
-        print("Debug: Database connection successful")
         
         # Get recent assessments with comprehensive error handling
         try:
-            print("Debug: Fetching assessments...")
             recent_assessments_query = Assessment.query.filter_by(user_id=current_user.id)\
                 .order_by(Assessment.created_at.desc()).limit(5)
             recent_assessments = recent_assessments_query.all()
             
-            print(f"Debug: Found {len(recent_assessments)} assessments")
-            
             for assessment in recent_assessments:
                 assessment_data = {
                     'id': assessment.id,
@@ -1867,7 +3703,6 @@ def dashboard():
             
             # Get total assessments count
             total_assessments = Assessment.query.filter_by(user_id=current_user.id).count()
-            print(f"Debug: Total assessments: {total_assessments}")
             
             # Get latest mood assessment
             latest_mood = Assessment.query.filter_by(
@@ -1880,21 +3715,17 @@ def dashboard():
                 latest_risk_level = getattr(latest_mood, 'risk_level', 'unknown')
                 
         except Exception as e:
-            print(f"Debug: Error fetching assessments: {str(e)}")
+            app.logger.error(f"Dashboard assessments query failed: {e}")
             # Continue with empty assessments
         
         # Get appointments with error handling
         try:
-            print("Debug: Fetching appointments...")
-            
             # Upcoming appointments
             upcoming_appointments = AppointmentRequest.query.filter_by(user_id=current_user.id)\
                 .filter(AppointmentRequest.scheduled_date > datetime.utcnow())\
                 .filter(AppointmentRequest.status.in_(['scheduled', 'assigned']))\
                 .order_by(AppointmentRequest.scheduled_date).limit(3).all()
             
-            print(f"Debug: Found {len(upcoming_appointments)} upcoming appointments")
-            
             # Completed appointments count
             completed_appointments = AppointmentRequest.query.filter_by(
                 user_id=current_user.id, 
@@ -1904,41 +3735,34 @@ def dashboard():
             # Today's appointments
             today = datetime.utcnow().date()
             today_appointments = AppointmentRequest.query.filter_by(user_id=current_user.id)\
-                .filter(func.date(AppointmentRequest.scheduled_date) == today)\
+                .filter(day_range_filter(AppointmentRequest.scheduled_date, today))\
                 .filter(AppointmentRequest.status.in_(['scheduled', 'assigned'])).all()
-                
-            print(f"Debug: Found {len(today_appointments)} appointments today")
             
         except Exception as e:
-            print(f"Debug: Error fetching appointments: {str(e)}")
+            app.logger.error(f"Dashboard appointments query failed: {e}")
         
         # Get wellness resources with error handling
         try:
-            print("Debug: Fetching wellness resources...")
             featured_resources = WellnessResource.query.filter_by(is_featured=True)\
                 .order_by(WellnessResource.created_at.desc()).limit(4).all()
-            print(f"Debug: Found {len(featured_resources)} featured resources")
         except Exception as e:
-            print(f"Debug: Error fetching resources: {str(e)}")
+            app.logger.error(f"Dashboard resources query failed: {e}")
         
         # Get forum posts with error handling
         try:
-            print("Debug: Fetching forum posts...")
             week_ago = datetime.utcnow() - timedelta(days=7)
             recent_forum_posts = ForumPost.query\
+                .options(db.joinedload(ForumPost.author))\
                 .filter(ForumPost.created_at > week_ago)\
                 .order_by(ForumPost.created_at.desc()).limit(5).all()
-            print(f"Debug: Found {len(recent_forum_posts)} recent forum posts")
         except Exception as e:
-            print(f"Debug: Error fetching forum posts: {str(e)}")
+            app.logger.error(f"Dashboard forum posts query failed: {e}")
         
         # Generate AI insights safely
         try:
-            print("Debug: Generating dashboard insights...")
             dashboard_insights = generate_dashboard_insights(current_user.id, enhanced_assessments)
-            print("Debug: Insights generated successfully")
         except Exception as e:
-            print(f"Debug: Error generating insights: {str(e)}")
+            app.logger.error(f"Dashboard insights failed: {e}")
             dashboard_insights = {
                 'overall_trend': 'stable',
                 'recommendations': [],
@@ -1946,7 +3770,9 @@ def dashboard():
                 'insights_available': False
             }
         
-        print("Debug: Dashboard data prepared successfully")
+        app.logger.debug("Student dashboard for user %s: %d assessments, %d upcoming, %d today, %d resources, %d posts",
+                         current_user.id, len(enhanced_assessments), len(upcoming_appointments),
+                         len(today_appointments), len(featured_resources), len(recent_forum_posts))
         
         return render_template('dashboard.html', 
                              recent_assessments=enhanced_assessments,
@@ -1961,10 +3787,8 @@ def dashboard():
                              dashboard_insights=dashboard_insights,
                              current_time=datetime.utcnow())
     
-    except Exception as e:
-        print(f"Debug: Critical dashboard error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        app.logger.exception("Student dashboard failed")
         
         flash('Error loading dashboard data. Some features may be unavailable.', 'warning')
         
@@ -2057,18 +3881,11 @@ def admin_login():
         password = request.form.get('password')
         remember_me = request.form.get('remember_me')
 
-        # Debug logging 
-        print(f"Debug: Admin login attempt for username: {username}")
-
         # Find admin user by username and role
         user = User.query.filter_by(username=username, role='admin').first()
 
         if user:
-            print(f"Debug: Found admin: {user.get_full_name()}")
-            
             if user.check_password(password):
-                print("Debug: Password check passed")
-                
                 if not user.is_active:
                     flash('Your account has been deactivated.', 'error')
                     return render_template('admin_login.html')
@@ -2080,10 +3897,10 @@ def admin_login():
                 
                 return redirect(url_for('admin_dashboard'))
             else:
-                print("Debug: Password check failed")
+                app.logger.info("Admin login failed for user %s: wrong password", user.id)
                 flash('Invalid admin credentials. Please try again.', 'error')
         else:
-            print("Debug: No admin found with that username")
+            app.logger.info("Admin login failed: unknown admin username")
             flash('Invalid admin credentials. Please try again.', 'error')
 
     return render_template('admin_login.html')
@@ -2109,12 +3926,7 @@ def register():
         newsletter = request.form.get('newsletter') == 'on'
         terms = request.form.get('terms')
 
-        # DEBUG: Print all received data
-        print(f"🔍 DEBUG: Registration attempt for username: '{username}'")
-        print(f"🔍 DEBUG: Email: '{email}'")
-        print(f"🔍 DEBUG: Student ID: '{student_id}'")
-        print(f"🔍 DEBUG: Year of study: '{year_of_study}' (type: {type(year_of_study)})")
-        print(f"🔍 DEBUG: All form data: {dict(request.form)}")
+        app.logger.debug("Registration attempt (year of study %r)", year_of_study)
 
         # Validation
         if not terms:
@@ -2137,30 +3949,27 @@ def register():
         # Check if user already exists
         existing_username = User.query.filter_by(username=username).first()
         if existing_username:
-            print(f"🔍 DEBUG: Username '{username}' already exists")
+            app.logger.info("Registration refused: username already exists")
             flash('Username already exists. Please choose a different one.', 'error')
             return render_template('register.html')
 
         existing_email = User.query.filter_by(email=email).first()
         if existing_email:
-            print(f"🔍 DEBUG: Email '{email}' already exists")
+            app.logger.info("Registration refused: email already registered")
             flash('Email address already registered. Please use a different email.', 'error')
             return render_template('register.html')
 
         existing_student_id = User.query.filter_by(student_id=student_id).first()
         if existing_student_id:
-            print(f"🔍 DEBUG: Student ID '{student_id}' already exists")
+            app.logger.info("Registration refused: student ID already registered")
             flash('Student ID already registered. Please contact support if this is an error.', 'error')
             return render_template('register.html')
 
-        print(f"🔍 DEBUG: All validation passed, creating user object...")
-
         # CRITICAL: Check year_of_study conversion
         try:
             year_of_study_int = int(year_of_study) if year_of_study else None
-            print(f"🔍 DEBUG: Year of study converted to: {year_of_study_int}")
         except (ValueError, TypeError) as e:
-            print(f"❌ DEBUG: Error converting year_of_study '{year_of_study}' to int: {e}")
+            app.logger.info("Registration refused: bad year of study %r (%s)", year_of_study, e)
             flash('Invalid year of study. Please select a valid option.', 'error')
             return render_template('register.html')
 
@@ -2179,47 +3988,23 @@ def register():
                 emergency_phone=emergency_phone,
                 newsletter=newsletter
             )
-            print(f"🔍 DEBUG: User object created successfully")
-            
             user.set_password(password)
-            print(f"🔍 DEBUG: Password hash set")
-            
-            # Check user object before saving
-            print(f"🔍 DEBUG: User object details:")
-            print(f"  - Username: '{user.username}'")
-            print(f"  - Email: '{user.email}'")
-            print(f"  - Student ID: '{user.student_id}'")
-            print(f"  - Year of study: {user.year_of_study}")
-            print(f"  - Has password hash: {bool(user.password_hash)}")
             
         except Exception as e:
-            print(f"❌ DEBUG: Error creating user object: {str(e)}")
-            print(f"❌ DEBUG: Error type: {type(e).__name__}")
-            import traceback
-            print(f"❌ DEBUG: Full traceback: {traceback.format_exc()}")
+            app.logger.exception("Registration failed while building the user")
             flash(f'Registration failed during user creation: {str(e)}', 'error')
             return render_template('register.html')
 
         try:
-            print(f"🔍 DEBUG: Adding user to database session...")
             db.session.add(user)
-            
-            print(f"🔍 DEBUG: Committing to database...")
             db.session.commit()
             
-            print(f"🔍 DEBUG: Database commit successful!")
-            
             # CRITICAL: Verify the user was actually saved
             saved_user = User.query.filter_by(username=username).first()
             if saved_user:
-                print(f"✅ SUCCESS: User verified in database!")
-                print(f"  - ID: {saved_user.id}")
-                print(f"  - Username: '{saved_user.username}'")
-                print(f"  - Email: '{saved_user.email}'")
-                print(f"  - Role: '{saved_user.role}'")
-                print(f"  - Is Active: {saved_user.is_active}")
+                app.logger.info("Registered user %s", saved_user.id)
             else:
-                print(f"❌ CRITICAL ERROR: User not found in database after successful commit!")
+                app.logger.critical("Registered user missing from the database after commit")
                 flash('Registration failed: User was not saved properly.', 'error')
                 return render_template('register.html')
             
@@ -2228,13 +4013,7 @@ def register():
             
         except Exception as e:
             db.session.rollback()
-            print(f"❌ DATABASE ERROR: {str(e)}")
-            print(f"❌ ERROR TYPE: {type(e).__name__}")
-            
-            # Import traceback for full error details
-            import traceback
-            print(f"❌ FULL TRACEBACK:")
-            print(traceback.format_exc())
+            app.logger.exception("Registration failed while saving the user")
             
             # Show the actual error to user (in development)
             flash(f'Registration failed: {str(e)}', 'error')
@@ -2274,16 +4053,11 @@ def logout():
 def debug_current_user():
     """Helper function to debug current user state"""
     if current_user.is_authenticated:
-        print(f"🔍 DEBUG Current User:")
-        print(f"   Type: {type(current_user)}")
-        print(f"   ID: {current_user.id}")
-        print(f"   Username: {getattr(current_user, 'username', 'N/A')}")
-        print(f"   Is Counselor: {isinstance(current_user, Counselor)}")
-        print(f"   Session user_type: {session.get('user_type', 'None')}")
-        if hasattr(current_user, 'role'):
-            print(f"   Role: {current_user.role}")
+        app.logger.debug("Current user: %s %s (role %s, session user_type %s)",
+                         type(current_user).__name__, current_user.id,
+                         getattr(current_user, 'role', 'n/a'), session.get('user_type'))
     else:
-        print("🔍 DEBUG: No authenticated user")
+        app.logger.debug("No authenticated user")
 
 # =============================================================================
 # COUNSELOR AUTHENTICATION ROUTES
@@ -2316,8 +4090,6 @@ def counselor_change_password():
         new_password = request.form.get('new_password')
         confirm_password = request.form.get('confirm_password')
         
-        print(f"🔧 Password change attempt for: {current_user.username}")
-        
         # Validate inputs
         if not all([current_password, new_password, confirm_password]):
             return jsonify({'success': False, 'message': 'All fields are required'}), 400
@@ -2341,7 +4113,7 @@ def counselor_change_password():
         
         db.session.commit()
         
-        print(f"✅ Password changed successfully for {current_user.username}")
+        app.logger.info("Password changed for counselor %s", current_user.id)
         
         return jsonify({
             'success': True, 
@@ -2350,10 +4122,7 @@ def counselor_change_password():
         
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Error changing counselor password: {str(e)}")
-        print(f"❌ Error changing password: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Error changing counselor password: {str(e)}")
         return jsonify({'success': False, 'message': 'Failed to change password. Please try again.'}), 500
 
 @app.route('/api/counselor/profile/update', methods=['POST'])
@@ -2371,27 +4140,21 @@ def api_counselor_profile_update():
         data = request.get_json()
         counselor = current_user
         
-        print(f"🔧 Updating profile for counselor: {counselor.username}")
-        print(f"📊 Update data: {data}")
+        app.logger.debug("Updating profile fields %s for counselor %s", sorted(data or {}), counselor.id)
         
         # Update only the allowed fields
         if 'phone' in data:
             counselor.phone = data['phone'].strip() if data['phone'] else None
-            print(f"📱 Updated phone: {counselor.phone}")
         
         if 'specialization' in data:
             counselor.specialization = data['specialization'].strip() if data['specialization'] else None
-            print(f"🎓 Updated specialization: {counselor.specialization}")
         
         if 'license_number' in data:
             counselor.license_number = data['license_number'].strip() if data['license_number'] else None
-            print(f"📋 Updated license number: {counselor.license_number}")
         
         # Save changes to database
         db.session.commit()
         
-        print(f"✅ Profile updated successfully for {counselor.username}")
-        
         return jsonify({
             'success': True,
             'message': 'Profile updated successfully',
@@ -2404,9 +4167,7 @@ def api_counselor_profile_update():
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error updating counselor profile: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Error updating counselor profile: {str(e)}")
         
         return jsonify({
             'success': False, 
@@ -2582,39 +4343,37 @@ def load_user(user_id):
     """FIXED user loader that properly handles both User and Counselor"""
     try:
         user_id = int(user_id)
-        print(f"🔍 Loading user ID: {user_id}")
         
         # Get user type hint from session
         user_type_hint = session.get('user_type')
-        print(f"🔍 User type hint: {user_type_hint}")
         
         # If we have a hint that this is a counselor, check counselor table first
         if user_type_hint == 'counselor':
             counselor = Counselor.query.get(user_id)
             if counselor:
-                print(f"✅ Loaded counselor: {counselor.username}")
+                app.logger.debug("Loaded counselor %s", user_id)
                 return counselor
         
         # Always try regular user table first (for students and admins)
         user = User.query.get(user_id)
         if user:
-            print(f"✅ Loaded user: {user.username}, role: {user.role}")
+            app.logger.debug("Loaded user %s (%s)", user_id, user.role)
             return user
         
         # If not found in User table and no counselor hint, try counselor table
         if user_type_hint != 'counselor':
             counselor = Counselor.query.get(user_id)
             if counselor:
-                print(f"✅ Loaded counselor (fallback): {counselor.username}")
+                app.logger.debug("Loaded counselor %s without a session hint", user_id)
                 # Set the session hint for future requests
                 session['user_type'] = 'counselor'
                 return counselor
         
-        print(f"❌ No user found with ID: {user_id}")
+        app.logger.info("No user or counselor with id %s; session ignored", user_id)
         return None
         
     except (TypeError, ValueError) as e:
-        print(f"❌ User loader error: {e}")
+        app.logger.warning("User loader got a bad id %r: %s", user_id, e)
         return None
 
 # =============================================================================
@@ -2746,19 +4505,15 @@ def counselor_profile():
     try:
         # Verify this is a counselor
         if not isinstance(current_user, Counselor):
-            print(f"❌ Access denied - not a counselor: {type(current_user)}")
+            app.logger.warning("Counselor profile refused for %s", type(current_user).__name__)
             flash('Access denied. Counselors only.', 'error')
             return redirect(url_for('login'))
         
-        print(f"✅ Rendering simple profile page for counselor: {current_user.username}")
-        
         # Simply render the template - JavaScript will handle API calls
         return render_template('counselor_profile.html')
         
     except Exception as e:
-        print(f"❌ Error loading counselor profile page: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Error loading counselor profile page: {str(e)}")
         flash('Error loading profile page. Please try again.', 'error')
         return redirect(url_for('counselor_dashboard'))
 # =============================================================================
@@ -2780,7 +4535,7 @@ def api_counselor_dashboard_stats():
         # Today's appointments
         today_appointments = AppointmentRequest.query.filter(
             AppointmentRequest.counselor_id == counselor_id,
-            func.date(AppointmentRequest.scheduled_date) == today
+            day_range_filter(AppointmentRequest.scheduled_date, today)
         ).count()
         
         # Total active students (unique students with appointments)
@@ -2839,7 +4594,7 @@ def api_counselor_appointments_today():
             .options(db.joinedload(AppointmentRequest.user))\
             .filter(
                 AppointmentRequest.counselor_id == counselor_id,
-                func.date(AppointmentRequest.scheduled_date) == today
+                day_range_filter(AppointmentRequest.scheduled_date, today)
             )\
             .order_by(AppointmentRequest.scheduled_date)\
             .all()
@@ -2902,8 +4657,7 @@ def api_counselor_appointments_upcoming():
             .options(db.joinedload(AppointmentRequest.user))\
             .filter(
                 AppointmentRequest.counselor_id == counselor_id,
-                func.date(AppointmentRequest.scheduled_date) >= tomorrow,
-                func.date(AppointmentRequest.scheduled_date) <= week_end,
+                day_range_filter(AppointmentRequest.scheduled_date, tomorrow, week_end),
                 AppointmentRequest.status.in_(['scheduled', 'assigned'])
             )\
             .order_by(AppointmentRequest.scheduled_date)\
@@ -3132,7 +4886,7 @@ def api_counselor_notifications():
         notifications = []
         
         # New appointment requests (assigned to this counselor)
-        new_assignments = AppointmentRequest.query.filter_by(
+        new_assignments = AppointmentRequest.query.options(db.joinedload(AppointmentRequest.user)).filter_by(
             counselor_id=counselor_id,
             status='assigned'
         ).order_by(AppointmentRequest.created_at.desc()).limit(5).all()
@@ -3152,7 +4906,7 @@ def api_counselor_notifications():
         
         # Upcoming appointments (within next 2 hours)
         upcoming_cutoff = datetime.utcnow() + timedelta(hours=2)
-        upcoming = AppointmentRequest.query.filter(
+        upcoming = AppointmentRequest.query.options(db.joinedload(AppointmentRequest.user)).filter(
             AppointmentRequest.counselor_id == counselor_id,
             AppointmentRequest.status == 'scheduled',
             AppointmentRequest.scheduled_date <= upcoming_cutoff,
@@ -3510,7 +5264,7 @@ def api_counselor_schedule():
                 .options(db.joinedload(AppointmentRequest.user))\
                 .filter(
                     AppointmentRequest.counselor_id == current_user.id,
-                    func.date(AppointmentRequest.scheduled_date) == target_date.date(),
+                    day_range_filter(AppointmentRequest.scheduled_date, target_date.date()),
                     AppointmentRequest.status.in_(['scheduled', 'assigned'])
                 ).order_by(AppointmentRequest.scheduled_date).all()
             
@@ -3537,8 +5291,7 @@ def api_counselor_schedule():
                 .options(db.joinedload(AppointmentRequest.user))\
                 .filter(
                     AppointmentRequest.counselor_id == current_user.id,
-                    func.date(AppointmentRequest.scheduled_date) >= week_start.date(),
-                    func.date(AppointmentRequest.scheduled_date) <= week_end.date(),
+                    day_range_filter(AppointmentRequest.scheduled_date, week_start.date(), week_end.date()),
                     AppointmentRequest.status.in_(['scheduled', 'assigned'])
                 ).order_by(AppointmentRequest.scheduled_date).all()
             
@@ -3728,7 +5481,7 @@ def api_counselor_available_slots():
             return jsonify({'success': False, 'message': 'Access denied'}), 403
         
         date_str = request.args.get('date')
-        duration = int(request.args.get('duration', 60))
+        duration = request.args.get('duration', type=int)
         
         if not date_str:
             return jsonify({'success': False, 'message': 'Date is required'}), 400
@@ -3739,48 +5492,14 @@ def api_counselor_available_slots():
         except ValueError:
             return jsonify({'success': False, 'message': 'Invalid date format'}), 400
         
-        # Generate all possible time slots (8 AM to 5 PM, every 30 minutes)
-        available_slots = []
-        start_hour = 8
-        end_hour = 17
-        
-        # Get existing appointments for this date
-        existing_appointments = AppointmentRequest.query.filter(
-            AppointmentRequest.counselor_id == current_user.id,
-            func.date(AppointmentRequest.scheduled_date) == target_date,
-            AppointmentRequest.status.in_(['scheduled', 'assigned', 'blocked'])
-        ).all()
-        
-        occupied_times = []
-        for apt in existing_appointments:
-            if apt.scheduled_date:
-                start_time = apt.scheduled_date.time()
-                end_time = (apt.scheduled_date + timedelta(minutes=apt.duration or 60)).time()
-                occupied_times.append((start_time, end_time))
-        
-        # Check each 30-minute slot
-        current_time = datetime.combine(target_date, datetime.min.time().replace(hour=start_hour))
-        end_time = datetime.combine(target_date, datetime.min.time().replace(hour=end_hour))
-        
-        while current_time < end_time:
-            slot_time = current_time.time()
-            slot_end_time = (current_time + timedelta(minutes=duration)).time()
-            
-            # Skip lunch break (12:00-13:00)
-            if not (slot_time >= datetime.min.time().replace(hour=12) and 
-                   slot_time < datetime.min.time().replace(hour=13)):
-                
-                # Check if slot conflicts with existing appointments
-                is_available = True
-                for occ_start, occ_end in occupied_times:
-                    if (slot_time < occ_end and slot_end_time > occ_start):
-                        is_available = False
-                        break
-                
-                if is_available:
-                    available_slots.append(slot_time.strftime('%H:%M'))
-            
-            current_time += timedelta(minutes=30)
+        # Working hours, lunch, blocks, buffers and bookings all come from the availability engine
+        engine = AvailabilityEngine([current_user.id], target_date)
+        hours = engine.working_hours(current_user.id, target_date)
+        duration = duration or (hours['session_duration'] if hours else DEFAULT_WORKING_HOURS['session_duration'])
+        available_slots = [
+            slot.strftime('%H:%M')
+            for slot in engine.free_slots(current_user.id, target_date, duration, not_before=datetime.now())
+        ]
         
         return jsonify({
             'success': True,
@@ -3869,15 +5588,14 @@ def counselor_schedule():
         # Get basic statistics for initial page load
         today_appointments = AppointmentRequest.query.filter(
             AppointmentRequest.counselor_id == current_user.id,
-            func.date(AppointmentRequest.scheduled_date) == datetime.utcnow().date(),
+            day_range_filter(AppointmentRequest.scheduled_date, datetime.utcnow().date()),
             AppointmentRequest.status.in_(['scheduled', 'assigned'])
         ).count()
         
         week_start = datetime.utcnow().date() - timedelta(days=datetime.utcnow().weekday())
         week_appointments = AppointmentRequest.query.filter(
             AppointmentRequest.counselor_id == current_user.id,
-            func.date(AppointmentRequest.scheduled_date) >= week_start,
-            func.date(AppointmentRequest.scheduled_date) < week_start + timedelta(days=7),
+            day_range_filter(AppointmentRequest.scheduled_date, week_start, week_start + timedelta(days=6)),
             AppointmentRequest.status.in_(['scheduled', 'assigned'])
         ).count()
         
@@ -3922,10 +5640,9 @@ def api_counselor_calendar_month():
             last_day = datetime(year, month + 1, 1).date() - timedelta(days=1)
         
         # Get appointments for the month
-        appointments = AppointmentRequest.query.filter(
+        appointments = AppointmentRequest.query.options(db.joinedload(AppointmentRequest.user)).filter(
             AppointmentRequest.counselor_id == current_user.id,
-            func.date(AppointmentRequest.scheduled_date) >= first_day,
-            func.date(AppointmentRequest.scheduled_date) <= last_day,
+            day_range_filter(AppointmentRequest.scheduled_date, first_day, last_day),
             AppointmentRequest.status.in_(['scheduled', 'assigned'])
         ).all()
         
@@ -3975,14 +5692,13 @@ def api_counselor_schedule_refresh():
         stats = {
             'today_appointments': AppointmentRequest.query.filter(
                 AppointmentRequest.counselor_id == current_user.id,
-                func.date(AppointmentRequest.scheduled_date) == today,
+                day_range_filter(AppointmentRequest.scheduled_date, today),
                 AppointmentRequest.status.in_(['scheduled', 'assigned'])
             ).count(),
             
             'week_appointments': AppointmentRequest.query.filter(
                 AppointmentRequest.counselor_id == current_user.id,
-                func.date(AppointmentRequest.scheduled_date) >= week_start,
-                func.date(AppointmentRequest.scheduled_date) < week_start + timedelta(days=7),
+                day_range_filter(AppointmentRequest.scheduled_date, week_start, week_start + timedelta(days=6)),
                 AppointmentRequest.status.in_(['scheduled', 'assigned'])
             ).count(),
             
@@ -4081,7 +5797,7 @@ def api_counselor_schedule_notifications():
             func.count(AppointmentRequest.id).label('count')
         ).filter(
             AppointmentRequest.counselor_id == current_user.id,
-            func.date(AppointmentRequest.scheduled_date) >= today,
+            AppointmentRequest.scheduled_date >= datetime.combine(today, datetime.min.time()),
             AppointmentRequest.status.in_(['scheduled', 'assigned'])
         ).group_by(
             func.date(AppointmentRequest.scheduled_date),
@@ -4130,56 +5846,53 @@ def api_counselor_schedule_export():
         start_dt = datetime.strptime(start_date, '%Y-%m-%d')
         end_dt = datetime.strptime(end_date, '%Y-%m-%d')
         
-        # Get appointments in date range
-        appointments = AppointmentRequest.query\
-            .options(db.joinedload(AppointmentRequest.user))\
+        if export_format not in ('csv', 'excel'):
+            return jsonify({'success': False, 'message': 'Unsupported export format'}), 400
+        
+        # Appointments in date range, streamed as plain rows
+        query = db.session.query(
+            AppointmentRequest.scheduled_date,
+            AppointmentRequest.duration,
+            User.first_name,
+            User.last_name,
+            User.email,
+            AppointmentRequest.topic,
+            AppointmentRequest.status,
+            AppointmentRequest.mode,
+            AppointmentRequest.room_number,
+            AppointmentRequest.video_link,
+            AppointmentRequest.notes
+        ).outerjoin(User, User.id == AppointmentRequest.user_id)\
             .filter(
                 AppointmentRequest.counselor_id == current_user.id,
-                func.date(AppointmentRequest.scheduled_date) >= start_dt.date(),
-                func.date(AppointmentRequest.scheduled_date) <= end_dt.date(),
+                day_range_filter(AppointmentRequest.scheduled_date, start_dt.date(), end_dt.date()),
                 AppointmentRequest.status.in_(['scheduled', 'assigned', 'completed'])
-            ).order_by(AppointmentRequest.scheduled_date).all()
+            ).order_by(AppointmentRequest.scheduled_date)
+        
+        def schedule_row(row):
+            return [
+                row.scheduled_date.strftime('%Y-%m-%d'),
+                row.scheduled_date.strftime('%H:%M'),
+                row.duration or 60,
+                f"{row.first_name} {row.last_name}" if row.first_name is not None else 'N/A',
+                row.email or 'N/A',
+                row.topic or '',
+                row.status,
+                row.mode or 'in-person',
+                row.room_number or row.video_link or '',
+                row.notes or ''
+            ]
         
-        if export_format == 'csv':
-            import csv
-            import io
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # Write headers
-            writer.writerow([
+        return stream_export(
+            export_format,
+            [
                 'Date', 'Time', 'Duration', 'Student Name', 'Student Email',
                 'Topic', 'Status', 'Mode', 'Room/Link', 'Notes'
-            ])
-            
-            # Write data
-            for appointment in appointments:
-                writer.writerow([
-                    appointment.scheduled_date.strftime('%Y-%m-%d'),
-                    appointment.scheduled_date.strftime('%H:%M'),
-                    appointment.duration or 60,
-                    appointment.user.get_full_name() if appointment.user else 'N/A',
-                    appointment.user.email if appointment.user else 'N/A',
-                    appointment.topic or '',
-                    appointment.status,
-                    getattr(appointment, 'mode', 'in-person'),
-                    getattr(appointment, 'room_number', '') or getattr(appointment, 'video_link', ''),
-                    appointment.notes or ''
-                ])
-            
-            output.seek(0)
-            
-            return Response(
-                output.getvalue(),
-                mimetype='text/csv',
-                headers={
-                    'Content-Disposition': f'attachment; filename=schedule_{start_date}_to_{end_date}.csv'
-                }
-            )
-        
-        else:
-            return jsonify({'success': False, 'message': 'Unsupported export format'}), 400
+            ],
+            iter_export_rows(query, schedule_row),
+            f'schedule_{start_date}_to_{end_date}',
+            sheet_name='Schedule'
+        )
         
     except Exception as e:
         app.logger.error(f"Error exporting schedule: {str(e)}")
@@ -4316,172 +6029,176 @@ def get_time_ago(timestamp):
 #initialize_counselor_system()
 
 # =============================================================================
-#  ADMIN DASHBOARD ROUTES - COMPLETE SOLUTION
+# DASHBOARD METRICS ENGINE
 # =============================================================================
-@app.route('/admin-dashboard')
-@login_required
-@role_required('admin')
-def admin_dashboard():
-    """FIXED: Admin dashboard with proper error handling and model consistency"""
-    from sqlalchemy import func, text
-    from datetime import datetime, timedelta
-    
+
+def get_dashboard_metrics(now=None):
+    """Compute every admin dashboard KPI with a handful of aggregate queries.
+
+    Counts, the 7-day registration chart, the 6-month trend and the mood
+    distribution are all derived from GROUP BY / CASE WHEN aggregates, so the
+    cost no longer grows with the size of the user or assessment tables.
+    """
+    now = now or datetime.utcnow()
+    today = now.date()
+    today_start = datetime.combine(today, datetime.min.time())
+    tomorrow_start = today_start + timedelta(days=1)
+    week_ago = now - timedelta(days=7)
+
+    # Window start for the monthly trend: first day of the month five months back
+    first_month, first_year = today.month - 5, today.year
+    if first_month <= 0:
+        first_month += 12
+        first_year -= 1
+    months_start = datetime(first_year, first_month, 1)
+
+    metrics = {
+        'total_users': 0,
+        'new_users_today': 0,
+        'total_counselors': 0,
+        'total_assessments': 0,
+        'assessments_this_week': 0,
+        'mood_positive': 0,
+        'mood_neutral': 0,
+        'mood_needs_support': 0,
+        'upcoming_appointments': 0,
+        'appointments_today': 0,
+        'pending_appointments': 0,
+        'chart_labels': [],
+        'chart_data': [],
+        'monthly_labels': [],
+        'monthly_data': []
+    }
+
+    # Users: totals in one pass, then daily registration buckets for the trend window
+    daily_signups = {}
     try:
-        print("🔧 Loading admin dashboard...")
-        
-        # BASIC STATISTICS with error handling
-        total_users = 0
-        total_counselors = 0
-        total_assessments = 0
-        upcoming_appointments = 0
-        recent_users = []
-        
-        try:
-            total_users = User.query.filter(User.role != 'admin').count()
-            print(f"✅ Found {total_users} users")
-        except Exception as e:
-            print(f"❌ User query failed: {e}")
+        total, new_today = db.session.query(
+            func.count(User.id),
+            func.sum(case((User.created_at >= today_start, 1), else_=0))
+        ).filter(User.role != 'admin').one()
+        metrics['total_users'] = total or 0
+        metrics['new_users_today'] = new_today or 0
+
+        rows = db.session.query(
+            func.date(User.created_at),
+            func.count(User.id)
+        ).filter(
+            User.role != 'admin',
+            User.created_at >= min(months_start, today_start - timedelta(days=6))
+        ).group_by(func.date(User.created_at)).all()
+        daily_signups = {day: count for day, count in rows if day}
+    except Exception as e:
+        app.logger.error(f"User metrics query failed: {e}")
+
+    for i in range(7):
+        day = today - timedelta(days=6 - i)
+        metrics['chart_labels'].append(day.strftime('%a'))
+        metrics['chart_data'].append(daily_signups.get(day.isoformat(), 0))
+
+    monthly_totals = {}
+    for day, count in daily_signups.items():
+        monthly_totals[day[:7]] = monthly_totals.get(day[:7], 0) + count
+
+    year, month = first_year, first_month
+    for _ in range(6):
+        metrics['monthly_labels'].append(datetime(year, month, 1).strftime('%b'))
+        metrics['monthly_data'].append(monthly_totals.get(f"{year:04d}-{month:02d}", 0))
+        month += 1
+        if month > 12:
+            month = 1
+            year += 1
 
-        try:
-            total_counselors = Counselor.query.filter_by(is_active=True).count()
-            print(f"✅ Found {total_counselors} counselors")
-        except Exception as e:
-            print(f"❌ Counselor query failed: {e}")
+    try:
+        metrics['total_counselors'] = Counselor.query.filter_by(is_active=True).count()
+    except Exception as e:
+        app.logger.error(f"Counselor query failed: {e}")
 
-        try:
-            total_assessments = Assessment.query.count()
-            print(f"✅ Found {total_assessments} assessments")
-        except Exception as e:
-            print(f"❌ Assessment query failed: {e}")
+    # Assessments: totals and mood buckets (lower scores are better)
+    try:
+        total, this_week, positive, neutral, needs_support = db.session.query(
+            func.count(Assessment.id),
+            func.sum(case((Assessment.created_at >= week_ago, 1), else_=0)),
+            func.sum(case((Assessment.score <= 3, 1), else_=0)),
+            func.sum(case((and_(Assessment.score > 3, Assessment.score <= 6), 1), else_=0)),
+            func.sum(case((Assessment.score > 6, 1), else_=0))
+        ).one()
+        metrics['total_assessments'] = total or 0
+        metrics['assessments_this_week'] = this_week or 0
+        metrics['mood_positive'] = positive or 0
+        metrics['mood_neutral'] = neutral or 0
+        metrics['mood_needs_support'] = needs_support or 0
+    except Exception as e:
+        app.logger.error(f"Assessment metrics query failed: {e}")
 
-        # Try AppointmentRequest first, then Appointment
+    # Appointments: upcoming, today and pending in a single scan
+    try:
+        upcoming, todays, pending = db.session.query(
+            func.sum(case((and_(AppointmentRequest.scheduled_date > now,
+                                AppointmentRequest.status.in_(['scheduled', 'assigned'])), 1), else_=0)),
+            func.sum(case((and_(AppointmentRequest.scheduled_date >= today_start,
+                                AppointmentRequest.scheduled_date < tomorrow_start), 1), else_=0)),
+            func.sum(case((AppointmentRequest.status == 'pending', 1), else_=0))
+        ).one()
+        metrics['upcoming_appointments'] = upcoming or 0
+        metrics['appointments_today'] = todays or 0
+        metrics['pending_appointments'] = pending or 0
+    except Exception as e:
+        app.logger.warning(f"AppointmentRequest metrics query failed: {e}")
+        db.session.rollback()
         try:
-            upcoming_appointments = AppointmentRequest.query.filter(
-                AppointmentRequest.scheduled_date > datetime.utcnow(),
-                AppointmentRequest.status.in_(['scheduled', 'assigned'])
+            metrics['upcoming_appointments'] = Appointment.query.filter(
+                Appointment.appointment_date > now,
+                Appointment.status == 'scheduled'
             ).count()
-            print(f"✅ Found {upcoming_appointments} upcoming appointments (AppointmentRequest)")
-        except Exception as e:
-            print(f"⚠️ AppointmentRequest query failed: {e}")
-            try:
-                upcoming_appointments = Appointment.query.filter(
-                    Appointment.appointment_date > datetime.utcnow(),
-                    Appointment.status == 'scheduled'
-                ).count()
-                print(f"✅ Found {upcoming_appointments} upcoming appointments (Appointment)")
-            except Exception as e2:
-                print(f"❌ Both appointment queries failed: {e2}")
+        except Exception as e2:
+            app.logger.error(f"Both appointment queries failed: {e2}")
+
+    return metrics
+
+# =============================================================================
+#  ADMIN DASHBOARD ROUTES - COMPLETE SOLUTION
+# =============================================================================
+@app.route('/admin-dashboard')
+@login_required
+@role_required('admin')
+def admin_dashboard():
+    """Admin dashboard backed by the aggregated dashboard metrics engine"""
+    try:
+        metrics = get_dashboard_metrics()
 
         # Recent users
+        recent_users = []
         try:
             recent_users = User.query.filter(User.role != 'admin')\
                 .order_by(User.created_at.desc()).limit(10).all()
-            print(f"✅ Found {len(recent_users)} recent users")
-        except Exception as e:
-            print(f"❌ Recent users query failed: {e}")
-
-        # CHART DATA - Last 7 Days Registration
-        chart_labels = []
-        chart_data = []
-        
-        for i in range(7):
-            date = (datetime.utcnow() - timedelta(days=6-i)).date()
-            chart_labels.append(date.strftime('%a'))
-            
-            try:
-                start_of_day = datetime.combine(date, datetime.min.time())
-                end_of_day = datetime.combine(date, datetime.max.time())
-                
-                count = User.query.filter(
-                    User.role != 'admin',
-                    User.created_at >= start_of_day,
-                    User.created_at <= end_of_day
-                ).count()
-                chart_data.append(count)
-            except:
-                chart_data.append(0)
-
-        # MOOD ASSESSMENT DISTRIBUTION
-        mood_positive = 0
-        mood_neutral = 0 
-        mood_needs_support = 0
-        
-        try:
-            assessments = Assessment.query.all()
-            for assessment in assessments:
-                # Assuming lower scores are better (typical for depression/anxiety scales)
-                if assessment.score <= 3:
-                    mood_positive += 1
-                elif assessment.score <= 6:
-                    mood_neutral += 1
-                else:
-                    mood_needs_support += 1
-            print(f"✅ Mood distribution: {mood_positive}/{mood_neutral}/{mood_needs_support}")
         except Exception as e:
-            print(f"❌ Mood assessment query failed: {e}")
-
-        # MONTHLY TRENDS - Last 6 Months 
-        monthly_labels = []
-        monthly_data = []
-        
-        for i in range(6):
-            try:
-                today = datetime.utcnow()
-                target_month = today.month - i
-                target_year = today.year
-                
-                if target_month <= 0:
-                    target_month += 12
-                    target_year -= 1
-                
-                month_start = datetime(target_year, target_month, 1)
-                if target_month == 12:
-                    month_end = datetime(target_year + 1, 1, 1) - timedelta(seconds=1)
-                else:
-                    month_end = datetime(target_year, target_month + 1, 1) - timedelta(seconds=1)
-                
-                monthly_labels.insert(0, month_start.strftime('%b'))
-                
-                count = User.query.filter(
-                    User.role != 'admin',
-                    User.created_at >= month_start,
-                    User.created_at <= month_end
-                ).count()
-                
-                monthly_data.insert(0, count)
-            except:
-                monthly_labels.insert(0, f'M{i+1}')
-                monthly_data.insert(0, 0)
+            app.logger.error("Recent users query failed: %s", e)
 
-        print(f"✅ Dashboard data compiled successfully:")
-        print(f"   - Users: {total_users}")
-        print(f"   - Counselors: {total_counselors}")
-        print(f"   - Upcoming Appointments: {upcoming_appointments}")
-        print(f"   - Assessments: {total_assessments}")
+        app.logger.debug("Admin dashboard: users=%s appointments=%s assessments=%s",
+                         metrics['total_users'], metrics['upcoming_appointments'], metrics['total_assessments'])
 
         return render_template('admin_dashboard.html',
                              # Basic stats
-                             total_users=total_users,
-                             total_counselors=total_counselors,
-                             total_assessments=total_assessments,
-                             upcoming_appointments=upcoming_appointments,
+                             total_users=metrics['total_users'],
+                             total_counselors=metrics['total_counselors'],
+                             total_assessments=metrics['total_assessments'],
+                             upcoming_appointments=metrics['upcoming_appointments'],
                              recent_users=recent_users,
                              
                              # Chart data for JavaScript
-                             chart_labels=chart_labels,
-                             chart_data=chart_data,
-                             monthly_labels=monthly_labels,
-                             monthly_data=monthly_data,
+                             chart_labels=metrics['chart_labels'],
+                             chart_data=metrics['chart_data'],
+                             monthly_labels=metrics['monthly_labels'],
+                             monthly_data=metrics['monthly_data'],
                              
                              # Mood assessment data
-                             mood_positive=mood_positive,
-                             mood_neutral=mood_neutral,
-                             mood_needs_support=mood_needs_support)
+                             mood_positive=metrics['mood_positive'],
+                             mood_neutral=metrics['mood_neutral'],
+                             mood_needs_support=metrics['mood_needs_support'])
 
-    except Exception as e:
-        print(f"❌ Dashboard error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        app.logger.exception("Admin dashboard failed")
         
         # Return dashboard with safe fallback data
         flash('Dashboard loaded with limited data due to an error. Check console for details.', 'warning')
@@ -4504,152 +6221,34 @@ def admin_dashboard():
 @login_required
 @role_required('admin')
 def admin_dashboard_data():
-    """FIXED: API endpoint for AJAX dashboard refreshes with error handling"""
-    from sqlalchemy import func
-    from datetime import datetime, timedelta
-    
+    """API endpoint for AJAX dashboard refreshes, served from the dashboard metrics engine"""
     try:
-        print("🔄 Refreshing dashboard data...")
-        
-        # Initialize with safe defaults
+        metrics = get_dashboard_metrics()
+
         response_data = {
             'success': True,
             'timestamp': datetime.utcnow().isoformat(),
-            'totalUsers': 0,
-            'totalCounselors': 0,
-            'totalAssessments': 0,
-            'upcomingAppointments': 0,
-            'chartLabels': [],
-            'chartData': [],
-            'moodPositive': 0,
-            'moodNeutral': 0,
-            'moodNeedsSupport': 0,
-            'newUsersToday': 0,
-            'appointmentsToday': 0,
-            'assessmentsThisWeek': 0,
-            'pendingAppointments': 0,
+            'totalUsers': metrics['total_users'],
+            'totalCounselors': metrics['total_counselors'],
+            'totalAssessments': metrics['total_assessments'],
+            'upcomingAppointments': metrics['upcoming_appointments'],
+            'chartLabels': metrics['chart_labels'],
+            'chartData': metrics['chart_data'],
+            'moodPositive': metrics['mood_positive'],
+            'moodNeutral': metrics['mood_neutral'],
+            'moodNeedsSupport': metrics['mood_needs_support'],
+            'newUsersToday': metrics['new_users_today'],
+            'appointmentsToday': metrics['appointments_today'],
+            'assessmentsThisWeek': metrics['assessments_this_week'],
+            'pendingAppointments': metrics['pending_appointments'],
             'systemStatus': 'healthy',
             'lastUpdate': datetime.utcnow().strftime('%H:%M:%S')
         }
-        
-        # Get fresh basic statistics with individual error handling
-        try:
-            response_data['totalUsers'] = User.query.filter(User.role != 'admin').count()
-        except Exception as e:
-            print(f"Error getting user count: {e}")
-            
-        try:
-            response_data['totalCounselors'] = Counselor.query.filter_by(is_active=True).count()
-        except Exception as e:
-            print(f"Error getting counselor count: {e}")
-            
-        try:
-            response_data['totalAssessments'] = Assessment.query.count()
-        except Exception as e:
-            print(f"Error getting assessment count: {e}")
-
-        # Upcoming appointments with fallback
-        try:
-            response_data['upcomingAppointments'] = AppointmentRequest.query.filter(
-                AppointmentRequest.scheduled_date > datetime.utcnow(),
-                AppointmentRequest.status.in_(['scheduled', 'assigned'])
-            ).count()
-        except Exception as e:
-            print(f"Error getting upcoming appointments: {e}")
-            # Fallback to Appointment model
-            try:
-                response_data['upcomingAppointments'] = Appointment.query.filter(
-                    Appointment.appointment_date > datetime.utcnow(),
-                    Appointment.status == 'scheduled'
-                ).count()
-            except Exception as e2:
-                print(f"Both appointment models failed: {e2}")
-
-        # Fresh registration data for chart (last 7 days)
-        try:
-            chart_labels = []
-            chart_data = []
-            
-            for i in range(7):
-                date = (datetime.utcnow() - timedelta(days=6-i)).date()
-                chart_labels.append(date.strftime('%a'))
-                
-                start_of_day = datetime.combine(date, datetime.min.time())
-                end_of_day = datetime.combine(date, datetime.max.time())
-                
-                count = User.query.filter(
-                    User.role != 'admin',
-                    User.created_at >= start_of_day,
-                    User.created_at <= end_of_day
-                ).count()
-                
-                chart_data.append(count)
-            
-            response_data['chartLabels'] = chart_labels
-            response_data['chartData'] = chart_data
-        except Exception as e:
-            print(f"Error getting chart data: {e}")
-
-        # Fresh mood assessment data
-        try:
-            assessments = Assessment.query.all()
-            
-            mood_positive = 0
-            mood_neutral = 0
-            mood_needs_support = 0
-            
-            for assessment in assessments:
-                if assessment.score <= 3:
-                    mood_positive += 1
-                elif assessment.score <= 6:
-                    mood_neutral += 1
-                else:
-                    mood_needs_support += 1
-            
-            response_data['moodPositive'] = mood_positive
-            response_data['moodNeutral'] = mood_neutral
-            response_data['moodNeedsSupport'] = mood_needs_support
-        except Exception as e:
-            print(f"Error getting mood data: {e}")
-
-        # Additional metrics with individual error handling
-        today = datetime.utcnow().date()
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        
-        try:
-            response_data['newUsersToday'] = User.query.filter(
-                User.role != 'admin',
-                User.created_at >= datetime.combine(today, datetime.min.time())  # FIXED: Use datetime.combine
-            ).count()
-        except Exception as e:
-            print(f"Error getting new users today: {e}")
-            
-        try:
-            response_data['appointmentsToday'] = AppointmentRequest.query.filter(
-                func.date(AppointmentRequest.scheduled_date) == today
-            ).count()
-        except Exception as e:
-            print(f"Error getting appointments today: {e}")
-            
-        try:
-            response_data['assessmentsThisWeek'] = Assessment.query.filter(
-                Assessment.created_at >= week_ago
-            ).count()
-        except Exception as e:
-            print(f"Error getting assessments this week: {e}")
-            
-        try:
-            response_data['pendingAppointments'] = AppointmentRequest.query.filter_by(status='pending').count()
-        except Exception as e:
-            print(f"Error getting pending appointments: {e}")
 
-        print(f"✅ Fresh data compiled: Users={response_data['totalUsers']}, Appointments={response_data['upcomingAppointments']}")
         return jsonify(response_data)
         
     except Exception as e:
-        print(f"❌ Dashboard data API error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Dashboard data API error: {str(e)}")
         
         return jsonify({
             'success': False,
@@ -4690,7 +6289,7 @@ def api_admin_dashboard_quick_stats():
                     User.last_login >= week_ago
                 ).count()
         except Exception as e:
-            print(f"User stats error: {e}")
+            app.logger.error(f"User stats error: {e}")
         
         # Appointment statistics
         try:
@@ -4701,11 +6300,11 @@ def api_admin_dashboard_quick_stats():
                 AppointmentRequest.status.in_(['scheduled', 'assigned'])
             ).count()
             stats['appointments']['today'] = AppointmentRequest.query.filter(
-                func.date(AppointmentRequest.scheduled_date) == datetime.utcnow().date()
+                day_range_filter(AppointmentRequest.scheduled_date, datetime.utcnow().date())
             ).count()
             stats['appointments']['pending'] = AppointmentRequest.query.filter_by(status='pending').count()
         except Exception as e:
-            print(f"AppointmentRequest stats error: {e}")
+            app.logger.error(f"AppointmentRequest stats error: {e}")
             # Fallback to Appointment model
             try:
                 stats['appointments']['total'] = Appointment.query.count()
@@ -4717,7 +6316,7 @@ def api_admin_dashboard_quick_stats():
                     func.date(Appointment.appointment_date) == datetime.utcnow().date()
                 ).count()
             except Exception as e2:
-                print(f"Both appointment models failed: {e2}")
+                app.logger.error(f"Both appointment models failed: {e2}")
         
         # Assessment statistics
         try:
@@ -4726,14 +6325,14 @@ def api_admin_dashboard_quick_stats():
                 Assessment.created_at >= datetime.utcnow() - timedelta(days=7)
             ).count()
         except Exception as e:
-            print(f"Assessment stats error: {e}")
+            app.logger.error(f"Assessment stats error: {e}")
         
         # Counselor statistics
         try:
             stats['counselors']['total'] = Counselor.query.count()
             stats['counselors']['active'] = Counselor.query.filter_by(is_active=True).count()
         except Exception as e:
-            print(f"Counselor stats error: {e}")
+            app.logger.error(f"Counselor stats error: {e}")
         
         return jsonify({
             'success': True,
@@ -4742,9 +6341,7 @@ def api_admin_dashboard_quick_stats():
         })
         
     except Exception as e:
-        print(f"Quick stats error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Quick stats error: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
@@ -4988,14 +6585,14 @@ def api_admin_appointments():
         if date_filter:
             today = date.today()
             if date_filter == 'today':
-                query = query.filter(func.date(AppointmentRequest.scheduled_date) == today)
+                query = query.filter(day_range_filter(AppointmentRequest.scheduled_date, today))
             elif date_filter == 'tomorrow':
                 tomorrow = today + timedelta(days=1)
-                query = query.filter(func.date(AppointmentRequest.scheduled_date) == tomorrow)
+                query = query.filter(day_range_filter(AppointmentRequest.scheduled_date, tomorrow))
             elif date_filter == 'this-week':
                 week_start = today - timedelta(days=today.weekday())
                 week_end = week_start + timedelta(days=6)
-                query = query.filter(func.date(AppointmentRequest.scheduled_date).between(week_start, week_end))
+                query = query.filter(day_range_filter(AppointmentRequest.scheduled_date, week_start, week_end))
             elif date_filter == 'overdue':
                 query = query.filter(
                     AppointmentRequest.scheduled_date < datetime.now(),
@@ -5082,9 +6679,7 @@ def api_admin_appointments():
         })
         
     except Exception as e:
-        app.logger.error(f"Error in api_admin_appointments: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Error in api_admin_appointments: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/admin/appointments/<int:appointment_id>')
@@ -5281,7 +6876,7 @@ def api_create_appointment():
                 send_counselor_notification(counselor.email, appointment, 'assigned')
                 
         except Exception as e:
-            print(f"Failed to send notifications: {e}")
+            app.logger.error(f"Failed to send notifications: {e}")
         
         return jsonify({
             'success': True,
@@ -5397,7 +6992,7 @@ def api_update_appointment(appointment_id):
         
         # Send notifications for significant changes
         try:
-            student = appointment.student
+            student = appointment.user
             
             # Notify if counselor changed
             if original_counselor != appointment.counselor_id:
@@ -5422,7 +7017,7 @@ def api_update_appointment(appointment_id):
                     send_counselor_notification(appointment.counselor.email, appointment, appointment.status)
                     
         except Exception as e:
-            print(f"Failed to send notifications: {e}")
+            app.logger.error(f"Failed to send notifications: {e}")
         
         return jsonify({
             'success': True,
@@ -5473,6 +7068,97 @@ def api_delete_appointment(appointment_id):
 # COUNSELOR STUDENTS ROUTES 
 # =============================================================================
 
+# =============================================================================
+# COUNSELOR CASELOAD
+# =============================================================================
+
+def counselor_caseload_subquery(counselor_id, now=None):
+    """One row per student a counselor has seen, with session stats computed by window functions.
+
+    Columns: user_id, total_sessions, completed_sessions, last_completed_at,
+    has_upcoming, next_appointment_id, next_session_date.
+    """
+    now = now or datetime.utcnow()
+    per_student = AppointmentRequest.user_id
+    is_upcoming = case((
+        and_(
+            AppointmentRequest.scheduled_date > now,
+            AppointmentRequest.status.in_(['scheduled', 'assigned'])
+        ), 1
+    ), else_=0)
+
+    ranked = db.session.query(
+        per_student.label('user_id'),
+        AppointmentRequest.id.label('appointment_id'),
+        AppointmentRequest.scheduled_date.label('scheduled_date'),
+        is_upcoming.label('is_upcoming'),
+        func.count(AppointmentRequest.id).over(partition_by=per_student).label('total_sessions'),
+        func.sum(case((AppointmentRequest.status == 'completed', 1), else_=0))
+            .over(partition_by=per_student).label('completed_sessions'),
+        type_coerce(
+            func.max(case((AppointmentRequest.status == 'completed', AppointmentRequest.completed_at)))
+                .over(partition_by=per_student),
+            db.DateTime
+        ).label('last_completed_at'),
+        # The soonest upcoming session ranks first; students with none get an arbitrary row
+        func.row_number().over(
+            partition_by=per_student,
+            order_by=(is_upcoming.desc(), AppointmentRequest.scheduled_date)
+        ).label('row_rank')
+    ).filter(AppointmentRequest.counselor_id == counselor_id).subquery()
+
+    return db.session.query(
+        ranked.c.user_id,
+        ranked.c.total_sessions,
+        ranked.c.completed_sessions,
+        ranked.c.last_completed_at,
+        ranked.c.is_upcoming.label('has_upcoming'),
+        case((ranked.c.is_upcoming == 1, ranked.c.appointment_id)).label('next_appointment_id'),
+        type_coerce(case((ranked.c.is_upcoming == 1, ranked.c.scheduled_date)), db.DateTime).label('next_session_date')
+    ).filter(ranked.c.row_rank == 1).subquery()
+
+
+def counselor_caseload_query(counselor_id, search_term=None, status_filter='all', now=None):
+    """(User, caseload row) pairs for a counselor's students, filterable on the aggregated values.
+
+    status_filter: 'active' (has an upcoming session), 'completed' (none upcoming) or 'all'.
+    """
+    caseload = counselor_caseload_subquery(counselor_id, now)
+    query = db.session.query(User, caseload).join(caseload, caseload.c.user_id == User.id)
+
+    if search_term:
+        search_pattern = f"%{search_term}%"
+        query = query.filter(or_(
+            (User.first_name + ' ' + User.last_name).ilike(search_pattern),
+            User.email.ilike(search_pattern),
+            User.student_id.ilike(search_pattern),
+            User.course.ilike(search_pattern)
+        ))
+
+    if status_filter == 'active':
+        query = query.filter(caseload.c.has_upcoming == 1)
+    elif status_filter == 'completed':
+        query = query.filter(caseload.c.has_upcoming == 0)
+
+    return query.order_by(User.last_name, User.first_name)
+
+
+def caseload_stats(row):
+    """Session statistics for one caseload row, in the shape the students pages use."""
+    total_sessions = row.total_sessions or 0
+    completed_sessions = row.completed_sessions or 0
+    return {
+        'total_sessions': total_sessions,
+        'completed_sessions': completed_sessions,
+        'completion_rate': round((completed_sessions / total_sessions * 100) if total_sessions > 0 else 0, 1),
+        'upcoming_appointment': {
+            'id': row.next_appointment_id,
+            'scheduled_date': row.next_session_date
+        } if row.has_upcoming else None,
+        'last_session': row.last_completed_at
+    }
+
+
 @app.route('/counselor/students')
 @login_required
 @counselor_required
@@ -5483,72 +7169,13 @@ def counselor_students():
             flash('Access denied. Counselors only.', 'error')
             return redirect(url_for('login'))
         
-        print(f"🔍 Loading students for counselor: {current_user.username}")
-        
-        # Get all students who have had appointments with this counselor
-        students_query = db.session.query(User)\
-            .join(AppointmentRequest, User.id == AppointmentRequest.user_id)\
-            .filter(AppointmentRequest.counselor_id == current_user.id)\
-            .distinct()
-        
-        students = students_query.all()
-        print(f"📊 Found {len(students)} students")
-        
-        # Prepare student data with statistics
+        # All students who have had appointments with this counselor, with their session stats
         students_data = []
-        for student in students:
-            try:
-                # Get total appointments for this student with this counselor
-                total_appointments = AppointmentRequest.query.filter_by(
-                    user_id=student.id,
-                    counselor_id=current_user.id
-                ).count()
-                
-                # Get completed sessions
-                completed_sessions = AppointmentRequest.query.filter_by(
-                    user_id=student.id,
-                    counselor_id=current_user.id,
-                    status='completed'
-                ).count()
-                
-                # Calculate completion rate
-                completion_rate = round((completed_sessions / total_appointments * 100) if total_appointments > 0 else 0, 1)
-                
-                # Get upcoming appointment
-                upcoming_appointment = AppointmentRequest.query.filter(
-                    AppointmentRequest.user_id == student.id,
-                    AppointmentRequest.counselor_id == current_user.id,
-                    AppointmentRequest.scheduled_date > datetime.utcnow(),
-                    AppointmentRequest.status.in_(['scheduled', 'assigned'])
-                ).order_by(AppointmentRequest.scheduled_date).first()
-                
-                # Get last session date
-                last_session = AppointmentRequest.query.filter_by(
-                    user_id=student.id,
-                    counselor_id=current_user.id,
-                    status='completed'
-                ).order_by(AppointmentRequest.completed_at.desc()).first()
-                
-                students_data.append({
-                    'student': student,
-                    'total_sessions': total_appointments,
-                    'completed_sessions': completed_sessions,
-                    'completion_rate': completion_rate,
-                    'upcoming_appointment': upcoming_appointment,
-                    'last_session': last_session.completed_at if last_session else None
-                })
-                
-            except Exception as e:
-                print(f"⚠️ Error processing student {student.id}: {e}")
-                # Add student with default values if there's an error
-                students_data.append({
-                    'student': student,
-                    'total_sessions': 0,
-                    'completed_sessions': 0,
-                    'completion_rate': 0,
-                    'upcoming_appointment': None,
-                    'last_session': None
-                })
+        for row in counselor_caseload_query(current_user.id).all():
+            student_data = caseload_stats(row)
+            student_data['student'] = row.User
+            students_data.append(student_data)
+        students = [student_data['student'] for student_data in students_data]
         
         # Calculate overall statistics
         stats = {
@@ -5557,17 +7184,14 @@ def counselor_students():
             'total_sessions': sum(s['total_sessions'] for s in students_data),
             'avg_sessions_per_student': round(sum(s['total_sessions'] for s in students_data) / len(students_data) if students_data else 0, 1)
         }
-        
-        print(f"✅ Stats calculated: {stats}")
+        app.logger.debug("Counselor %s caseload: %s", current_user.id, stats)
         
         return render_template('counselor_students.html', 
                              students=students_data,
                              stats=stats)
         
     except Exception as e:
-        app.logger.error(f"Error loading counselor students: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Error loading counselor students: {str(e)}")
         flash('Error loading students page. Please try again.', 'error')
         return redirect(url_for('counselor_dashboard'))
 
@@ -5581,7 +7205,7 @@ def counselor_student_details(student_id):
         if not isinstance(current_user, Counselor):
             return jsonify({'success': False, 'message': 'Access denied'}), 403
         
-        print(f"🔍 Getting details for student {student_id}")
+        app.logger.debug("Counselor %s viewing student %s", current_user.id, student_id)
         
         # Verify this student has appointments with this counselor
         student = User.query.get_or_404(student_id)
@@ -5638,9 +7262,7 @@ def counselor_student_details(student_id):
         })
         
     except Exception as e:
-        app.logger.error(f"Error fetching student details: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Error fetching student details: {str(e)}")
         return jsonify({'success': False, 'message': 'Failed to fetch student details'}), 500
 
 
@@ -5654,106 +7276,51 @@ def export_counselor_students():
             flash('Access denied. Counselors only.', 'error')
             return redirect(url_for('counselor_dashboard'))
         
-        # Get students data
-        students_query = db.session.query(User)\
-            .join(AppointmentRequest, User.id == AppointmentRequest.user_id)\
-            .filter(AppointmentRequest.counselor_id == current_user.id)\
-            .distinct()
-        
-        students = students_query.all()
-        
-        # Create CSV data
-        import csv
-        import io
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write headers
-        writer.writerow([
-            'Student Name', 'Student ID', 'Email', 'Course', 'Year',
-            'Total Sessions', 'Completed Sessions', 'Completion Rate (%)',
-            'Last Session Date', 'Next Session Date'
-        ])
-        
-        # Write student data
-        for student in students:
-            try:
-                # Calculate stats for each student
-                total_appointments = AppointmentRequest.query.filter_by(
-                    user_id=student.id,
-                    counselor_id=current_user.id
-                ).count()
-                
-                completed_sessions = AppointmentRequest.query.filter_by(
-                    user_id=student.id,
-                    counselor_id=current_user.id,
-                    status='completed'
-                ).count()
-                
-                completion_rate = round((completed_sessions / total_appointments * 100) if total_appointments > 0 else 0, 1)
-                
-                # Get last and next session
-                last_session = AppointmentRequest.query.filter_by(
-                    user_id=student.id,
-                    counselor_id=current_user.id,
-                    status='completed'
-                ).order_by(AppointmentRequest.completed_at.desc()).first()
-                
-                next_session = AppointmentRequest.query.filter(
-                    AppointmentRequest.user_id == student.id,
-                    AppointmentRequest.counselor_id == current_user.id,
-                    AppointmentRequest.scheduled_date > datetime.utcnow(),
-                    AppointmentRequest.status.in_(['scheduled', 'assigned'])
-                ).order_by(AppointmentRequest.scheduled_date).first()
-                
-                writer.writerow([
-                    student.get_full_name(),
-                    getattr(student, 'student_id', 'N/A'),
-                    student.email,
-                    getattr(student, 'course', 'N/A'),
-                    getattr(student, 'year_of_study', 'N/A'),
-                    total_appointments,
-                    completed_sessions,
-                    completion_rate,
-                    last_session.completed_at.strftime('%Y-%m-%d') if last_session and last_session.completed_at else 'Never',
-                    next_session.scheduled_date.strftime('%Y-%m-%d %H:%M') if next_session else 'None scheduled'
-                ])
-                
-            except Exception as e:
-                print(f"⚠️ Error exporting student {student.id}: {e}")
-                # Write row with error indicator
-                writer.writerow([
-                    student.get_full_name(),
-                    getattr(student, 'student_id', 'N/A'),
-                    student.email,
-                    'Error loading data',
-                    '',
-                    0,
-                    0,
-                    0,
-                    'Error',
-                    'Error'
-                ])
+        export_format = request.args.get('format', 'csv')
         
-        output.seek(0)
+        # Per-student session stats from the caseload query, streamed row by row
+        caseload = counselor_caseload_subquery(current_user.id)
+        query = db.session.query(
+            User.first_name,
+            User.last_name,
+            User.student_id,
+            User.email,
+            User.course,
+            User.year_of_study,
+            caseload
+        ).join(caseload, caseload.c.user_id == User.id)\
+            .order_by(User.last_name, User.first_name)
+        
+        def student_row(row):
+            stats = caseload_stats(row)
+            next_session = stats['upcoming_appointment']['scheduled_date'] if stats['upcoming_appointment'] else None
+            return [
+                f"{row.first_name} {row.last_name}",
+                row.student_id or 'N/A',
+                row.email,
+                row.course or 'N/A',
+                row.year_of_study or 'N/A',
+                stats['total_sessions'],
+                stats['completed_sessions'],
+                stats['completion_rate'],
+                stats['last_session'].strftime('%Y-%m-%d') if stats['last_session'] else 'Never',
+                next_session.strftime('%Y-%m-%d %H:%M') if next_session else 'None scheduled'
+            ]
         
-        # Create response
-        from flask import Response
-        response = Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                'Content-Disposition': f'attachment; filename=my_students_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-            }
+        return stream_export(
+            export_format,
+            [
+                'Student Name', 'Student ID', 'Email', 'Course', 'Year',
+                'Total Sessions', 'Completed Sessions', 'Completion Rate (%)',
+                'Last Session Date', 'Next Session Date'
+            ],
+            iter_export_rows(query, student_row),
+            f'my_students_{datetime.now().strftime("%Y%m%d_%H%M%S")}',
+            sheet_name='Students'
         )
         
-        return response
-        
     except Exception as e:
-        app.logger.error(f"Error exporting students data: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Error exporting students data: {str(e)}")
         flash('Error exporting data. Please try again.', 'error')
         return redirect(url_for('counselor_students'))
 
@@ -5830,54 +7397,18 @@ def api_counselor_students_search():
         search_term = request.args.get('q', '').strip()
         status_filter = request.args.get('status', 'all')  # all, active, completed
         
-        # Base query - students with appointments
-        base_query = db.session.query(User)\
-            .join(AppointmentRequest, User.id == AppointmentRequest.user_id)\
-            .filter(AppointmentRequest.counselor_id == current_user.id)
-        
-        # Apply search filter
-        if search_term:
-            search_pattern = f"%{search_term}%"
-            base_query = base_query.filter(
-                db.or_(
-                    func.concat(User.first_name, ' ', User.last_name).ilike(search_pattern),
-                    User.email.ilike(search_pattern),
-                    User.student_id.ilike(search_pattern),
-                    User.course.ilike(search_pattern)
-                )
-            )
-        
-        # Get distinct students
-        students = base_query.distinct().all()
-        
-        # Filter by status if needed
-        filtered_students = []
-        for student in students:
-            # Check if student has upcoming appointments
-            has_upcoming = AppointmentRequest.query.filter(
-                AppointmentRequest.user_id == student.id,
-                AppointmentRequest.counselor_id == current_user.id,
-                AppointmentRequest.scheduled_date > datetime.utcnow(),
-                AppointmentRequest.status.in_(['scheduled', 'assigned'])
-            ).first() is not None
-            
-            if status_filter == 'all':
-                filtered_students.append(student)
-            elif status_filter == 'active' and has_upcoming:
-                filtered_students.append(student)
-            elif status_filter == 'completed' and not has_upcoming:
-                filtered_students.append(student)
-        
-        # Format response
+        # Search and status filters run against the aggregated caseload in the same query
         students_data = []
-        for student in filtered_students:
+        for row in counselor_caseload_query(current_user.id, search_term, status_filter).all():
+            student = row.User
             students_data.append({
                 'id': student.id,
                 'name': student.get_full_name(),
                 'email': student.email,
                 'student_id': getattr(student, 'student_id', 'N/A'),
                 'course': getattr(student, 'course', 'N/A'),
-                'year': getattr(student, 'year_of_study', 'N/A')
+                'year': getattr(student, 'year_of_study', 'N/A'),
+                'has_upcoming': bool(row.has_upcoming)
             })
         
         return jsonify({
@@ -6007,35 +7538,31 @@ def api_available_counselors():
     try:
         appointment_date = request.args.get('date')  # Optional filter by date
         
+        target_date = None
+        if appointment_date:
+            try:
+                target_date = datetime.strptime(appointment_date, '%Y-%m-%d').date()
+            except ValueError:
+                pass
+        
         counselors = Counselor.query.filter_by(is_active=True).all()
+        counselor_ids = [counselor.id for counselor in counselors]
+        workloads = get_counselor_workloads(counselor_ids, target_date)
+        engine = AvailabilityEngine(counselor_ids, target_date) if target_date else None
         
         counselors_data = []
         for counselor in counselors:
             # Calculate workload and availability
-            current_appointments = db.session.query(Appointment)\
-                .filter(
-                    Appointment.counselor_id == counselor.id,
-                    Appointment.status.in_(['scheduled', 'assigned']),
-                    Appointment.scheduled_date >= datetime.now()
-                ).count()
-            
-            # Get appointments for specific date if provided
-            date_appointments = []
-            if appointment_date:
-                try:
-                    target_date = datetime.strptime(appointment_date, '%Y-%m-%d').date()
-                    date_appointments = db.session.query(Appointment)\
-                        .filter(
-                            Appointment.counselor_id == counselor.id,
-                            func.date(Appointment.scheduled_date) == target_date,
-                            Appointment.status.in_(['scheduled', 'assigned'])
-                        ).all()
-                except ValueError:
-                    pass
+            current_appointments = workloads[counselor.id]['upcoming']
+            date_appointments = workloads[counselor.id]['on_date']
+            free_slots = [
+                slot.strftime('%H:%M')
+                for slot in engine.free_slots(counselor.id, target_date, not_before=datetime.now())
+            ] if engine else None
             
             # Calculate availability score (this could be more sophisticated)
             max_appointments_per_day = 8  # Configurable
-            availability_score = max(0, max_appointments_per_day - len(date_appointments))
+            availability_score = max(0, max_appointments_per_day - date_appointments)
             
             counselor_dict = {
                 'id': counselor.id,
@@ -6048,7 +7575,8 @@ def api_available_counselors():
                 'current_appointments': current_appointments,
                 'availability_score': availability_score,
                 'max_capacity': max_appointments_per_day,
-                'date_appointments': len(date_appointments) if appointment_date else None,
+                'date_appointments': date_appointments if target_date else None,
+                'free_slots': free_slots,
                 'specializations': counselor.specialization.split(',') if counselor.specialization else [],
                 'rating': getattr(counselor, 'rating', 0),
                 'total_sessions': getattr(counselor, 'total_sessions', 0)
@@ -6080,8 +7608,7 @@ def api_update_appointment_admin(appointment_id):
         data = request.get_json()
         appointment = AppointmentRequest.query.get_or_404(appointment_id)
         
-        print(f"🔧 Updating appointment {appointment_id}")
-        print(f"📊 Update data: {data}")
+        app.logger.debug("Updating appointment %s fields %s", appointment_id, sorted(data or {}))
         
         # Update fields safely
         if 'counselor_id' in data:
@@ -6128,7 +7655,7 @@ def api_update_appointment_admin(appointment_id):
         appointment.updated_at = datetime.utcnow()
         db.session.commit()
         
-        print(f"✅ Appointment updated successfully")
+        app.logger.info("Appointment %s updated by admin %s", appointment_id, current_user.id)
         
         return jsonify({
             'success': True,
@@ -6137,9 +7664,7 @@ def api_update_appointment_admin(appointment_id):
         
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Error updating appointment: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Error updating appointment: {str(e)}")
         return jsonify({'success': False, 'message': f'Failed to update appointment: {str(e)}'}), 500
 
 @app.route('/api/admin/appointments/<int:appointment_id>/cancel', methods=['POST'])
@@ -6270,8 +7795,7 @@ def api_reschedule_appointment_admin(appointment_id):
         if appointment.counselor_id:
             conflict = AppointmentRequest.query.filter(
                 AppointmentRequest.counselor_id == appointment.counselor_id,
-                func.date(AppointmentRequest.scheduled_date) == new_datetime.date(),
-                func.extract('hour', AppointmentRequest.scheduled_date) == new_datetime.hour,
+                hour_range_filter(AppointmentRequest.scheduled_date, new_datetime),
                 AppointmentRequest.status.in_(['scheduled', 'assigned']),
                 AppointmentRequest.id != appointment_id
             ).first()
@@ -6452,180 +7976,210 @@ def api_bulk_appointment_action_fixed():
         return jsonify({'success': False, 'message': 'Failed to perform bulk action'}), 500
 
 # =============================================================================
-# REPORTING AND EXPORT
+# STREAMING EXPORTS
 # =============================================================================
 
-@app.route('/api/admin/appointments/export')
-@login_required
-@role_required('admin')
-def api_export_appointments_fixed():
-    """FIXED: Export appointments with proper error handling"""
-    try:
-        export_format = request.args.get('format', 'csv')
-        
-        # Get appointments with related data
-        appointments = AppointmentRequest.query\
-            .options(db.joinedload(AppointmentRequest.user))\
-            .options(db.joinedload(AppointmentRequest.counselor))\
-            .order_by(AppointmentRequest.created_at.desc()).all()
-        
-        if export_format == 'csv':
-            return export_appointments_csv_fixed(appointments)
-        elif export_format == 'excel':
-            return export_appointments_excel_fixed(appointments)
-        else:
-            return jsonify({'success': False, 'message': 'Invalid export format'}), 400
-            
-    except Exception as e:
-        app.logger.error(f"Error exporting appointments: {str(e)}")
-        return jsonify({'success': False, 'message': f'Export failed: {str(e)}'}), 500
+# Rows fetched per round trip; also how many CSV rows are buffered per chunk
+EXPORT_BATCH_SIZE = 500
 
-def export_appointments_csv_fixed(appointments):
-    """FIXED: Export to CSV with proper formatting"""
-    import csv
-    import io
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write headers
-    headers = [
-        'ID', 'Reference', 'Student Name', 'Student Email', 'Student ID',
-        'Counselor Name', 'Counselor Email', 'Specialization',
-        'Requested Date', 'Scheduled Date', 'Duration (min)', 'Mode',
-        'Status', 'Priority', 'Topic', 'Room Number', 'Video Link',
-        'Created Date', 'Student Notes', 'Admin Notes'
-    ]
-    writer.writerow(headers)
-    
-    # Write data
-    for appointment in appointments:
-        # Handle None values safely
-        counselor_name = 'Not Assigned'
-        counselor_email = ''
-        specialization = ''
-        
-        if appointment.counselor:
-            counselor_name = f"{appointment.counselor.first_name} {appointment.counselor.last_name}"
-            counselor_email = appointment.counselor.email
-            specialization = appointment.counselor.specialization or 'General'
-        
-        row = [
-            appointment.id,
-            f"APT{appointment.id:06d}",
-            f"{appointment.user.first_name} {appointment.user.last_name}",
-            appointment.user.email,
-            getattr(appointment.user, 'student_id', ''),
-            counselor_name,
-            counselor_email,
-            specialization,
-            appointment.requested_date.strftime('%Y-%m-%d %H:%M') if appointment.requested_date else '',
-            appointment.scheduled_date.strftime('%Y-%m-%d %H:%M') if appointment.scheduled_date else '',
-            appointment.duration or 60,
-            getattr(appointment, 'mode', 'in-person'),
-            appointment.status.title(),
-            (appointment.priority or 'normal').title(),
-            appointment.topic or '',
-            getattr(appointment, 'room_number', ''),
-            getattr(appointment, 'video_link', ''),
-            appointment.created_at.strftime('%Y-%m-%d %H:%M'),
-            appointment.notes or '',
-            appointment.admin_notes or ''
-        ]
-        writer.writerow(row)
-    
-    output.seek(0)
-    
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = f'attachment; filename=appointments_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def iter_export_rows(query, row_builder, batch_size=EXPORT_BATCH_SIZE):
+    """Page through a column query with yield_per and yield one export row per result."""
+    for result in query.yield_per(batch_size):
+        yield row_builder(result)
+
+
+def _export_headers(filename):
+    return {
+        'Content-Disposition': f'attachment; filename={filename}',
+        'X-Accel-Buffering': 'no'
+    }
+
+
+def stream_csv_response(headers, rows, filename, batch_size=EXPORT_BATCH_SIZE):
+    """Stream rows as CSV, flushing the buffer every `batch_size` rows."""
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(headers)
+        try:
+            for count, row in enumerate(rows, start=1):
+                writer.writerow(row)
+                if count % batch_size == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+        except Exception as e:
+            # Abort the chunked response so the client sees a failed download,
+            # not a truncated file that looks complete
+            app.logger.exception(f"Error streaming {filename}: {str(e)}")
+            raise
+        yield buffer.getvalue()
+
+    return Response(stream_with_context(generate()), mimetype='text/csv', headers=_export_headers(filename))
+
+
+def stream_xlsx_response(headers, rows, filename, sheet_name='Export', chunk_size=64 * 1024):
+    """Write rows with xlsxwriter in constant_memory mode to a temp file, then stream the file.
+
+    constant_memory flushes each row to disk as soon as the next one starts, so
+    memory stays flat however many rows are written.
+    """
+    import xlsxwriter
+
+    handle, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(handle)
+    try:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        worksheet = workbook.add_worksheet(sheet_name)
+        header_format = workbook.add_format({
+            'bold': True,
+            'text_wrap': True,
+            'valign': 'top',
+            'fg_color': '#D7E4BC',
+            'border': 1
+        })
+
+        # Widths must be set before any rows are flushed in constant_memory mode
+        for col_num, header in enumerate(headers):
+            worksheet.set_column(col_num, col_num, min(max(len(header) + 2, 14), 50))
+        worksheet.write_row(0, 0, headers, header_format)
+
+        for row_num, row in enumerate(rows, start=1):
+            worksheet.write_row(row_num, 0, row)
+        workbook.close()
+    except Exception:
+        os.remove(path)
+        raise
+
+    def generate():
+        with open(path, 'rb') as export_file:
+            while True:
+                chunk = export_file.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def remove_export_file():
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    response = Response(generate(), mimetype=XLSX_MIMETYPE, headers=_export_headers(filename))
+    response.headers['Content-Length'] = str(os.path.getsize(path))
+    # Runs when the response is closed, even if the body is never read (HEAD, early disconnect)
+    response.call_on_close(remove_export_file)
     return response
 
-def export_appointments_excel_fixed(appointments):
-    """FIXED: Export to Excel with error handling"""
+
+def stream_export(export_format, headers, rows, filename_stem, sheet_name='Export'):
+    """Return a streaming CSV or XLSX response; falls back to CSV if xlsxwriter is missing."""
+    if export_format in ('excel', 'xlsx'):
+        try:
+            return stream_xlsx_response(headers, rows, f'{filename_stem}.xlsx', sheet_name)
+        except ImportError:
+            app.logger.warning("xlsxwriter not installed, falling back to CSV export")
+    return stream_csv_response(headers, rows, f'{filename_stem}.csv')
+
+
+# =============================================================================
+# REPORTING AND EXPORT
+# =============================================================================
+
+@app.route('/api/admin/appointments/export')
+@login_required
+@role_required('admin')
+def api_export_appointments_fixed():
+    """FIXED: Export appointments with proper error handling"""
     try:
-        import pandas as pd
+        export_format = request.args.get('format', 'csv')
         
-        # Prepare data for DataFrame
-        data = []
-        for appointment in appointments:
-            counselor_name = 'Not Assigned'
-            counselor_email = ''
-            specialization = ''
-            
-            if appointment.counselor:
-                counselor_name = f"{appointment.counselor.first_name} {appointment.counselor.last_name}"
-                counselor_email = appointment.counselor.email
-                specialization = appointment.counselor.specialization or 'General'
-            
-            data.append({
-                'ID': appointment.id,
-                'Reference': f"APT{appointment.id:06d}",
-                'Student Name': f"{appointment.user.first_name} {appointment.user.last_name}",
-                'Student Email': appointment.user.email,
-                'Student ID': getattr(appointment.user, 'student_id', ''),
-                'Counselor Name': counselor_name,
-                'Counselor Email': counselor_email,
-                'Specialization': specialization,
-                'Requested Date': appointment.requested_date.strftime('%Y-%m-%d %H:%M') if appointment.requested_date else '',
-                'Scheduled Date': appointment.scheduled_date.strftime('%Y-%m-%d %H:%M') if appointment.scheduled_date else '',
-                'Duration (min)': appointment.duration or 60,
-                'Mode': getattr(appointment, 'mode', 'in-person'),
-                'Status': appointment.status.title(),
-                'Priority': (appointment.priority or 'normal').title(),
-                'Topic': appointment.topic or '',
-                'Room Number': getattr(appointment, 'room_number', ''),
-                'Video Link': getattr(appointment, 'video_link', ''),
-                'Created Date': appointment.created_at.strftime('%Y-%m-%d %H:%M'),
-                'Student Notes': appointment.notes or '',
-                'Admin Notes': appointment.admin_notes or ''
-            })
+        if export_format not in ('csv', 'excel'):
+            return jsonify({'success': False, 'message': 'Invalid export format'}), 400
         
-        # Create DataFrame
-        df = pd.DataFrame(data)
-        
-        # Create Excel file in memory
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Appointments', index=False)
-            
-            # Get workbook and worksheet for formatting
-            workbook = writer.book
-            worksheet = writer.sheets['Appointments']
-            
-            # Add formatting
-            header_format = workbook.add_format({
-                'bold': True,
-                'text_wrap': True,
-                'valign': 'top',
-                'fg_color': '#D7E4BC',
-                'border': 1
-            })
-            
-            # Format headers
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_format)
+        # Plain column rows (no ORM objects), paged from the database as the response streams
+        query = db.session.query(
+            AppointmentRequest.id,
+            User.first_name.label('student_first_name'),
+            User.last_name.label('student_last_name'),
+            User.email.label('student_email'),
+            User.student_id,
+            Counselor.first_name.label('counselor_first_name'),
+            Counselor.last_name.label('counselor_last_name'),
+            Counselor.email.label('counselor_email'),
+            Counselor.specialization,
+            AppointmentRequest.requested_date,
+            AppointmentRequest.scheduled_date,
+            AppointmentRequest.duration,
+            AppointmentRequest.mode,
+            AppointmentRequest.status,
+            AppointmentRequest.priority,
+            AppointmentRequest.topic,
+            AppointmentRequest.room_number,
+            AppointmentRequest.video_link,
+            AppointmentRequest.created_at,
+            AppointmentRequest.notes,
+            AppointmentRequest.admin_notes
+        ).outerjoin(User, User.id == AppointmentRequest.user_id)\
+            .outerjoin(Counselor, Counselor.id == AppointmentRequest.counselor_id)\
+            .order_by(AppointmentRequest.created_at.desc())
+        
+        return stream_export(
+            export_format,
+            APPOINTMENT_EXPORT_HEADERS,
+            iter_export_rows(query, appointment_export_row),
+            f'appointments_{datetime.now().strftime("%Y%m%d_%H%M%S")}',
+            sheet_name='Appointments'
+        )
             
-            # Auto-adjust column widths
-            for i, col in enumerate(df.columns):
-                column_len = max(df[col].astype(str).str.len().max(), len(col)) + 2
-                worksheet.set_column(i, i, min(column_len, 50))
-        
-        output.seek(0)
-        
-        response = make_response(output.read())
-        response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        response.headers['Content-Disposition'] = f'attachment; filename=appointments_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        
-        return response
-        
-    except ImportError:
-        # Fallback to CSV if pandas/xlsxwriter not available
-        return export_appointments_csv_fixed(appointments)
     except Exception as e:
-        app.logger.error(f"Excel export error: {str(e)}")
-        return export_appointments_csv_fixed(appointments)
+        app.logger.error(f"Error exporting appointments: {str(e)}")
+        return jsonify({'success': False, 'message': f'Export failed: {str(e)}'}), 500
+
+APPOINTMENT_EXPORT_HEADERS = [
+    'ID', 'Reference', 'Student Name', 'Student Email', 'Student ID',
+    'Counselor Name', 'Counselor Email', 'Specialization',
+    'Requested Date', 'Scheduled Date', 'Duration (min)', 'Mode',
+    'Status', 'Priority', 'Topic', 'Room Number', 'Video Link',
+    'Created Date', 'Student Notes', 'Admin Notes'
+]
+
+def appointment_export_row(row):
+    """Format one appointment export row, handling missing student/counselor safely"""
+    if row.counselor_first_name is not None:
+        counselor_name = f"{row.counselor_first_name} {row.counselor_last_name}"
+        counselor_email = row.counselor_email
+        specialization = row.specialization or 'General'
+    else:
+        counselor_name = 'Not Assigned'
+        counselor_email = ''
+        specialization = ''
+    
+    return [
+        row.id,
+        f"APT{row.id:06d}",
+        f"{row.student_first_name} {row.student_last_name}" if row.student_first_name is not None else '',
+        row.student_email or '',
+        row.student_id or '',
+        counselor_name,
+        counselor_email,
+        specialization,
+        row.requested_date.strftime('%Y-%m-%d %H:%M') if row.requested_date else '',
+        row.scheduled_date.strftime('%Y-%m-%d %H:%M') if row.scheduled_date else '',
+        row.duration or 60,
+        row.mode or 'in-person',
+        (row.status or '').title(),
+        (row.priority or 'normal').title(),
+        row.topic or '',
+        row.room_number or '',
+        row.video_link or '',
+        row.created_at.strftime('%Y-%m-%d %H:%M') if row.created_at else '',
+        row.notes or '',
+        row.admin_notes or ''
+    ]
 
 
 
@@ -6817,18 +8371,296 @@ def log_appointment_activity(appointment_id, action, description, user_id):
         # db.session.add(activity)
         # db.session.commit()
         
-        # For now, just log to console/file
-        print(f"[APPOINTMENT ACTIVITY] {datetime.now()}: {action} - {description}")
+        # For now, just log to the system log
+        app.logger.info("Appointment %s activity by user %s: %s - %s", appointment_id, user_id, action, description)
         
     except Exception as e:
-        print(f"Failed to log appointment activity: {e}")
+        app.logger.error(f"Failed to log appointment activity: {e}")
+
+# =============================================================================
+# NOTIFICATION QUEUE
+# =============================================================================
+
+app.config.setdefault('MAIL_SERVER', os.environ.get('MAIL_SERVER', 'localhost'))
+app.config.setdefault('MAIL_PORT', int(os.environ.get('MAIL_PORT', 25)))
+app.config.setdefault('MAIL_USE_TLS', os.environ.get('MAIL_USE_TLS', '').lower() in ('1', 'true', 'yes'))
+app.config.setdefault('MAIL_USERNAME', os.environ.get('MAIL_USERNAME'))
+app.config.setdefault('MAIL_PASSWORD', os.environ.get('MAIL_PASSWORD'))
+app.config.setdefault('MAIL_DEFAULT_SENDER', os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@cuea.edu'))
+app.config.setdefault('MAIL_BASE_URL', os.environ.get('MAIL_BASE_URL', 'http://localhost:5000/'))  # links in emails sent outside a request
+app.config.setdefault('NOTIFICATION_WORKERS', 2)  # background sender threads per process, 0 = only `flask process-notifications`
+app.config.setdefault('NOTIFICATION_BATCH_SIZE', 20)  # jobs sent over one SMTP connection
+app.config.setdefault('NOTIFICATION_POLL_SECONDS', 10)
+app.config.setdefault('NOTIFICATION_MAX_ATTEMPTS', 5)
+app.config.setdefault('NOTIFICATION_RETRY_BASE_SECONDS', 30)  # doubles on every failed attempt
+app.config.setdefault('NOTIFICATION_RETRY_MAX_SECONDS', 3600)
+app.config.setdefault('NOTIFICATION_LEASE_SECONDS', 300)  # a claimed job is reclaimed if its worker dies
+
+mail = Mail(app)
+
+
+class NotificationJob(db.Model):
+    """Durable outbound email job.
+
+    The idempotency key is unique per appointment, recipient, notification
+    type and scheduled time, so repeated enqueues (double submits, retried
+    requests, reminder sweeps) collapse into one email.
+    """
+    __tablename__ = 'notification_job'
+    __table_args__ = (
+        db.Index('ix_notification_job_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    idempotency_key = db.Column(db.String(200), unique=True, nullable=False)
+    notification_type = db.Column(db.String(50), nullable=False)
+    recipient_type = db.Column(db.String(20), nullable=False)  # student, counselor
+    recipient = db.Column(db.String(120), nullable=False)
+    appointment_id = db.Column(db.Integer, db.ForeignKey('appointment_request.id'))
+    base_url = db.Column(db.String(255))
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+
+def notification_idempotency_key(appointment, recipient, recipient_type, notification_type, discriminator=''):
+    """Identifies one email; the recipient and the assigned counselor are part of it, so
+    reassigning an appointment at the same time slot still notifies the new counselor
+    and the student"""
+    scheduled = appointment.scheduled_date.isoformat() if appointment.scheduled_date else ''
+    key = (f"appointment:{appointment.id}:{recipient_type}:{recipient.strip().lower()}:"
+           f"counselor-{appointment.counselor_id or 0}:{notification_type}:{scheduled}")
+    return f"{key}:{discriminator}" if discriminator else key
+
+
+def enqueue_notification(recipient, appointment, recipient_type, notification_type, commit=True, discriminator=''):
+    """Queue an appointment email; returns False if it was already queued.
+
+    Rendering and SMTP happen on the worker pool, so this is one INSERT.
+    `discriminator` separates otherwise identical emails, such as the 24h
+    and 1h reminders for the same appointment.
+    """
+    if not recipient or appointment is None:
+        return False
+
+    base_url = request.url_root if has_request_context() else app.config['MAIL_BASE_URL']
+    statement = sqlite_insert(NotificationJob.__table__).values(
+        idempotency_key=notification_idempotency_key(appointment, recipient, recipient_type, notification_type, discriminator),
+        notification_type=notification_type,
+        recipient_type=recipient_type,
+        recipient=recipient,
+        appointment_id=appointment.id,
+        base_url=base_url,
+        status='pending',
+        attempts=0,
+        max_attempts=app.config['NOTIFICATION_MAX_ATTEMPTS'],
+        next_attempt_at=datetime.utcnow(),
+        created_at=datetime.utcnow()
+    ).on_conflict_do_nothing(index_elements=['idempotency_key'])
+
+    queued = db.session.execute(statement).rowcount > 0
+    if commit:
+        db.session.commit()
+    if queued:
+        notification_workers.wake()
+    return queued
+
+
+def claim_notification_jobs(worker_id, limit):
+    """Atomically lease up to `limit` due jobs to `worker_id`.
+
+    The claim is a single UPDATE, so concurrent workers (threads or
+    processes) never lease the same job. Jobs whose lease expired are
+    picked up again.
+    """
+    now = datetime.utcnow()
+    lease_expired = now - timedelta(seconds=app.config['NOTIFICATION_LEASE_SECONDS'])
+    token = f"{worker_id}:{uuid.uuid4().hex}"
+
+    due_ids = db.session.query(NotificationJob.id).filter(or_(
+        and_(NotificationJob.status == 'pending', NotificationJob.next_attempt_at <= now),
+        and_(NotificationJob.status == 'sending', NotificationJob.locked_at < lease_expired)
+    )).order_by(NotificationJob.next_attempt_at).limit(limit).scalar_subquery()
+
+    claimed = NotificationJob.query.filter(NotificationJob.id.in_(due_ids)).update({
+        NotificationJob.status: 'sending',
+        NotificationJob.locked_by: token,
+        NotificationJob.locked_at: now,
+        NotificationJob.attempts: NotificationJob.attempts + 1
+    }, synchronize_session=False)
+    db.session.commit()
+
+    if not claimed:
+        return []
+    return NotificationJob.query.filter_by(locked_by=token, status='sending').order_by(NotificationJob.id).all()
+
+
+def schedule_notification_retry(job, error):
+    job.last_error = str(error)[:1000]
+    job.locked_by = None
+    if job.attempts >= job.max_attempts or isinstance(error, LookupError):
+        job.status = 'failed'
+        app.logger.error(f"Notification job {job.id} to {job.recipient} failed permanently: {error}")
+        return
+
+    delay = min(app.config['NOTIFICATION_RETRY_BASE_SECONDS'] * 2 ** (job.attempts - 1),
+                app.config['NOTIFICATION_RETRY_MAX_SECONDS'])
+    job.status = 'pending'
+    job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+
+def build_notification_message(job):
+    appointment = db.session.get(AppointmentRequest, job.appointment_id)
+    if appointment is None:
+        raise LookupError(f"appointment {job.appointment_id} no longer exists")
+
+    renderer = render_counselor_notification if job.recipient_type == 'counselor' else render_appointment_notification
+    subject, html = renderer(appointment, job.notification_type, job.base_url or app.config['MAIL_BASE_URL'])
+    return Message(subject=subject, sender=app.config['MAIL_DEFAULT_SENDER'], recipients=[job.recipient], html=html)
+
+
+def process_notification_batch(worker_id='cli', batch_size=None):
+    """Send one batch of due jobs over a single SMTP connection; returns jobs handled"""
+    jobs = claim_notification_jobs(worker_id, batch_size or app.config['NOTIFICATION_BATCH_SIZE'])
+    if not jobs:
+        return 0
+
+    try:
+        with mail.connect() as connection:
+            for job in jobs:
+                try:
+                    connection.send(build_notification_message(job))
+                    job.status = 'sent'
+                    job.sent_at = datetime.utcnow()
+                    job.locked_by = None
+                    job.last_error = None
+                except Exception as e:
+                    schedule_notification_retry(job, e)
+                db.session.commit()
+    except Exception as e:
+        # Connection-level failure: everything not yet sent goes back for a retry
+        app.logger.error(f"SMTP batch failed: {str(e)}")
+        db.session.rollback()
+        for job in jobs:
+            if job.status == 'sending':
+                schedule_notification_retry(job, e)
+        db.session.commit()
+
+    return len(jobs)
+
+
+def notification_queue_counts():
+    return dict(db.session.query(NotificationJob.status, func.count(NotificationJob.id))
+                .group_by(NotificationJob.status).all())
+
+
+class NotificationWorkerPool:
+    """Background threads draining the notification queue.
+
+    Started lazily by the first enqueue so CLI commands and imports don't
+    spawn threads; enqueues wake an idle worker instead of waiting out the
+    poll interval.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.threads = []
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+
+    def start(self, size=None):
+        size = app.config['NOTIFICATION_WORKERS'] if size is None else size
+        with self.lock:
+            self.threads = [thread for thread in self.threads if thread.is_alive()]
+            self.stopping.clear()
+            for index in range(len(self.threads), size):
+                thread = threading.Thread(target=self._run, args=(f"notification-worker-{index + 1}",),
+                                          name=f"notification-worker-{index + 1}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def wake(self):
+        if app.config['NOTIFICATION_WORKERS'] > 0 and not any(thread.is_alive() for thread in self.threads):
+            self.start()
+        self.wakeup.set()
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def _run(self, worker_id):
+        while not self.stopping.is_set():
+            handled = 0
+            try:
+                with app.app_context():
+                    handled = process_notification_batch(worker_id)
+            except Exception as e:
+                app.logger.error(f"Notification worker {worker_id} error: {str(e)}")
+            if not handled:
+                self.wakeup.wait(app.config['NOTIFICATION_POLL_SECONDS'])
+                self.wakeup.clear()
+
+
+notification_workers = NotificationWorkerPool()
+
+
+@app.cli.command('process-notifications')
+@click.option('--batch-size', type=int, default=None, help='Jobs per SMTP connection.')
+def process_notifications_command(batch_size):
+    """Send every due notification job, then exit."""
+    total = 0
+    while True:
+        handled = process_notification_batch('cli', batch_size)
+        if not handled:
+            break
+        total += handled
+    counts = notification_queue_counts()
+    click.echo(f"📧 Processed {total} job(s); queue: " + ', '.join(f"{k}={v}" for k, v in sorted(counts.items())))
+
 
 # =============================================================================
 # NOTIFICATION FUNCTIONS
 # =============================================================================
 
-def send_appointment_notification(email, appointment, notification_type):
-    """Send appointment notification email to student"""
+def render_generic_notification(appointment, subject, base_url):
+    """Plain appointment summary for notification types without a dedicated template"""
+    scheduled = appointment.scheduled_date
+    counselor = appointment.counselor
+    return f"""
+    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+        <div style="background: linear-gradient(135deg, #2c3e50, #34495e); color: white; padding: 20px; text-align: center;">
+            <h2>🧠 CUEA MindConnect</h2>
+            <h3>{html.escape(subject.replace(' - CUEA MindConnect', ''))}</h3>
+        </div>
+        <div style="padding: 20px; background: #f8f9fa;">
+            <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
+                <h4>Appointment Details</h4>
+                <ul style="list-style: none; padding: 0;">
+                    <li><strong>📅 Date:</strong> {scheduled.strftime('%A, %B %d, %Y') if scheduled else 'To be determined'}</li>
+                    <li><strong>🕒 Time:</strong> {scheduled.strftime('%I:%M %p') if scheduled else 'To be determined'}</li>
+                    <li><strong>👨‍⚕️ Counselor:</strong> {html.escape(counselor.get_full_name()) if counselor else 'To be assigned'}</li>
+                    <li><strong>📌 Status:</strong> {html.escape((appointment.status or 'pending').title())}</li>
+                </ul>
+            </div>
+            <div style="text-align: center; margin-top: 20px;">
+                <a href="{base_url}appointments" style="background: #27ae60; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">View My Appointments</a>
+            </div>
+        </div>
+    </div>
+    """
+
+def render_appointment_notification(appointment, notification_type, base_url):
+    """Build the (subject, html) of an appointment email to the student"""
+    student = appointment.user
     subject_map = {
         'created': 'Appointment Scheduled - CUEA MindConnect',
         'counselor_assigned': 'Counselor Assigned to Your Appointment - CUEA MindConnect',
@@ -6839,177 +8671,172 @@ def send_appointment_notification(email, appointment, notification_type):
         'reminder': 'Appointment Reminder - CUEA MindConnect'
     }
     
-    try:
-        msg = Message(
-            subject=subject_map.get(notification_type, 'Appointment Update - CUEA MindConnect'),
-            sender=app.config['MAIL_DEFAULT_SENDER'],
-            recipients=[email]
-        )
-        
-        # Create email content based on notification type
-        if notification_type == 'created':
-            msg.html = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background: linear-gradient(135deg, #2c3e50, #34495e); color: white; padding: 20px; text-align: center;">
-                    <h2>🧠 CUEA MindConnect</h2>
-                    <h3>Appointment Scheduled</h3>
+    subject = subject_map.get(notification_type, 'Appointment Update - CUEA MindConnect')
+    body = None
+    
+    # Create email content based on notification type
+    if notification_type == 'created':
+        body = f"""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <div style="background: linear-gradient(135deg, #2c3e50, #34495e); color: white; padding: 20px; text-align: center;">
+                <h2>🧠 CUEA MindConnect</h2>
+                <h3>Appointment Scheduled</h3>
+            </div>
+            <div style="padding: 20px; background: #f8f9fa;">
+                <p>Dear {html.escape(student.first_name or '')},</p>
+                <p>Your counseling appointment has been successfully scheduled. Here are the details:</p>
+                
+                <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
+                    <h4>Appointment Details</h4>
+                    <ul style="list-style: none; padding: 0;">
+                        <li><strong>📅 Date:</strong> {appointment.scheduled_date.strftime('%A, %B %d, %Y') if appointment.scheduled_date else 'To be determined'}</li>
+                        <li><strong>🕒 Time:</strong> {appointment.scheduled_date.strftime('%I:%M %p') if appointment.scheduled_date else 'To be determined'}</li>
+                        <li><strong>⏱️ Duration:</strong> {int(appointment.duration or 60)} minutes</li>
+                        <li><strong>📱 Mode:</strong> {html.escape(appointment.mode.replace('-', ' ').title()) if appointment.mode else 'In-person'}</li>
+                        <li><strong>📍 Location:</strong> {html.escape(appointment.location or 'Counseling Center')}</li>
+                    </ul>
                 </div>
-                <div style="padding: 20px; background: #f8f9fa;">
-                    <p>Dear {appointment.student.first_name},</p>
-                    <p>Your counseling appointment has been successfully scheduled. Here are the details:</p>
-                    
-                    <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
-                        <h4>Appointment Details</h4>
-                        <ul style="list-style: none; padding: 0;">
-                            <li><strong>📅 Date:</strong> {appointment.scheduled_date.strftime('%A, %B %d, %Y') if appointment.scheduled_date else 'To be determined'}</li>
-                            <li><strong>🕒 Time:</strong> {appointment.scheduled_date.strftime('%I:%M %p') if appointment.scheduled_date else 'To be determined'}</li>
-                            <li><strong>⏱️ Duration:</strong> {appointment.duration or 60} minutes</li>
-                            <li><strong>📱 Mode:</strong> {appointment.mode.replace('-', ' ').title() if appointment.mode else 'In-person'}</li>
-                            <li><strong>📍 Location:</strong> {appointment.location or 'Counseling Center'}</li>
-                        </ul>
-                    </div>
-                    
-                    <p>A counselor will be assigned to your appointment soon, and you'll receive another notification with their details.</p>
-                    
-                    <div style="background: #fff3cd; border: 1px solid #ffeaa7; padding: 10px; border-radius: 5px; margin: 15px 0;">
-                        <strong>Important:</strong> Please arrive 10 minutes early for in-person appointments or test your technology for virtual sessions.
-                    </div>
-                    
-                    <p>If you need to make any changes, please contact our support team or log into your account.</p>
-                    
-                    <div style="text-align: center; margin-top: 20px;">
-                        <a href="{request.url_root}appointments" style="background: #27ae60; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">View My Appointments</a>
-                    </div>
+                
+                <p>A counselor will be assigned to your appointment soon, and you'll receive another notification with their details.</p>
+                
+                <div style="background: #fff3cd; border: 1px solid #ffeaa7; padding: 10px; border-radius: 5px; margin: 15px 0;">
+                    <strong>Important:</strong> Please arrive 10 minutes early for in-person appointments or test your technology for virtual sessions.
                 </div>
-                <div style="background: #34495e; color: white; padding: 10px; text-align: center; font-size: 12px;">
-                    <p>CUEA MindConnect - Supporting Your Mental Wellness Journey</p>
+                
+                <p>If you need to make any changes, please contact our support team or log into your account.</p>
+                
+                <div style="text-align: center; margin-top: 20px;">
+                    <a href="{base_url}appointments" style="background: #27ae60; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">View My Appointments</a>
                 </div>
             </div>
-            """
-            
-        elif notification_type == 'counselor_assigned':
-            msg.html = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background: linear-gradient(135deg, #27ae60, #2ecc71); color: white; padding: 20px; text-align: center;">
-                    <h2>🧠 CUEA MindConnect</h2>
-                    <h3>Counselor Assigned</h3>
+            <div style="background: #34495e; color: white; padding: 10px; text-align: center; font-size: 12px;">
+                <p>CUEA MindConnect - Supporting Your Mental Wellness Journey</p>
+            </div>
+        </div>
+        """
+        
+    elif notification_type == 'counselor_assigned':
+        body = f"""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <div style="background: linear-gradient(135deg, #27ae60, #2ecc71); color: white; padding: 20px; text-align: center;">
+                <h2>🧠 CUEA MindConnect</h2>
+                <h3>Counselor Assigned</h3>
+            </div>
+            <div style="padding: 20px; background: #f8f9fa;">
+                <p>Dear {html.escape(student.first_name or '')},</p>
+                <p>Great news! A counselor has been assigned to your appointment:</p>
+                
+                <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
+                    <h4>Your Counselor</h4>
+                    <ul style="list-style: none; padding: 0;">
+                        <li><strong>👨‍⚕️ Name:</strong> {html.escape(appointment.counselor.get_full_name())}</li>
+                        <li><strong>🎓 Specialization:</strong> {html.escape(appointment.counselor.specialization or 'General Counseling')}</li>
+                        <li><strong>📧 Email:</strong> {html.escape(appointment.counselor.email or '')}</li>
+                    </ul>
                 </div>
-                <div style="padding: 20px; background: #f8f9fa;">
-                    <p>Dear {appointment.student.first_name},</p>
-                    <p>Great news! A counselor has been assigned to your appointment:</p>
-                    
-                    <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
-                        <h4>Your Counselor</h4>
-                        <ul style="list-style: none; padding: 0;">
-                            <li><strong>👨‍⚕️ Name:</strong> {appointment.counselor.first_name} {appointment.counselor.last_name}</li>
-                            <li><strong>🎓 Specialization:</strong> {appointment.counselor.specialization or 'General Counseling'}</li>
-                            <li><strong>📧 Email:</strong> {appointment.counselor.email}</li>
-                        </ul>
-                    </div>
-                    
-                    <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
-                        <h4>Appointment Details</h4>
-                        <ul style="list-style: none; padding: 0;">
-                            <li><strong>📅 Date:</strong> {appointment.scheduled_date.strftime('%A, %B %d, %Y') if appointment.scheduled_date else 'To be determined'}</li>
-                            <li><strong>🕒 Time:</strong> {appointment.scheduled_date.strftime('%I:%M %p') if appointment.scheduled_date else 'To be determined'}</li>
-                            <li><strong>⏱️ Duration:</strong> {appointment.duration or 60} minutes</li>
-                            <li><strong>📱 Mode:</strong> {appointment.mode.replace('-', ' ').title() if appointment.mode else 'In-person'}</li>
-                        </ul>
-                    </div>
-                    
-                    {f'<p><strong>Meeting Link:</strong> <a href="{appointment.meeting_link}">{appointment.meeting_link}</a></p>' if appointment.meeting_link else ''}
-                    
-                    <p>Your counselor is looking forward to meeting with you. Please prepare any questions or topics you'd like to discuss.</p>
-                    
-                    <div style="text-align: center; margin-top: 20px;">
-                        <a href="{request.url_root}appointments" style="background: #27ae60; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">View Appointment Details</a>
-                    </div>
+                
+                <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
+                    <h4>Appointment Details</h4>
+                    <ul style="list-style: none; padding: 0;">
+                        <li><strong>📅 Date:</strong> {appointment.scheduled_date.strftime('%A, %B %d, %Y') if appointment.scheduled_date else 'To be determined'}</li>
+                        <li><strong>🕒 Time:</strong> {appointment.scheduled_date.strftime('%I:%M %p') if appointment.scheduled_date else 'To be determined'}</li>
+                        <li><strong>⏱️ Duration:</strong> {int(appointment.duration or 60)} minutes</li>
+                        <li><strong>📱 Mode:</strong> {html.escape(appointment.mode.replace('-', ' ').title()) if appointment.mode else 'In-person'}</li>
+                    </ul>
                 </div>
-                <div style="background: #2ecc71; color: white; padding: 10px; text-align: center; font-size: 12px;">
-                    <p>CUEA MindConnect - Supporting Your Mental Wellness Journey</p>
+                
+                {f'<p><strong>Meeting Link:</strong> <a href="{html.escape(appointment.video_link)}">{html.escape(appointment.video_link)}</a></p>' if appointment.video_link else ''}
+                
+                <p>Your counselor is looking forward to meeting with you. Please prepare any questions or topics you'd like to discuss.</p>
+                
+                <div style="text-align: center; margin-top: 20px;">
+                    <a href="{base_url}appointments" style="background: #27ae60; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">View Appointment Details</a>
                 </div>
             </div>
-            """
-            
-        elif notification_type == 'rescheduled':
-            msg.html = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background: linear-gradient(135deg, #f39c12, #e67e22); color: white; padding: 20px; text-align: center;">
-                    <h2>🧠 CUEA MindConnect</h2>
-                    <h3>Appointment Rescheduled</h3>
+            <div style="background: #2ecc71; color: white; padding: 10px; text-align: center; font-size: 12px;">
+                <p>CUEA MindConnect - Supporting Your Mental Wellness Journey</p>
+            </div>
+        </div>
+        """
+        
+    elif notification_type == 'rescheduled':
+        body = f"""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <div style="background: linear-gradient(135deg, #f39c12, #e67e22); color: white; padding: 20px; text-align: center;">
+                <h2>🧠 CUEA MindConnect</h2>
+                <h3>Appointment Rescheduled</h3>
+            </div>
+            <div style="padding: 20px; background: #f8f9fa;">
+                <p>Dear {html.escape(student.first_name or '')},</p>
+                <p>Your appointment has been rescheduled. Here are the updated details:</p>
+                
+                <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
+                    <h4>New Appointment Time</h4>
+                    <ul style="list-style: none; padding: 0;">
+                        <li><strong>📅 Date:</strong> {appointment.scheduled_date.strftime('%A, %B %d, %Y') if appointment.scheduled_date else 'To be determined'}</li>
+                        <li><strong>🕒 Time:</strong> {appointment.scheduled_date.strftime('%I:%M %p') if appointment.scheduled_date else 'To be determined'}</li>
+                        <li><strong>⏱️ Duration:</strong> {int(appointment.duration or 60)} minutes</li>
+                        <li><strong>👨‍⚕️ Counselor:</strong> {html.escape(appointment.counselor.get_full_name()) if appointment.counselor else 'To be assigned'}</li>
+                    </ul>
                 </div>
-                <div style="padding: 20px; background: #f8f9fa;">
-                    <p>Dear {appointment.student.first_name},</p>
-                    <p>Your appointment has been rescheduled. Here are the updated details:</p>
-                    
-                    <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
-                        <h4>New Appointment Time</h4>
-                        <ul style="list-style: none; padding: 0;">
-                            <li><strong>📅 Date:</strong> {appointment.scheduled_date.strftime('%A, %B %d, %Y') if appointment.scheduled_date else 'To be determined'}</li>
-                            <li><strong>🕒 Time:</strong> {appointment.scheduled_date.strftime('%I:%M %p') if appointment.scheduled_date else 'To be determined'}</li>
-                            <li><strong>⏱️ Duration:</strong> {appointment.duration or 60} minutes</li>
-                            <li><strong>👨‍⚕️ Counselor:</strong> {appointment.counselor.first_name} {appointment.counselor.last_name if appointment.counselor else 'To be assigned'}</li>
-                        </ul>
-                    </div>
-                    
-                    <div style="background: #fff3cd; border: 1px solid #ffeaa7; padding: 10px; border-radius: 5px; margin: 15px 0;">
-                        <strong>Please Note:</strong> Make sure to update your calendar with the new time. If this time doesn't work for you, please contact us as soon as possible.
-                    </div>
-                    
-                    <div style="text-align: center; margin-top: 20px;">
-                        <a href="{request.url_root}appointments" style="background: #f39c12; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">View Updated Details</a>
-                    </div>
+                
+                <div style="background: #fff3cd; border: 1px solid #ffeaa7; padding: 10px; border-radius: 5px; margin: 15px 0;">
+                    <strong>Please Note:</strong> Make sure to update your calendar with the new time. If this time doesn't work for you, please contact us as soon as possible.
                 </div>
-                <div style="background: #e67e22; color: white; padding: 10px; text-align: center; font-size: 12px;">
-                    <p>CUEA MindConnect - Supporting Your Mental Wellness Journey</p>
+                
+                <div style="text-align: center; margin-top: 20px;">
+                    <a href="{base_url}appointments" style="background: #f39c12; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">View Updated Details</a>
                 </div>
             </div>
-            """
-            
-        elif notification_type == 'cancelled':
-            msg.html = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background: linear-gradient(135deg, #e74c3c, #c0392b); color: white; padding: 20px; text-align: center;">
-                    <h2>🧠 CUEA MindConnect</h2>
-                    <h3>Appointment Cancelled</h3>
+            <div style="background: #e67e22; color: white; padding: 10px; text-align: center; font-size: 12px;">
+                <p>CUEA MindConnect - Supporting Your Mental Wellness Journey</p>
+            </div>
+        </div>
+        """
+        
+    elif notification_type == 'cancelled':
+        body = f"""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <div style="background: linear-gradient(135deg, #e74c3c, #c0392b); color: white; padding: 20px; text-align: center;">
+                <h2>🧠 CUEA MindConnect</h2>
+                <h3>Appointment Cancelled</h3>
+            </div>
+            <div style="padding: 20px; background: #f8f9fa;">
+                <p>Dear {html.escape(student.first_name or '')},</p>
+                <p>We regret to inform you that your appointment has been cancelled:</p>
+                
+                <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
+                    <h4>Cancelled Appointment</h4>
+                    <ul style="list-style: none; padding: 0;">
+                        <li><strong>📅 Date:</strong> {appointment.scheduled_date.strftime('%A, %B %d, %Y') if appointment.scheduled_date else 'N/A'}</li>
+                        <li><strong>🕒 Time:</strong> {appointment.scheduled_date.strftime('%I:%M %p') if appointment.scheduled_date else 'N/A'}</li>
+                        <li><strong>👨‍⚕️ Counselor:</strong> {html.escape(appointment.counselor.get_full_name()) if appointment.counselor else 'N/A'}</li>
+                    </ul>
                 </div>
-                <div style="padding: 20px; background: #f8f9fa;">
-                    <p>Dear {appointment.student.first_name},</p>
-                    <p>We regret to inform you that your appointment has been cancelled:</p>
-                    
-                    <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
-                        <h4>Cancelled Appointment</h4>
-                        <ul style="list-style: none; padding: 0;">
-                            <li><strong>📅 Date:</strong> {appointment.scheduled_date.strftime('%A, %B %d, %Y') if appointment.scheduled_date else 'N/A'}</li>
-                            <li><strong>🕒 Time:</strong> {appointment.scheduled_date.strftime('%I:%M %p') if appointment.scheduled_date else 'N/A'}</li>
-                            <li><strong>👨‍⚕️ Counselor:</strong> {appointment.counselor.first_name} {appointment.counselor.last_name if appointment.counselor else 'N/A'}</li>
-                        </ul>
-                    </div>
-                    
-                    <p>We apologize for any inconvenience this may cause. You can schedule a new appointment at your convenience.</p>
-                    
-                    <div style="background: #d4edda; border: 1px solid #c3e6cb; padding: 10px; border-radius: 5px; margin: 15px 0;">
-                        <strong>Need Support?</strong> If you need immediate assistance, please contact our crisis line at +254 719 887 000 or the national helpline at 1199.
-                    </div>
-                    
-                    <div style="text-align: center; margin-top: 20px;">
-                        <a href="{request.url_root}appointments/book" style="background: #27ae60; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Schedule New Appointment</a>
-                    </div>
+                
+                <p>We apologize for any inconvenience this may cause. You can schedule a new appointment at your convenience.</p>
+                
+                <div style="background: #d4edda; border: 1px solid #c3e6cb; padding: 10px; border-radius: 5px; margin: 15px 0;">
+                    <strong>Need Support?</strong> If you need immediate assistance, please contact our crisis line at +254 719 887 000 or the national helpline at 1199.
                 </div>
-                <div style="background: #c0392b; color: white; padding: 10px; text-align: center; font-size: 12px;">
-                    <p>CUEA MindConnect - Supporting Your Mental Wellness Journey</p>
+                
+                <div style="text-align: center; margin-top: 20px;">
+                    <a href="{base_url}appointments/book" style="background: #27ae60; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Schedule New Appointment</a>
                 </div>
             </div>
-            """
-        
-        email.send(msg)
-        print(f"Notification sent to {email}: {notification_type}")
-        
-    except Exception as e:
-        print(f"Failed to send email notification to {email}: {e}")
+            <div style="background: #c0392b; color: white; padding: 10px; text-align: center; font-size: 12px;">
+                <p>CUEA MindConnect - Supporting Your Mental Wellness Journey</p>
+            </div>
+        </div>
+        """
+    
+    if body is None:
+        body = render_generic_notification(appointment, subject, base_url)
+    return subject, body
 
-def send_counselor_notification(email, appointment, notification_type):
-    """Send appointment notification email to counselor"""
+def render_counselor_notification(appointment, notification_type, base_url):
+    """Build the (subject, html) of an appointment email to the counselor"""
+    student = appointment.user
     subject_map = {
         'assigned': 'New Appointment Assigned - CUEA MindConnect',
         'reassigned': 'Appointment Reassigned - CUEA MindConnect',
@@ -7019,156 +8846,330 @@ def send_counselor_notification(email, appointment, notification_type):
         'reminder': 'Appointment Reminder - CUEA MindConnect'
     }
     
-    try:
-        msg = Message(
-            subject=subject_map.get(notification_type, 'Appointment Update - CUEA MindConnect'),
-            sender=app.config['MAIL_DEFAULT_SENDER'],
-            recipients=[email]
-        )
-        
-        if notification_type == 'assigned':
-            msg.html = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background: linear-gradient(135deg, #3498db, #2980b9); color: white; padding: 20px; text-align: center;">
-                    <h2>🧠 CUEA MindConnect</h2>
-                    <h3>New Appointment Assigned</h3>
+    subject = subject_map.get(notification_type, 'Appointment Update - CUEA MindConnect')
+    body = None
+    
+    if notification_type == 'assigned':
+        body = f"""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <div style="background: linear-gradient(135deg, #3498db, #2980b9); color: white; padding: 20px; text-align: center;">
+                <h2>🧠 CUEA MindConnect</h2>
+                <h3>New Appointment Assigned</h3>
+            </div>
+            <div style="padding: 20px; background: #f8f9fa;">
+                <p>Dear {html.escape(appointment.counselor.first_name or '') if appointment.counselor else 'Counselor'},</p>
+                <p>You have been assigned a new counseling appointment:</p>
+                
+                <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
+                    <h4>Student Information</h4>
+                    <ul style="list-style: none; padding: 0;">
+                        <li><strong>👤 Name:</strong> {html.escape(student.first_name or '')} {html.escape(student.last_name or '')}</li>
+                        <li><strong>📧 Email:</strong> {html.escape(student.email or '')}</li>
+                        <li><strong>🆔 Student ID:</strong> {html.escape(getattr(student, 'student_id', None) or 'N/A')}</li>
+                        <li><strong>📚 Course:</strong> {html.escape(getattr(student, 'course', None) or 'N/A')}</li>
+                    </ul>
                 </div>
-                <div style="padding: 20px; background: #f8f9fa;">
-                    <p>Dear {appointment.counselor.first_name if appointment.counselor else 'Counselor'},</p>
-                    <p>You have been assigned a new counseling appointment:</p>
-                    
-                    <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
-                        <h4>Student Information</h4>
-                        <ul style="list-style: none; padding: 0;">
-                            <li><strong>👤 Name:</strong> {appointment.student.first_name} {appointment.student.last_name}</li>
-                            <li><strong>📧 Email:</strong> {appointment.student.email}</li>
-                            <li><strong>🆔 Student ID:</strong> {getattr(appointment.student, 'student_id', 'N/A')}</li>
-                            <li><strong>📚 Course:</strong> {getattr(appointment.student, 'course', 'N/A')}</li>
-                        </ul>
-                    </div>
-                    
-                    <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
-                        <h4>Appointment Details</h4>
-                        <ul style="list-style: none; padding: 0;">
-                            <li><strong>📅 Date:</strong> {appointment.scheduled_date.strftime('%A, %B %d, %Y') if appointment.scheduled_date else 'To be determined'}</li>
-                            <li><strong>🕒 Time:</strong> {appointment.scheduled_date.strftime('%I:%M %p') if appointment.scheduled_date else 'To be determined'}</li>
-                            <li><strong>⏱️ Duration:</strong> {appointment.duration or 60} minutes</li>
-                            <li><strong>📱 Mode:</strong> {appointment.mode.replace('-', ' ').title() if appointment.mode else 'In-person'}</li>
-                            <li><strong>🎯 Topic:</strong> {appointment.topic.replace('-', ' ').title() if appointment.topic else 'General counseling'}</li>
-                            <li><strong>⚡ Priority:</strong> {appointment.urgency.title() if appointment.urgency else 'Normal'}</li>
-                        </ul>
-                    </div>
-                    
-                    {f'<div style="background: #e8f4f8; padding: 15px; border-radius: 8px; margin: 15px 0;"><h4>Student\'s Reason</h4><p>{appointment.reason}</p></div>' if appointment.reason else ''}
-                    
-                    {f'<p><strong>Meeting Link:</strong> <a href="{appointment.meeting_link}">{appointment.meeting_link}</a></p>' if appointment.meeting_link else ''}
-                    
-                    <div style="background: #d1ecf1; border: 1px solid #bee5eb; padding: 10px; border-radius: 5px; margin: 15px 0;">
-                        <strong>Preparation:</strong> Please review the student's information and prepare for the session. Contact the student if you need to reschedule.
-                    </div>
-                    
-                    <div style="text-align: center; margin-top: 20px;">
-                        <a href="{request.url_root}counselor/appointments" style="background: #3498db; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">View My Appointments</a>
-                    </div>
+                
+                <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
+                    <h4>Appointment Details</h4>
+                    <ul style="list-style: none; padding: 0;">
+                        <li><strong>📅 Date:</strong> {appointment.scheduled_date.strftime('%A, %B %d, %Y') if appointment.scheduled_date else 'To be determined'}</li>
+                        <li><strong>🕒 Time:</strong> {appointment.scheduled_date.strftime('%I:%M %p') if appointment.scheduled_date else 'To be determined'}</li>
+                        <li><strong>⏱️ Duration:</strong> {int(appointment.duration or 60)} minutes</li>
+                        <li><strong>📱 Mode:</strong> {html.escape(appointment.mode.replace('-', ' ').title()) if appointment.mode else 'In-person'}</li>
+                        <li><strong>🎯 Topic:</strong> {html.escape(appointment.topic.replace('-', ' ').title()) if appointment.topic else 'General counseling'}</li>
+                        <li><strong>⚡ Priority:</strong> {html.escape(appointment.priority.title()) if appointment.priority else 'Normal'}</li>
+                    </ul>
                 </div>
-                <div style="background: #2980b9; color: white; padding: 10px; text-align: center; font-size: 12px;">
-                    <p>CUEA MindConnect - Supporting Student Mental Wellness</p>
+                
+                {f'<div style="background: #e8f4f8; padding: 15px; border-radius: 8px; margin: 15px 0;"><h4>Student\'s Reason</h4><p>{html.escape(appointment.specific_concerns)}</p></div>' if appointment.specific_concerns else ''}
+                
+                {f'<p><strong>Meeting Link:</strong> <a href="{html.escape(appointment.video_link)}">{html.escape(appointment.video_link)}</a></p>' if appointment.video_link else ''}
+                
+                <div style="background: #d1ecf1; border: 1px solid #bee5eb; padding: 10px; border-radius: 5px; margin: 15px 0;">
+                    <strong>Preparation:</strong> Please review the student's information and prepare for the session. Contact the student if you need to reschedule.
                 </div>
-            </div>
-            """
-            
-        elif notification_type == 'cancelled':
-            msg.html = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background: linear-gradient(135deg, #e74c3c, #c0392b); color: white; padding: 20px; text-align: center;">
-                    <h2>🧠 CUEA MindConnect</h2>
-                    <h3>Appointment Cancelled</h3>
+                
+                <div style="text-align: center; margin-top: 20px;">
+                    <a href="{base_url}counselor/appointments" style="background: #3498db; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">View My Appointments</a>
                 </div>
-                <div style="padding: 20px; background: #f8f9fa;">
-                    <p>Dear {appointment.counselor.first_name if appointment.counselor else 'Counselor'},</p>
-                    <p>An appointment assigned to you has been cancelled:</p>
-                    
-                    <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
-                        <h4>Cancelled Appointment</h4>
-                        <ul style="list-style: none; padding: 0;">
-                            <li><strong>👤 Student:</strong> {appointment.student.first_name} {appointment.student.last_name}</li>
-                            <li><strong>📅 Date:</strong> {appointment.scheduled_date.strftime('%A, %B %d, %Y') if appointment.scheduled_date else 'N/A'}</li>
-                            <li><strong>🕒 Time:</strong> {appointment.scheduled_date.strftime('%I:%M %p') if appointment.scheduled_date else 'N/A'}</li>
-                        </ul>
-                    </div>
-                    
-                    <p>Please update your calendar accordingly. This time slot is now available for other appointments.</p>
-                    
-                    <div style="text-align: center; margin-top: 20px;">
-                        <a href="{request.url_root}counselor/appointments" style="background: #95a5a6; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">View My Schedule</a>
-                    </div>
+            </div>
+            <div style="background: #2980b9; color: white; padding: 10px; text-align: center; font-size: 12px;">
+                <p>CUEA MindConnect - Supporting Student Mental Wellness</p>
+            </div>
+        </div>
+        """
+        
+    elif notification_type == 'cancelled':
+        body = f"""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <div style="background: linear-gradient(135deg, #e74c3c, #c0392b); color: white; padding: 20px; text-align: center;">
+                <h2>🧠 CUEA MindConnect</h2>
+                <h3>Appointment Cancelled</h3>
+            </div>
+            <div style="padding: 20px; background: #f8f9fa;">
+                <p>Dear {html.escape(appointment.counselor.first_name or '') if appointment.counselor else 'Counselor'},</p>
+                <p>An appointment assigned to you has been cancelled:</p>
+                
+                <div style="background: white; padding: 15px; border-radius: 8px; margin: 15px 0;">
+                    <h4>Cancelled Appointment</h4>
+                    <ul style="list-style: none; padding: 0;">
+                        <li><strong>👤 Student:</strong> {html.escape(student.first_name or '')} {html.escape(student.last_name or '')}</li>
+                        <li><strong>📅 Date:</strong> {appointment.scheduled_date.strftime('%A, %B %d, %Y') if appointment.scheduled_date else 'N/A'}</li>
+                        <li><strong>🕒 Time:</strong> {appointment.scheduled_date.strftime('%I:%M %p') if appointment.scheduled_date else 'N/A'}</li>
+                    </ul>
                 </div>
-                <div style="background: #c0392b; color: white; padding: 10px; text-align: center; font-size: 12px;">
-                    <p>CUEA MindConnect - Supporting Student Mental Wellness</p>
+                
+                <p>Please update your calendar accordingly. This time slot is now available for other appointments.</p>
+                
+                <div style="text-align: center; margin-top: 20px;">
+                    <a href="{base_url}counselor/appointments" style="background: #95a5a6; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">View My Schedule</a>
                 </div>
             </div>
-            """
-        
-        # Add similar templates for other notification types...
-        
-        email.send(msg)
-        print(f"Counselor notification sent to {email}: {notification_type}")
-        
+            <div style="background: #c0392b; color: white; padding: 10px; text-align: center; font-size: 12px;">
+                <p>CUEA MindConnect - Supporting Student Mental Wellness</p>
+            </div>
+        </div>
+        """
+    
+    if body is None:
+        body = render_generic_notification(appointment, subject, base_url)
+    return subject, body
+
+def send_appointment_notification(email, appointment, notification_type):
+    """Queue an appointment notification email to the student"""
+    try:
+        enqueue_notification(email, appointment, 'student', notification_type)
     except Exception as e:
-        print(f"Failed to send counselor notification to {email}: {e}")
+        db.session.rollback()
+        app.logger.error(f"Failed to queue notification to {email}: {str(e)}")
+
+def send_counselor_notification(email, appointment, notification_type):
+    """Queue an appointment notification email to the counselor"""
+    try:
+        enqueue_notification(email, appointment, 'counselor', notification_type)
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Failed to queue counselor notification to {email}: {str(e)}")
 
 # =============================================================================
 # SCHEDULED TASKS AND REMINDERS
 # =============================================================================
 
-@app.route('/api/admin/appointments/send-reminders')
+app.config.setdefault('REMINDER_OFFSETS_MINUTES', (1440, 60))  # reminders per appointment, minutes before start
+app.config.setdefault('REMINDER_STATUSES', ('scheduled', 'assigned'))  # appointments that get reminders
+app.config.setdefault('REMINDER_BATCH_SIZE', 500)
+app.config.setdefault('REMINDER_POLL_SECONDS', 30)
+app.config.setdefault('REMINDER_SCHEDULER_ENABLED', True)
+
+# Appointment times are stored as local wall-clock times, so reminder
+# times are too and are compared against datetime.now().
+
+
+def _reminder_rows(appointment_id, scheduled_date, now):
+    return [{
+        'appointment_id': appointment_id,
+        'reminder_type': 'email',
+        'reminder_time': scheduled_date - timedelta(minutes=minutes),
+        'minutes_before': minutes,
+        'sent': False,
+        'recipient_type': 'both',
+        'created_at': datetime.utcnow()
+    } for minutes in app.config['REMINDER_OFFSETS_MINUTES']
+        if scheduled_date - timedelta(minutes=minutes) > now]
+
+
+def sync_appointment_reminders(connection, appointment_id, scheduled_date, status, now=None, is_new=False):
+    """Replace an appointment's unsent reminders to match its current schedule"""
+    now = now or datetime.now()
+    reminders = AppointmentReminder.__table__
+    if not is_new:
+        connection.execute(reminders.delete().where(
+            reminders.c.appointment_id == appointment_id,
+            reminders.c.sent == False
+        ))
+    if scheduled_date and status in app.config['REMINDER_STATUSES'] and scheduled_date > now:
+        rows = _reminder_rows(appointment_id, scheduled_date, now)
+        if rows:
+            connection.execute(reminders.insert(), rows)
+
+
+@event.listens_for(SQLAlchemySession, 'after_flush')
+def _materialize_appointment_reminders(session, flush_context):
+    """Keep reminder rows in step with appointment scheduling, in the same transaction"""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, AppointmentRequest):
+            continue
+        is_new = obj in session.new
+        state = db.inspect(obj)
+        if not is_new and not (state.attrs.scheduled_date.history.has_changes() or
+                               state.attrs.status.history.has_changes()):
+            continue
+        sync_appointment_reminders(session.connection(), obj.id, obj.scheduled_date, obj.status, is_new=is_new)
+
+
+def materialize_missing_reminders(now=None):
+    """Create reminder rows for upcoming appointments that have none (backfill); returns rows added"""
+    now = now or datetime.now()
+    has_reminders = db.session.query(AppointmentReminder.id).filter(
+        AppointmentReminder.appointment_id == AppointmentRequest.id
+    ).exists()
+    appointments = db.session.query(AppointmentRequest.id, AppointmentRequest.scheduled_date).filter(
+        AppointmentRequest.status.in_(app.config['REMINDER_STATUSES']),
+        AppointmentRequest.scheduled_date > now,
+        ~has_reminders
+    ).all()
+
+    rows = [row for appointment_id, scheduled_date in appointments
+            for row in _reminder_rows(appointment_id, scheduled_date, now)]
+    if rows:
+        db.session.execute(AppointmentReminder.__table__.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def dispatch_due_reminders(batch_size=None, now=None):
+    """Claim one batch of due reminders and queue their emails; returns (claimed, queued).
+
+    Claiming is a single UPDATE ... RETURNING over the (sent, reminder_time)
+    index, committed together with the notification jobs, so a reminder is
+    either marked sent with its emails queued or left untouched. A restart
+    can't send twice, and the job idempotency keys cover any overlap.
+    """
+    now = now or datetime.now()
+    batch_size = batch_size or app.config['REMINDER_BATCH_SIZE']
+    reminders = AppointmentReminder.__table__
+
+    due_ids = db.session.query(AppointmentReminder.id).filter(
+        AppointmentReminder.sent == False,
+        AppointmentReminder.reminder_time <= now
+    ).order_by(AppointmentReminder.reminder_time).limit(batch_size).scalar_subquery()
+
+    claimed = db.session.execute(
+        reminders.update()
+        .where(reminders.c.id.in_(due_ids), reminders.c.sent == False)
+        .values(sent=True, sent_at=datetime.utcnow())
+        .returning(reminders.c.appointment_id, reminders.c.minutes_before, reminders.c.reminder_time)
+    ).all()
+    if not claimed:
+        db.session.commit()
+        return 0, 0
+
+    appointments = {appointment.id: appointment for appointment in AppointmentRequest.query.options(
+        joinedload(AppointmentRequest.user),
+        joinedload(AppointmentRequest.counselor)
+    ).filter(AppointmentRequest.id.in_({row.appointment_id for row in claimed})).all()}
+
+    queued = 0
+    for row in claimed:
+        appointment = appointments.get(row.appointment_id)
+        # Skip reminders made stale by writes that bypassed the flush hook, and
+        # ones that only came due after the session had already started
+        if (appointment is None or appointment.scheduled_date is None or
+                appointment.status not in app.config['REMINDER_STATUSES'] or
+                appointment.scheduled_date <= now or
+                appointment.scheduled_date - timedelta(minutes=row.minutes_before) != row.reminder_time):
+            continue
+        discriminator = f"{row.minutes_before}m"
+        queued += enqueue_notification(appointment.user.email, appointment, 'student', 'reminder',
+                                       commit=False, discriminator=discriminator)
+        if appointment.counselor:
+            queued += enqueue_notification(appointment.counselor.email, appointment, 'counselor', 'reminder',
+                                           commit=False, discriminator=discriminator)
+    db.session.commit()
+    return len(claimed), queued
+
+
+def run_reminder_dispatch(now=None):
+    """Dispatch every due reminder batch; returns (claimed, queued) totals"""
+    total_claimed = total_queued = 0
+    while True:
+        claimed, queued = dispatch_due_reminders(now=now)
+        total_claimed += claimed
+        total_queued += queued
+        if claimed < app.config['REMINDER_BATCH_SIZE']:
+            return total_claimed, total_queued
+
+
+class ReminderScheduler:
+    """Background thread that dispatches due reminders every REMINDER_POLL_SECONDS"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join(timeout)
+
+    def _run(self):
+        with app.app_context():
+            try:
+                materialize_missing_reminders()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Reminder backfill failed: {str(e)}")
+
+        while not self.stopping.is_set():
+            try:
+                with app.app_context():
+                    claimed, queued = run_reminder_dispatch()
+                    if claimed:
+                        app.logger.info(f"Dispatched {claimed} reminder(s), queued {queued} email(s)")
+            except Exception as e:
+                app.logger.error(f"Reminder dispatch failed: {str(e)}")
+            self.stopping.wait(app.config['REMINDER_POLL_SECONDS'])
+
+
+reminder_scheduler = ReminderScheduler()
+
+
+@app.before_request
+def start_reminder_scheduler():
+    """Start the scheduler with the first request so CLI commands don't spawn it"""
+    if app.config['REMINDER_SCHEDULER_ENABLED'] and not (reminder_scheduler.thread and reminder_scheduler.thread.is_alive()):
+        reminder_scheduler.start()
+
+
+@app.cli.command('dispatch-reminders')
+def dispatch_reminders_command():
+    """Backfill missing reminder rows and dispatch every due reminder once."""
+    added = materialize_missing_reminders()
+    claimed, queued = run_reminder_dispatch()
+    click.echo(f"⏰ Backfilled {added} reminder(s); dispatched {claimed}, queued {queued} email(s)")
+
+
+@app.route('/api/admin/appointments/send-reminders', methods=['GET', 'POST'])
 def api_send_appointment_reminders():
-    """Send appointment reminders (can be called by a cron job)"""
+    """Run a reminder pass now (the background scheduler normally does this)"""
     if not current_user.is_authenticated or current_user.role != 'admin':
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
     try:
-        # Send reminders for appointments in the next 24 hours
-        tomorrow = datetime.now() + timedelta(hours=24)
-        upcoming_appointments = Appointment.query.filter(
-            Appointment.status == 'scheduled',
-            Appointment.scheduled_date <= tomorrow,
-            Appointment.scheduled_date >= datetime.now()
-        ).all()
-        
-        reminders_sent = 0
-        errors = []
-        
-        for appointment in upcoming_appointments:
-            try:
-                # Send to student
-                send_appointment_notification(
-                    appointment.student.email, 
-                    appointment, 
-                    'reminder'
-                )
-                
-                # Send to counselor
-                if appointment.counselor:
-                    send_counselor_notification(
-                        appointment.counselor.email, 
-                        appointment, 
-                        'reminder'
-                    )
-                
-                reminders_sent += 1
-                
-            except Exception as e:
-                errors.append(f"Failed to send reminder for appointment #{appointment.id}: {str(e)}")
+        added = materialize_missing_reminders()
+        claimed, queued = run_reminder_dispatch()
         
         return jsonify({
             'success': True,
-            'message': f'Sent {reminders_sent} appointment reminders',
-            'reminders_sent': reminders_sent,
-            'errors': errors
+            'message': f'Dispatched {claimed} due reminders',
+            'reminders_created': added,
+            'reminders_dispatched': claimed,
+            'emails_queued': queued,
+            'errors': []
         })
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 500
 
 # =============================================================================
@@ -7181,7 +9182,7 @@ def api_available_slots():
     try:
         date_str = request.args.get('date')
         duration = int(request.args.get('duration', 60))
-        counselor_id = request.args.get('counselor_id')
+        counselor_id = request.args.get('counselor_id', type=int)
         
         if not date_str:
             return jsonify({'success': False, 'message': 'Date is required'}), 400
@@ -7195,66 +9196,10 @@ def api_available_slots():
         if target_date < date.today():
             return jsonify({'success': False, 'message': 'Cannot book appointments in the past'}), 400
         
-        # Define working hours (configurable)
-        working_hours = {
-            'start': '08:00',
-            'end': '17:00',
-            'break_start': '12:00',
-            'break_end': '13:00'
-        }
-        
-        # Generate all possible time slots
-        slots = []
-        current_time = datetime.strptime(f"{date_str} {working_hours['start']}", '%Y-%m-%d %H:%M')
-        end_time = datetime.strptime(f"{date_str} {working_hours['end']}", '%Y-%m-%d %H:%M')
-        break_start = datetime.strptime(f"{date_str} {working_hours['break_start']}", '%Y-%m-%d %H:%M')
-        break_end = datetime.strptime(f"{date_str} {working_hours['break_end']}", '%Y-%m-%d %H:%M')
-        
-        slot_duration = timedelta(minutes=30)  # 30-minute slots
-        
-        while current_time + timedelta(minutes=duration) <= end_time:
-            # Skip lunch break
-            if not (current_time >= break_start and current_time < break_end):
-                # Check if this slot has enough time before break or end of day
-                slot_end = current_time + timedelta(minutes=duration)
-                
-                if slot_end <= break_start or current_time >= break_end:
-                    slots.append(current_time.strftime('%H:%M'))
-            
-            current_time += slot_duration
-        
-        # Filter out occupied slots - FIXED to use AppointmentRequest
-        occupied_slots = []
-        
-        # Get all appointments for the target date
-        existing_appointments = AppointmentRequest.query.filter(
-            func.date(AppointmentRequest.scheduled_date) == target_date,
-            AppointmentRequest.status.in_(['scheduled', 'assigned'])
-        ).all()
-        
-        if counselor_id:
-            existing_appointments = [apt for apt in existing_appointments if apt.counselor_id == int(counselor_id)]
-        
-        for appointment in existing_appointments:
-            if appointment.scheduled_date:
-                start_time = appointment.scheduled_date.strftime('%H:%M')
-                # Remove slots that would conflict
-                appointment_duration = appointment.duration or 60
-                appointment_end = appointment.scheduled_date + timedelta(minutes=appointment_duration)
-                
-                # Remove all slots that would overlap
-                slots_to_remove = []
-                for slot in slots:
-                    slot_datetime = datetime.strptime(f"{date_str} {slot}", '%Y-%m-%d %H:%M')
-                    slot_end = slot_datetime + timedelta(minutes=duration)
-                    
-                    # Check for overlap
-                    if (slot_datetime < appointment_end and slot_end > appointment.scheduled_date):
-                        slots_to_remove.append(slot)
-                
-                for slot in slots_to_remove:
-                    if slot in slots:
-                        slots.remove(slot)
+        # A slot is open when the chosen counselor (or, with no counselor given, any active counselor) is free
+        counselor_ids = [counselor_id] if counselor_id else active_counselor_ids()
+        engine = AvailabilityEngine(counselor_ids, target_date)
+        slots = engine.merged_slots(target_date, duration, not_before=datetime.now())
         
         return jsonify({
             'success': True,
@@ -7267,6 +9212,43 @@ def api_available_slots():
         app.logger.error(f"Error getting available slots: {str(e)}")
         return jsonify({'success': False, 'message': f'Failed to get available slots: {str(e)}'}), 500
 
+@app.route('/api/availability/matrix')
+@login_required
+def api_availability_matrix():
+    """Free slots per counselor per day for the next N days"""
+    try:
+        start_str = request.args.get('start')
+        days = min(max(request.args.get('days', 7, type=int), 1), 31)
+        duration = request.args.get('duration', type=int)
+        counselor_id = request.args.get('counselor_id', type=int)
+        
+        try:
+            first_day = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else date.today()
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        
+        first_day = max(first_day, date.today())
+        result = build_availability_matrix(first_day, days, duration, [counselor_id] if counselor_id else None)
+        
+        response = {
+            'success': True,
+            'start': first_day.isoformat(),
+            'days': days,
+            'duration': duration,
+            'slots': {day: list(slots) for day, slots in result['days'].items()}
+        }
+        
+        # Only staff get to see which counselor is free when
+        if isinstance(current_user, Counselor) or getattr(current_user, 'role', None) == 'admin':
+            response['counselors'] = result['counselors']
+            response['matrix'] = result['days']
+        
+        return jsonify(response)
+        
+    except Exception as e:
+        app.logger.error(f"Error building availability matrix: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to load availability'}), 500
+
 @app.route('/admin/users')
 @login_required
 @role_required('admin')
@@ -7296,7 +9278,6 @@ def admin_users():
         courses = list(set([u.course for u in users if u.course]))
         courses.sort()
         
-        print(f"✅ Loaded {len(users)} users successfully")
         
         return render_template('admin_users.html',
                              users=users,
@@ -7308,9 +9289,7 @@ def admin_users():
                              year_distribution=year_distribution)
                              
     except Exception as e:
-        app.logger.error(f"Error loading admin users: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Error loading admin users: {str(e)}")
         flash('Error loading users data. Please try again.', 'error')
         # Return empty template with fallback data
         return render_template('admin_users.html',
@@ -7558,26 +9537,25 @@ def admin_main():
 @login_required
 @role_required('admin') 
 def api_admin_forum_check_updates_fixed():
-    """FIXED: Check for forum updates with better error handling"""
+    """Check for forum activity since a change-log cursor (`since`) or timestamp (`last_check`)"""
     try:
-        last_check_param = request.args.get('last_check')
-        
-        if last_check_param:
-            try:
-                last_check = datetime.fromisoformat(last_check_param.replace('Z', ''))
-            except:
-                last_check = datetime.utcnow() - timedelta(minutes=5)
+        forum_changes = ChangeLog.query.filter(ChangeLog.event_type.startswith('forum.'))
+        since = request.args.get('since', type=int)
+
+        if since is not None:
+            forum_changes = forum_changes.filter(ChangeLog.seq > since)
         else:
-            last_check = datetime.utcnow() - timedelta(minutes=5)
-        
-        # Get recent forum activity
-        recent_posts = ForumPost.query.filter(
-            ForumPost.created_at > last_check
-        ).count()
-        
-        recent_replies = ForumReply.query.filter(
-            ForumReply.created_at > last_check  
-        ).count()
+            last_check_param = request.args.get('last_check')
+            try:
+                last_check = datetime.fromisoformat(last_check_param.replace('Z', '')) if last_check_param else None
+            except ValueError:
+                last_check = None
+            forum_changes = forum_changes.filter(
+                ChangeLog.created_at > (last_check or datetime.utcnow() - timedelta(minutes=5)))
+
+        counts = dict(forum_changes.with_entities(
+            ChangeLog.event_type, func.count(ChangeLog.seq)
+        ).group_by(ChangeLog.event_type).all())
         
         # Check flagged posts (handle case where columns don't exist)
         try:
@@ -7585,13 +9563,19 @@ def api_admin_forum_check_updates_fixed():
         except Exception:
             flagged_posts = 0
         
+        now = datetime.utcnow().isoformat()
         return jsonify({
             'success': True,
+            'hasUpdates': bool(counts),
+            'timestamp': now,
+            'cursor': latest_change_seq(),
             'updates': {
-                'new_posts': recent_posts,
-                'new_replies': recent_replies, 
+                'new_posts': counts.get('forum.post_created', 0),
+                'new_replies': counts.get('forum.reply_created', 0),
+                'changed_posts': counts.get('forum.post_updated', 0) + counts.get('forum.post_deleted', 0),
+                'changed_replies': counts.get('forum.reply_updated', 0) + counts.get('forum.reply_deleted', 0),
                 'flagged_posts': flagged_posts,
-                'last_updated': datetime.utcnow().isoformat()
+                'last_updated': now
             }
         })
         
@@ -7959,9 +9943,6 @@ def counselor_login():
         password = request.form.get('password', '')
         remember_me = request.form.get('remember_me')
 
-        print(f"\n🔍 COUNSELOR LOGIN ATTEMPT:")
-        print(f"   Username: '{username}'")
-        
         if not username or not password:
             flash('Please enter both username and password.', 'error')
             return render_template('counselor_login.html')
@@ -7970,15 +9951,11 @@ def counselor_login():
         counselor = Counselor.query.filter_by(username=username).first()
         
         if counselor:
-            print(f"✅ Found counselor: {counselor.get_full_name()}")
-            
             if not counselor.is_active:
                 flash('Your account has been deactivated. Please contact administration.', 'error')
                 return render_template('counselor_login.html')
             
             if counselor.check_password(password):
-                print("✅ Password verification successful")
-                
                 # CRITICAL FIX: Set session hint BEFORE login
                 session['user_type'] = 'counselor'
                 
@@ -7990,13 +9967,12 @@ def counselor_login():
                     counselor.last_login = datetime.utcnow()
                     db.session.commit()
                 except Exception as e:
-                    print(f"⚠️ Could not update last_login: {e}")
+                    app.logger.warning(f"Could not update last_login: {e}")
                 
-                print("🎉 Counselor login successful")
+                app.logger.info("Login succeeded for counselor %s", counselor.id)
                 
                 # Check if password needs to be changed
                 if not getattr(counselor, 'password_changed', True):
-                    print("🔄 Redirecting to password change")
                     return redirect(url_for('counselor_force_password_change'))
                 
                 # Redirect to counselor dashboard
@@ -8005,10 +9981,10 @@ def counselor_login():
                     return redirect(next_page)
                 return redirect(url_for('counselor_dashboard'))
             else:
-                print("❌ Password verification failed")
+                app.logger.info("Login failed for counselor %s: wrong password", counselor.id)
                 flash('Invalid username or password. Please try again.', 'error')
         else:
-            print(f"❌ No counselor found with username: '{username}'")
+            app.logger.info("Counselor login failed: unknown username")
             flash('Invalid username or password. Please try again.', 'error')
 
     return render_template('counselor_login.html')
@@ -8467,6 +10443,7 @@ def api_student_available_times():
     try:
         date_str = request.args.get('date')
         duration = int(request.args.get('duration', 60))
+        counselor_id = request.args.get('counselor_id', type=int)
         
         if not date_str:
             return jsonify({'success': False, 'message': 'Date is required'}), 400
@@ -8480,42 +10457,10 @@ def api_student_available_times():
         if target_date < date.today():
             return jsonify({'success': False, 'message': 'Cannot book appointments in the past'}), 400
         
-        # Generate available time slots (9 AM to 5 PM, 30-minute intervals)
-        available_times = []
-        start_hour = 9
-        end_hour = 17
-        
-        for hour in range(start_hour, end_hour):
-            for minute in [0, 30]:
-                # Skip lunch hour (12:00-13:00)
-                if hour == 12:
-                    continue
-                time_slot = f"{hour:02d}:{minute:02d}"
-                available_times.append(time_slot)
-        
-        # In a real implementation, you would check for existing appointments
-        # and remove conflicting time slots from available_times
-        
-        # Get existing appointments for this date (if you want to filter them out)
-        try:
-            existing_appointments = AppointmentRequest.query.filter(
-                func.date(AppointmentRequest.scheduled_date) == target_date,
-                AppointmentRequest.status.in_(['scheduled', 'assigned'])
-            ).all()
-            
-            # Remove occupied slots (basic implementation)
-            occupied_times = []
-            for apt in existing_appointments:
-                if apt.scheduled_date:
-                    occupied_time = apt.scheduled_date.strftime('%H:%M')
-                    occupied_times.append(occupied_time)
-            
-            # Filter out occupied times
-            available_times = [t for t in available_times if t not in occupied_times]
-            
-        except Exception as e:
-            # If there's an error checking existing appointments, just return all slots
-            app.logger.warning(f"Could not check existing appointments: {e}")
+        # Students don't pick a counselor, so offer every time at least one active counselor can take
+        counselor_ids = [counselor_id] if counselor_id else active_counselor_ids()
+        engine = AvailabilityEngine(counselor_ids, target_date)
+        available_times = engine.merged_slots(target_date, duration, not_before=datetime.now())
         
         return jsonify({
             'success': True,
@@ -9010,11 +10955,11 @@ def api_counselor_appointments():
         if date_filter:
             today = date.today()
             if date_filter == 'today':
-                query = query.filter(func.date(AppointmentRequest.scheduled_date) == today)
+                query = query.filter(day_range_filter(AppointmentRequest.scheduled_date, today))
             elif date_filter == 'this-week':
                 week_start = today - timedelta(days=today.weekday())
                 week_end = week_start + timedelta(days=6)
-                query = query.filter(func.date(AppointmentRequest.scheduled_date).between(week_start, week_end))
+                query = query.filter(day_range_filter(AppointmentRequest.scheduled_date, week_start, week_end))
         
         appointments = query.order_by(AppointmentRequest.scheduled_date.desc()).all()
         
@@ -9130,36 +11075,24 @@ def api_get_available_counselors():
         except ValueError:
             return jsonify({'success': False, 'message': 'Invalid date format'}), 400
         
-        # Get all active counselors
+        # Get all active counselors and check them against their real schedules in one pass
         all_counselors = Counselor.query.filter_by(is_active=True).all()
+        counselor_ids = [counselor.id for counselor in all_counselors]
+        engine = AvailabilityEngine(
+            counselor_ids,
+            target_datetime.date(),
+            exclude_appointment_ids=[exclude_appointment_id] if exclude_appointment_id else None
+        )
+        workloads = get_counselor_workloads(counselor_ids)
         available_counselors = []
         
         for counselor in all_counselors:
-            # Check for conflicts (simplified - same hour on same date)
-            conflict_query = AppointmentRequest.query.filter(
-                AppointmentRequest.counselor_id == counselor.id,
-                func.date(AppointmentRequest.scheduled_date) == target_datetime.date(),
-                func.extract('hour', AppointmentRequest.scheduled_date) == target_datetime.hour,
-                AppointmentRequest.status.in_(['scheduled', 'assigned'])
-            )
-            
-            if exclude_appointment_id:
-                conflict_query = conflict_query.filter(AppointmentRequest.id != exclude_appointment_id)
-            
-            conflicts = conflict_query.count()
-            
-            if conflicts == 0:
-                # Get current workload
-                current_appointments = AppointmentRequest.query.filter(
-                    AppointmentRequest.counselor_id == counselor.id,
-                    AppointmentRequest.status.in_(['scheduled', 'assigned'])
-                ).count()
-                
+            if engine.is_free(counselor.id, target_datetime, int(duration)):
                 available_counselors.append({
                     'id': counselor.id,
                     'name': f"{counselor.first_name} {counselor.last_name}",
                     'specialization': counselor.specialization or 'General Counseling',
-                    'workload': current_appointments
+                    'workload': workloads[counselor.id]['upcoming']
                 })
         
         return jsonify({
@@ -9180,8 +11113,7 @@ def api_assign_counselor_with_details(appointment_id):
     """FIXED: Assign counselor with complete details"""
     try:
         data = request.get_json()
-        print(f"🔧 Assigning counselor to appointment {appointment_id}")
-        print(f"📊 Assignment data: {data}")
+        app.logger.debug("Assigning counselor to appointment %s with fields %s", appointment_id, sorted(data or {}))
         
         # Get and validate data
         counselor_id = data.get('counselor_id')
@@ -9217,8 +11149,7 @@ def api_assign_counselor_with_details(appointment_id):
         # Check for conflicts (simplified)
         existing_conflict = AppointmentRequest.query.filter(
             AppointmentRequest.counselor_id == counselor_id,
-            func.date(AppointmentRequest.scheduled_date) == scheduled_datetime.date(),
-            func.extract('hour', AppointmentRequest.scheduled_date) == scheduled_datetime.hour,
+            hour_range_filter(AppointmentRequest.scheduled_date, scheduled_datetime),
             AppointmentRequest.status.in_(['scheduled', 'assigned']),
             AppointmentRequest.id != appointment_id
         ).first()
@@ -9255,7 +11186,7 @@ def api_assign_counselor_with_details(appointment_id):
         
         db.session.commit()
         
-        print(f"✅ Counselor assigned successfully")
+        app.logger.info("Counselor assigned to appointment %s", appointment_id)
         
         return jsonify({
             'success': True,
@@ -9264,9 +11195,7 @@ def api_assign_counselor_with_details(appointment_id):
         
     except Exception as e:
         db.session.rollback()
-        app.logger.error(f"Error assigning counselor: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Error assigning counselor: {str(e)}")
         return jsonify({'success': False, 'message': f'Failed to assign counselor: {str(e)}'}), 500
 
 # 5. HELPER FUNCTIONS
@@ -9320,61 +11249,16 @@ def check_counselor_availability(counselor_id, appointment_datetime, duration, e
 
 
 def send_assignment_notifications(appointment, counselor):
-    """Send notifications for appointment assignment - ENHANCED"""
+    """Queue notifications for appointment assignment"""
     try:
-        # Email to student
-        student_subject = "Counselor Assigned - CUEA MindConnect"
-        student_message = f"""
-        Dear {appointment.user.first_name},
-        
-        Great news! A counselor has been assigned to your appointment:
-        
-        Counselor: {counselor.first_name} {counselor.last_name}
-        Specialization: {counselor.specialization or 'General Counseling'}
-        Date & Time: {appointment.scheduled_date.strftime('%A, %B %d, %Y at %I:%M %p')}
-        Duration: {appointment.duration} minutes
-        Mode: {appointment.mode.replace('-', ' ').title()}
-        
-        {f'Room: {appointment.room_number}' if appointment.room_number else ''}
-        {f'Video Link: {appointment.video_link}' if appointment.video_link else ''}
-        
-        Please arrive 10 minutes early for in-person sessions or test your technology for virtual sessions.
-        
-        Best regards,
-        CUEA MindConnect Team
-        """
-        
-        # Email to counselor
-        counselor_subject = "New Appointment Assigned - CUEA MindConnect"
-        counselor_message = f"""
-        Dear {counselor.first_name},
-        
-        You have been assigned a new counseling appointment:
-        
-        Student: {appointment.user.first_name} {appointment.user.last_name}
-        Email: {appointment.user.email}
-        Student ID: {getattr(appointment.user, 'student_id', 'N/A')}
-        Date & Time: {appointment.scheduled_date.strftime('%A, %B %d, %Y at %I:%M %p')}
-        Duration: {appointment.duration} minutes
-        Mode: {appointment.mode.replace('-', ' ').title()}
-        Topic: {appointment.topic or 'General counseling'}
-        
-        {f'Room: {appointment.room_number}' if appointment.room_number else ''}
-        {f'Video Link: {appointment.video_link}' if appointment.video_link else ''}
-        
-        {f'Student Notes: {appointment.notes}' if appointment.notes else ''}
-        
-        Please prepare for the session and contact the student if you need to make any changes.
-        
-        Best regards,
-        CUEA MindConnect Team
-        """
-        
-        # In production, send actual emails here
-        app.logger.info(f"Assignment notifications sent for appointment {appointment.id}")
+        enqueue_notification(appointment.user.email, appointment, 'student', 'counselor_assigned', commit=False)
+        enqueue_notification(counselor.email, appointment, 'counselor', 'assigned', commit=False)
+        db.session.commit()
+        app.logger.info(f"Assignment notifications queued for appointment {appointment.id}")
         
     except Exception as e:
-        app.logger.error(f"Error sending notifications: {e}")
+        db.session.rollback()
+        app.logger.error(f"Error queueing notifications: {e}")
 
 
 # BULK STATUS UPDATE
@@ -9496,11 +11380,11 @@ def api_appointments_quick_stats():
             'total_appointments': AppointmentRequest.query.count(),
             'pending_assignments': AppointmentRequest.query.filter_by(status='pending').count(),
             'todays_appointments': AppointmentRequest.query.filter(
-                func.date(AppointmentRequest.scheduled_date) == today
+                day_range_filter(AppointmentRequest.scheduled_date, today)
             ).count(),
             'this_week_completed': AppointmentRequest.query.filter(
                 AppointmentRequest.status == 'completed',
-                func.date(AppointmentRequest.updated_at) >= week_start
+                AppointmentRequest.updated_at >= datetime.combine(week_start, datetime.min.time())
             ).count(),
             'overdue_assignments': AppointmentRequest.query.filter(
                 AppointmentRequest.status == 'pending',
@@ -9806,6 +11690,176 @@ def counselor_help():
     '''
 
 
+# =============================================================================
+# FULL-TEXT SEARCH (SQLite FTS5)
+# =============================================================================
+
+# Each index mirrors a content table through triggers; weights feed bm25()
+SEARCH_INDEXES = {
+    'forum_post_fts': {
+        'content_table': 'forum_post',
+        'columns': ['title', 'content'],
+        'weights': [10.0, 1.0]
+    },
+    'wellness_resource_fts': {
+        'content_table': 'wellness_resource',
+        'columns': ['title', 'content', 'tags'],
+        'weights': [10.0, 1.0, 5.0]
+    }
+}
+
+# Set by create_search_indexes(); endpoints fall back to LIKE when False
+FTS_AVAILABLE = False
+
+# Private-use markers survive html.escape() and are swapped for highlight tags afterwards
+_SNIPPET_OPEN = '\ue000'
+_SNIPPET_CLOSE = '\ue001'
+
+def create_search_indexes():
+    """Create the FTS5 search indexes and their sync triggers.
+
+    Indexes are rebuilt from their content tables the first time they are created.
+    """
+    global FTS_AVAILABLE
+    with app.app_context():
+        try:
+            db.create_all()
+
+            with db.engine.connect() as conn:
+                existing = {row[0] for row in conn.execute(text(
+                    "SELECT name FROM sqlite_master WHERE type='table'"
+                )).fetchall()}
+
+                for index_name, index in SEARCH_INDEXES.items():
+                    table = index['content_table']
+                    columns = ', '.join(index['columns'])
+                    new_values = ', '.join(f"new.{col}" for col in index['columns'])
+                    old_values = ', '.join(f"old.{col}" for col in index['columns'])
+
+                    conn.execute(text(f'''
+                        CREATE VIRTUAL TABLE IF NOT EXISTS {index_name} USING fts5(
+                            {columns},
+                            content='{table}', content_rowid='id',
+                            tokenize='porter unicode61', prefix='2 3'
+                        )
+                    '''))
+                    conn.execute(text(f'''
+                        CREATE TRIGGER IF NOT EXISTS {index_name}_ai AFTER INSERT ON {table} BEGIN
+                            INSERT INTO {index_name}(rowid, {columns}) VALUES (new.id, {new_values});
+                        END
+                    '''))
+                    conn.execute(text(f'''
+                        CREATE TRIGGER IF NOT EXISTS {index_name}_ad AFTER DELETE ON {table} BEGIN
+                            INSERT INTO {index_name}({index_name}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                        END
+                    '''))
+                    conn.execute(text(f'''
+                        CREATE TRIGGER IF NOT EXISTS {index_name}_au AFTER UPDATE OF {columns} ON {table} BEGIN
+                            INSERT INTO {index_name}({index_name}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                            INSERT INTO {index_name}(rowid, {columns}) VALUES (new.id, {new_values});
+                        END
+                    '''))
+
+                    if index_name not in existing:
+                        conn.execute(text(f"INSERT INTO {index_name}({index_name}) VALUES ('rebuild')"))
+
+                conn.commit()
+
+            FTS_AVAILABLE = True
+            print("✅ Full-text search indexes ready")
+            return True
+
+        except Exception as e:
+            FTS_AVAILABLE = False
+            print(f"⚠️ Full-text search unavailable, falling back to LIKE search: {str(e)}")
+            return False
+
+def rebuild_search_indexes():
+    """Rebuild every FTS5 index from its content table"""
+    with app.app_context():
+        try:
+            with db.engine.begin() as conn:
+                for index_name in SEARCH_INDEXES:
+                    conn.execute(text(f"INSERT INTO {index_name}({index_name}) VALUES ('rebuild')"))
+                    conn.execute(text(f"INSERT INTO {index_name}({index_name}) VALUES ('optimize')"))
+            print("✅ Search indexes rebuilt")
+            return True
+        except Exception as e:
+            print(f"❌ Error rebuilding search indexes: {str(e)}")
+            return False
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the full-text search indexes for forum posts and resources."""
+    create_search_indexes()
+    rebuild_search_indexes()
+
+def build_fts_query(term):
+    """Turn free text into an FTS5 MATCH expression with prefix matching.
+
+    Every word must match; the last word also matches as a prefix so results
+    update while the user is still typing. Returns None if nothing searchable remains.
+    """
+    words = re.findall(r'\w+', term.lower())
+    if not words:
+        return None
+    quoted = [f'"{word}"' for word in words]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def fts_search_subquery(index_name, term):
+    """Return a (rowid, rank) subquery of index matches for term, or None.
+
+    Join it against the content table and order by its rank column (bm25,
+    lower is better).
+    """
+    match = build_fts_query(term) if FTS_AVAILABLE else None
+    if not match:
+        return None
+
+    weights = ', '.join(str(w) for w in SEARCH_INDEXES[index_name]['weights'])
+    return text(f'''
+        SELECT rowid AS rowid, bm25({index_name}, {weights}) AS rank
+        FROM {index_name} WHERE {index_name} MATCH :match
+    ''').bindparams(match=match).columns(rowid=db.Integer, rank=db.Float).subquery(f'{index_name}_hits')
+
+def fts_snippets(index_name, term, row_ids, tokens=24):
+    """Return {rowid: {column: highlighted_html}} for matches among row_ids.
+
+    Matched terms are wrapped in <span class="search-highlight"> and the rest
+    of the text is HTML-escaped, so the fragments can be rendered directly.
+    """
+    match = build_fts_query(term) if FTS_AVAILABLE else None
+    row_ids = list(row_ids)
+    if not match or not row_ids:
+        return {}
+
+    columns = SEARCH_INDEXES[index_name]['columns']
+    snippet_sql = ', '.join(
+        f"snippet({index_name}, {i}, '{_SNIPPET_OPEN}', '{_SNIPPET_CLOSE}', '…', {tokens})"
+        for i in range(len(columns))
+    )
+    placeholders = ', '.join(f':id{i}' for i in range(len(row_ids)))
+    params = {f'id{i}': row_id for i, row_id in enumerate(row_ids)}
+    params['match'] = match
+
+    rows = db.session.execute(text(f'''
+        SELECT rowid, {snippet_sql} FROM {index_name}
+        WHERE {index_name} MATCH :match AND rowid IN ({placeholders})
+    '''), params).fetchall()
+
+    snippets = {}
+    for row in rows:
+        snippets[row[0]] = {
+            column: html.escape(value or '')
+                .replace(_SNIPPET_OPEN, '<span class="search-highlight">')
+                .replace(_SNIPPET_CLOSE, '</span>')
+            for column, value in zip(columns, row[1:])
+        }
+    return snippets
+
+create_search_indexes()
+
 # =============================================================================
 # COMMUNITY FORUM ROUTES 
 # =============================================================================
@@ -9827,16 +11881,17 @@ def community():
             posts_query = posts_query.filter_by(category=category)
         
         # Get posts with pagination
-        posts = posts_query.order_by(ForumPost.created_at.desc())\
+        posts = posts_query.options(db.joinedload(ForumPost.author))\
+            .order_by(ForumPost.created_at.desc())\
             .paginate(page=page, per_page=per_page, error_out=False)
         
         # Get post data with reply counts
+        reply_counts = get_reply_counts([post.id for post in posts.items], include_flagged=False)
         posts_data = []
         for post in posts.items:
-            reply_count = ForumReply.query.filter_by(post_id=post.id, is_flagged=False).count()
             posts_data.append({
                 'post': post,
-                'reply_count': reply_count,
+                'reply_count': reply_counts.get(post.id, 0),
                 'author_name': post.author.get_full_name() if not post.is_anonymous else 'Anonymous User'
             })
         
@@ -10032,6 +12087,25 @@ def get_categories():
         {'value': 'academic', 'label': 'Academic Help'}
     ]
 
+def get_reply_counts(post_ids=None, include_flagged=True):
+    """Return {post_id: reply_count} for a batch of posts with one grouped query.
+
+    Pass post_ids=None to count replies for every post. Posts without replies
+    are absent from the result, so look them up with .get(post_id, 0).
+    """
+    query = db.session.query(ForumReply.post_id, func.count(ForumReply.id))
+    
+    if post_ids is not None:
+        post_ids = list(post_ids)
+        if not post_ids:
+            return {}
+        query = query.filter(ForumReply.post_id.in_(post_ids))
+    
+    if not include_flagged:
+        query = query.filter(ForumReply.is_flagged == False)
+    
+    return dict(query.group_by(ForumReply.post_id).all())
+
 
 
 
@@ -10185,26 +12259,34 @@ def api_get_posts():
         if category != 'all':
             posts_query = posts_query.filter_by(category=category)
         
-        if search:
+        hits = fts_search_subquery('forum_post_fts', search) if search else None
+        if hits is not None:
+            posts_query = posts_query.join(hits, hits.c.rowid == ForumPost.id)\
+                .order_by(hits.c.rank, ForumPost.created_at.desc())
+        elif search:
             search_pattern = f"%{search}%"
             posts_query = posts_query.filter(
                 db.or_(
                     ForumPost.title.ilike(search_pattern),
                     ForumPost.content.ilike(search_pattern)
                 )
-            )
+            ).order_by(ForumPost.created_at.desc())
+        else:
+            posts_query = posts_query.order_by(ForumPost.created_at.desc())
         
         # Get posts with pagination
-        posts = posts_query.order_by(ForumPost.created_at.desc())\
-            .paginate(page=page, per_page=per_page, error_out=False)
+        posts = posts_query.paginate(page=page, per_page=per_page, error_out=False)
         
         # Format posts data
+        post_ids = [post.id for post in posts.items]
+        reply_counts = get_reply_counts(post_ids, include_flagged=False)
+        snippets = fts_snippets('forum_post_fts', search, post_ids) if hits is not None else {}
         posts_data = []
         for post in posts.items:
-            reply_count = ForumReply.query.filter_by(post_id=post.id, is_flagged=False).count()
+            reply_count = reply_counts.get(post.id, 0)
             author_name = post.author.get_full_name() if not post.is_anonymous else 'Anonymous User'
             
-            posts_data.append({
+            post_data = {
                 'id': post.id,
                 'title': post.title,
                 'content': post.content[:200] + '...' if len(post.content) > 200 else post.content,
@@ -10214,7 +12296,11 @@ def api_get_posts():
                 'created_at': post.created_at.strftime('%B %d, %Y at %I:%M %p'),
                 'can_edit': post.user_id == current_user.id,
                 'can_delete': post.user_id == current_user.id
-            })
+            }
+            if post.id in snippets:
+                post_data['title_highlight'] = snippets[post.id]['title']
+                post_data['snippet'] = snippets[post.id]['content']
+            posts_data.append(post_data)
      
         return jsonify({
             'success': True,
@@ -10565,24 +12651,32 @@ def api_admin_forum_posts():
                 query = query.filter(ForumPost.created_at >= start_date)
         
         # Apply search filter
-        if search:
+        hits = fts_search_subquery('forum_post_fts', search) if search else None
+        if hits is not None:
+            query = query.join(hits, hits.c.rowid == ForumPost.id)\
+                .order_by(hits.c.rank, ForumPost.created_at.desc())
+        elif search:
             search_pattern = f"%{search}%"
             query = query.filter(
                 db.or_(
                     ForumPost.title.ilike(search_pattern),
                     ForumPost.content.ilike(search_pattern)
                 )
-            )
+            ).order_by(ForumPost.created_at.desc())
+        else:
+            query = query.order_by(ForumPost.created_at.desc())
         
         # Get paginated results
-        posts = query.order_by(ForumPost.created_at.desc())\
-            .paginate(page=page, per_page=per_page, error_out=False)
+        posts = query.paginate(page=page, per_page=per_page, error_out=False)
         
         # Format posts data
+        post_ids = [post.id for post in posts.items]
+        reply_counts = get_reply_counts(post_ids)
+        snippets = fts_snippets('forum_post_fts', search, post_ids) if hits is not None else {}
         posts_data = []
         for post in posts.items:
             # Get reply count
-            reply_count = ForumReply.query.filter_by(post_id=post.id).count()
+            reply_count = reply_counts.get(post.id, 0)
             
             # Get flagging information safely
             is_flagged = getattr(post, 'is_flagged', False)
@@ -10602,6 +12696,9 @@ def api_admin_forum_posts():
                 'is_flagged': is_flagged,
                 'flag_reason': flag_reason
             }
+            if post.id in snippets:
+                post_data['title_highlight'] = snippets[post.id]['title']
+                post_data['snippet'] = snippets[post.id]['content']
             posts_data.append(post_data)
         
         # Calculate statistics
@@ -11064,48 +13161,56 @@ def api_admin_forum_export():
     try:
         export_type = request.args.get('type', 'posts')  # posts, replies, or flagged
         
+        export_format = request.args.get('format', 'csv')
+        
         if export_type == 'posts':
-            posts = ForumPost.query.options(db.joinedload(ForumPost.author))\
-                .order_by(ForumPost.created_at.desc()).all()
-            
-            # Create CSV data
-            import csv
-            import io
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # Write headers
-            writer.writerow([
-                'ID', 'Title', 'Category', 'Author', 'Anonymous', 'Content Preview',
-                'Flagged', 'Flag Reason', 'Created Date', 'Replies Count'
-            ])
-            
-            # Write data
-            for post in posts:
-                reply_count = ForumReply.query.filter_by(post_id=post.id).count()
-                content_preview = post.content[:100] + '...' if len(post.content) > 100 else post.content
-                
-                writer.writerow([
-                    post.id,
-                    post.title,
-                    post.category,
-                    post.author.get_full_name() if post.author and not post.is_anonymous else 'Anonymous',
-                    'Yes' if post.is_anonymous else 'No',
+            # Reply counts join in as a grouped subquery so the whole export is one streamed query
+            reply_counts = db.session.query(
+                ForumReply.post_id,
+                func.count(ForumReply.id).label('reply_count')
+            ).group_by(ForumReply.post_id).subquery()
+            
+            query = db.session.query(
+                ForumPost.id,
+                ForumPost.title,
+                ForumPost.category,
+                ForumPost.is_anonymous,
+                func.substr(ForumPost.content, 1, 101).label('content_head'),
+                ForumPost.is_flagged,
+                ForumPost.flag_reason,
+                ForumPost.created_at,
+                User.first_name,
+                User.last_name,
+                func.coalesce(reply_counts.c.reply_count, 0).label('reply_count')
+            ).outerjoin(User, User.id == ForumPost.user_id)\
+                .outerjoin(reply_counts, reply_counts.c.post_id == ForumPost.id)\
+                .order_by(ForumPost.created_at.desc())
+            
+            def post_row(row):
+                content_preview = row.content_head[:100] + '...' if len(row.content_head) > 100 else row.content_head
+                return [
+                    row.id,
+                    row.title,
+                    row.category,
+                    f"{row.first_name} {row.last_name}" if row.first_name is not None and not row.is_anonymous else 'Anonymous',
+                    'Yes' if row.is_anonymous else 'No',
                     content_preview,
-                    'Yes' if getattr(post, 'is_flagged', False) else 'No',
-                    getattr(post, 'flag_reason', ''),
-                    post.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    reply_count
-                ])
-            
-            output.seek(0)
-            
-            response = make_response(output.getvalue())
-            response.headers['Content-Type'] = 'text/csv'
-            response.headers['Content-Disposition'] = f'attachment; filename=forum_posts_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+                    'Yes' if row.is_flagged else 'No',
+                    row.flag_reason or '',
+                    row.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                    row.reply_count
+                ]
             
-            return response
+            return stream_export(
+                export_format,
+                [
+                    'ID', 'Title', 'Category', 'Author', 'Anonymous', 'Content Preview',
+                    'Flagged', 'Flag Reason', 'Created Date', 'Replies Count'
+                ],
+                iter_export_rows(query, post_row),
+                f'forum_posts_{datetime.now().strftime("%Y%m%d_%H%M%S")}',
+                sheet_name='Forum Posts'
+            )
         
         else:
             return jsonify({
@@ -11179,6 +13284,239 @@ def ensure_forum_flagging_columns():
 
 
 
+# =============================================================================
+# ANALYTICS DAILY ROLLUPS
+# =============================================================================
+
+class DailyUserSignup(db.Model):
+    """Per-day count of new accounts, split by role"""
+    __tablename__ = 'daily_user_signups'
+
+    day = db.Column(db.Date, primary_key=True)
+    role = db.Column(db.String(20), primary_key=True)
+    signup_count = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyAppointmentStatus(db.Model):
+    """Per-day appointment counts by counselor and status.
+
+    The day is the scheduled date, falling back to the requested date for
+    appointments that have not been scheduled yet, so totals cover every
+    appointment. scheduled_count counts only the scheduled ones; charts of
+    appointments per day use it so pending requests don't show up on the
+    day they were requested. Unassigned appointments are stored under
+    counselor_id 0.
+    """
+    __tablename__ = 'daily_appointments_by_status'
+
+    day = db.Column(db.Date, primary_key=True)
+    counselor_id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    appointment_count = db.Column(db.Integer, nullable=False, default=0)
+    scheduled_count = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyAssessmentScoreBucket(db.Model):
+    """Per-day assessment counts by whole-number score bucket"""
+    __tablename__ = 'daily_assessment_score_buckets'
+
+    day = db.Column(db.Date, primary_key=True)
+    score_bucket = db.Column(db.Integer, primary_key=True)
+    assessment_count = db.Column(db.Integer, nullable=False, default=0)
+    score_total = db.Column(db.Float, nullable=False, default=0)
+
+ANALYTICS_ROLLUP_TABLES = [
+    'daily_user_signups',
+    'daily_appointments_by_status',
+    'daily_assessment_score_buckets'
+]
+
+# Row expressions shared by the triggers (NEW./OLD. prefixed) and the backfill
+_APPOINTMENT_DAY_SQL = "date(COALESCE({row}scheduled_date, {row}requested_date))"
+_APPOINTMENT_COUNSELOR_SQL = "COALESCE({row}counselor_id, 0)"
+_APPOINTMENT_STATUS_SQL = "COALESCE({row}status, 'pending')"
+_APPOINTMENT_SCHEDULED_SQL = "{row}scheduled_date IS NOT NULL"
+
+def _rollup_upsert_sql(table, key_columns, key_values, count_column, delta, extra=None):
+    """Build an UPSERT statement that adds delta to a rollup row"""
+    extra = extra or {}
+    columns = key_columns + [count_column] + list(extra.keys())
+    values = key_values + [str(delta)] + [f"{delta} * ({expr})" for expr in extra.values()]
+    updates = [f"{count_column} = {count_column} + excluded.{count_column}"]
+    updates += [f"{col} = {col} + excluded.{col}" for col in extra.keys()]
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(values)}) "
+            f"ON CONFLICT({', '.join(key_columns)}) DO UPDATE SET {', '.join(updates)};")
+
+def _analytics_rollup_triggers():
+    """Return the trigger DDL that keeps the rollups current on every write"""
+    def signup(row, delta):
+        return _rollup_upsert_sql(
+            'daily_user_signups', ['day', 'role'],
+            [f"date({row}created_at)", f"COALESCE({row}role, 'student')"],
+            'signup_count', delta)
+
+    def appointment(row, delta):
+        return _rollup_upsert_sql(
+            'daily_appointments_by_status', ['day', 'counselor_id', 'status'],
+            [_APPOINTMENT_DAY_SQL.format(row=row),
+             _APPOINTMENT_COUNSELOR_SQL.format(row=row),
+             _APPOINTMENT_STATUS_SQL.format(row=row)],
+            'appointment_count', delta, extra={'scheduled_count': _APPOINTMENT_SCHEDULED_SQL.format(row=row)})
+
+    def assessment(row, delta):
+        return _rollup_upsert_sql(
+            'daily_assessment_score_buckets', ['day', 'score_bucket'],
+            [f"date({row}created_at)", f"CAST({row}score AS INTEGER)"],
+            'assessment_count', delta, extra={'score_total': f"{row}score"})
+
+    return {
+        'trg_rollup_user_insert': f"""
+            CREATE TRIGGER IF NOT EXISTS trg_rollup_user_insert AFTER INSERT ON user
+            WHEN NEW.created_at IS NOT NULL
+            BEGIN {signup('NEW.', 1)} END""",
+        'trg_rollup_user_delete': f"""
+            CREATE TRIGGER IF NOT EXISTS trg_rollup_user_delete AFTER DELETE ON user
+            WHEN OLD.created_at IS NOT NULL
+            BEGIN {signup('OLD.', -1)} END""",
+        'trg_rollup_user_update': f"""
+            CREATE TRIGGER IF NOT EXISTS trg_rollup_user_update AFTER UPDATE OF created_at, role ON user
+            WHEN OLD.created_at IS NOT NULL AND NEW.created_at IS NOT NULL
+            BEGIN {signup('OLD.', -1)} {signup('NEW.', 1)} END""",
+        'trg_rollup_appointment_insert': f"""
+            CREATE TRIGGER IF NOT EXISTS trg_rollup_appointment_insert AFTER INSERT ON appointment_request
+            BEGIN {appointment('NEW.', 1)} END""",
+        'trg_rollup_appointment_delete': f"""
+            CREATE TRIGGER IF NOT EXISTS trg_rollup_appointment_delete AFTER DELETE ON appointment_request
+            BEGIN {appointment('OLD.', -1)} END""",
+        'trg_rollup_appointment_update': f"""
+            CREATE TRIGGER IF NOT EXISTS trg_rollup_appointment_update
+            AFTER UPDATE OF scheduled_date, requested_date, status, counselor_id ON appointment_request
+            BEGIN {appointment('OLD.', -1)} {appointment('NEW.', 1)} END""",
+        'trg_rollup_assessment_insert': f"""
+            CREATE TRIGGER IF NOT EXISTS trg_rollup_assessment_insert AFTER INSERT ON assessment
+            WHEN NEW.created_at IS NOT NULL
+            BEGIN {assessment('NEW.', 1)} END""",
+        'trg_rollup_assessment_delete': f"""
+            CREATE TRIGGER IF NOT EXISTS trg_rollup_assessment_delete AFTER DELETE ON assessment
+            WHEN OLD.created_at IS NOT NULL
+            BEGIN {assessment('OLD.', -1)} END""",
+        'trg_rollup_assessment_update': f"""
+            CREATE TRIGGER IF NOT EXISTS trg_rollup_assessment_update AFTER UPDATE OF created_at, score ON assessment
+            WHEN OLD.created_at IS NOT NULL AND NEW.created_at IS NOT NULL
+            BEGIN {assessment('OLD.', -1)} {assessment('NEW.', 1)} END""",
+    }
+
+def create_analytics_rollup_tables():
+    """Create the analytics rollup tables and their maintenance triggers.
+
+    The rollups are backfilled automatically the first time they are created.
+    """
+    with app.app_context():
+        try:
+            with db.engine.connect() as conn:
+                existing = {row[0] for row in conn.execute(text(
+                    "SELECT name FROM sqlite_master WHERE type='table'"
+                )).fetchall()}
+
+            # The triggers need the source tables to exist
+            db.create_all()
+
+            with db.engine.connect() as conn:
+                conn.execute(text('''
+                    CREATE TABLE IF NOT EXISTS daily_user_signups (
+                        day DATE NOT NULL,
+                        role VARCHAR(20) NOT NULL,
+                        signup_count INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (day, role)
+                    )
+                '''))
+                conn.execute(text('''
+                    CREATE TABLE IF NOT EXISTS daily_appointments_by_status (
+                        day DATE NOT NULL,
+                        counselor_id INTEGER NOT NULL,
+                        status VARCHAR(20) NOT NULL,
+                        appointment_count INTEGER NOT NULL DEFAULT 0,
+                        scheduled_count INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (day, counselor_id, status)
+                    )
+                '''))
+
+                # Tables created before scheduled_count existed: add it, replace the
+                # appointment triggers (they are only created if missing) and rebuild
+                columns = {row[1] for row in conn.execute(text("PRAGMA table_info(daily_appointments_by_status)"))}
+                rebuild = 'scheduled_count' not in columns
+                if rebuild:
+                    conn.execute(text('ALTER TABLE daily_appointments_by_status '
+                                      'ADD COLUMN scheduled_count INTEGER NOT NULL DEFAULT 0'))
+                    for name in _analytics_rollup_triggers():
+                        if name.startswith('trg_rollup_appointment'):
+                            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+                conn.execute(text('''
+                    CREATE TABLE IF NOT EXISTS daily_assessment_score_buckets (
+                        day DATE NOT NULL,
+                        score_bucket INTEGER NOT NULL,
+                        assessment_count INTEGER NOT NULL DEFAULT 0,
+                        score_total REAL NOT NULL DEFAULT 0,
+                        PRIMARY KEY (day, score_bucket)
+                    )
+                '''))
+
+                for trigger_sql in _analytics_rollup_triggers().values():
+                    conn.execute(text(trigger_sql))
+                conn.commit()
+
+            if rebuild or not all(table in existing for table in ANALYTICS_ROLLUP_TABLES):
+                backfill_analytics_rollups()
+            return True
+
+        except Exception as e:
+            print(f"⚠️ Error creating analytics rollup tables: {str(e)}")
+            return False
+
+def backfill_analytics_rollups():
+    """Rebuild every analytics rollup from the raw tables"""
+    with app.app_context():
+        try:
+            with db.engine.begin() as conn:
+                for table in ANALYTICS_ROLLUP_TABLES:
+                    conn.execute(text(f"DELETE FROM {table}"))
+
+                conn.execute(text('''
+                    INSERT INTO daily_user_signups (day, role, signup_count)
+                    SELECT date(created_at), COALESCE(role, 'student'), COUNT(*)
+                    FROM user WHERE created_at IS NOT NULL
+                    GROUP BY 1, 2
+                '''))
+                conn.execute(text(f'''
+                    INSERT INTO daily_appointments_by_status (day, counselor_id, status, appointment_count, scheduled_count)
+                    SELECT {_APPOINTMENT_DAY_SQL.format(row='')},
+                           {_APPOINTMENT_COUNSELOR_SQL.format(row='')},
+                           {_APPOINTMENT_STATUS_SQL.format(row='')},
+                           COUNT(*),
+                           SUM({_APPOINTMENT_SCHEDULED_SQL.format(row='')})
+                    FROM appointment_request
+                    GROUP BY 1, 2, 3
+                '''))
+                conn.execute(text('''
+                    INSERT INTO daily_assessment_score_buckets (day, score_bucket, assessment_count, score_total)
+                    SELECT date(created_at), CAST(score AS INTEGER), COUNT(*), TOTAL(score)
+                    FROM assessment WHERE created_at IS NOT NULL
+                    GROUP BY 1, 2
+                '''))
+
+            print("✅ Analytics rollups backfilled")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error backfilling analytics rollups: {str(e)}")
+            return False
+
+@app.cli.command('backfill-rollups')
+def backfill_rollups_command():
+    """Rebuild the analytics daily rollup tables from raw data."""
+    create_analytics_rollup_tables()
+    backfill_analytics_rollups()
+
+create_analytics_rollup_tables()
+
 # =============================================================================
 # ANALYTICS ROUTES
 # =============================================================================
@@ -11187,13 +13525,10 @@ def ensure_forum_flagging_columns():
 @login_required
 @role_required('admin')
 def admin_analytics():
-    """FIXED: Enhanced analytics dashboard with comprehensive error handling"""
-    from sqlalchemy import func
-    from datetime import datetime, timedelta
+    """Analytics dashboard read from the daily rollup tables"""
     
     try:
-        print("🔧 Loading analytics dashboard...")
-        
+            
         # Initialize analytics_data with safe defaults
         analytics_data = {
             # Basic KPIs
@@ -11227,172 +13562,103 @@ def admin_analytics():
             'course_distribution': []
         }
 
-        # Basic KPIs with individual error handling
+        today = datetime.utcnow().date()
+        month_start = today.replace(day=1)
+        growth_start = today - timedelta(days=29)
+        week_start = today - timedelta(days=6)
+
+        # Student KPIs and 30-day growth from the signup rollup
         try:
-            analytics_data['total_students'] = User.query.filter(User.role != 'admin').count()
+            signups = db.session.query(
+                func.coalesce(func.sum(DailyUserSignup.signup_count), 0),
+                func.coalesce(func.sum(case((DailyUserSignup.day >= month_start, DailyUserSignup.signup_count), else_=0)), 0)
+            ).filter(DailyUserSignup.role != 'admin').one()
+            analytics_data['total_students'] = int(signups[0])
+            analytics_data['new_students_this_month'] = int(signups[1])
+
+            daily_signups = dict(db.session.query(
+                DailyUserSignup.day,
+                func.sum(DailyUserSignup.signup_count)
+            ).filter(
+                DailyUserSignup.role != 'admin',
+                DailyUserSignup.day >= growth_start
+            ).group_by(DailyUserSignup.day).all())
+
+            growth_days = [growth_start + timedelta(days=i) for i in range(30)]
+            analytics_data['user_growth'] = {
+                'labels': [day.strftime('%m/%d') for day in growth_days],
+                'data': [int(daily_signups.get(day, 0)) for day in growth_days]
+            }
         except Exception as e:
-            print(f"User count error: {e}")
+            app.logger.error(f"User rollup error: {e}")
 
         try:
             analytics_data['active_counselors'] = Counselor.query.filter_by(is_active=True).count()
         except Exception as e:
-            print(f"Counselor count error: {e}")
+            app.logger.error(f"Counselor count error: {e}")
 
+        # Assessment totals, average score and mood distribution from the score buckets
         try:
-            analytics_data['total_assessments'] = Assessment.query.count()
-            
-            # Calculate average mood score
-            avg_result = db.session.query(func.avg(Assessment.score)).scalar()
-            if avg_result:
-                analytics_data['avg_mood_score'] = round(float(avg_result), 1)
+            assessment_totals = db.session.query(
+                func.coalesce(func.sum(DailyAssessmentScoreBucket.assessment_count), 0),
+                func.coalesce(func.sum(DailyAssessmentScoreBucket.score_total), 0),
+                func.coalesce(func.sum(case((DailyAssessmentScoreBucket.score_bucket >= 8, DailyAssessmentScoreBucket.assessment_count), else_=0)), 0),
+                func.coalesce(func.sum(case((and_(DailyAssessmentScoreBucket.score_bucket >= 5, DailyAssessmentScoreBucket.score_bucket < 8), DailyAssessmentScoreBucket.assessment_count), else_=0)), 0),
+                func.coalesce(func.sum(case((DailyAssessmentScoreBucket.score_bucket < 5, DailyAssessmentScoreBucket.assessment_count), else_=0)), 0)
+            ).one()
+            analytics_data['total_assessments'] = int(assessment_totals[0])
+            if assessment_totals[0]:
+                analytics_data['avg_mood_score'] = round(float(assessment_totals[1]) / assessment_totals[0], 1)
+            analytics_data['mood_positive'] = int(assessment_totals[2])
+            analytics_data['mood_neutral'] = int(assessment_totals[3])
+            analytics_data['mood_needs_support'] = int(assessment_totals[4])
         except Exception as e:
-            print(f"Assessment error: {e}")
+            app.logger.error(f"Assessment rollup error: {e}")
 
-        # New students this month
+        # Appointment totals, weekly chart and per-counselor stats from the status rollup
         try:
-            month_start = datetime.utcnow().replace(day=1)
-            analytics_data['new_students_this_month'] = User.query.filter(
-                User.role != 'admin',
-                User.created_at >= month_start
-            ).count()
-        except Exception as e:
-            print(f"New students error: {e}")
+            appointment_rows = db.session.query(
+                DailyAppointmentStatus.counselor_id,
+                DailyAppointmentStatus.status,
+                func.sum(DailyAppointmentStatus.appointment_count)
+            ).group_by(DailyAppointmentStatus.counselor_id, DailyAppointmentStatus.status).all()
+
+            counselor_totals = {}
+            counselor_completed = {}
+            for counselor_id, status, count in appointment_rows:
+                counselor_totals[counselor_id] = counselor_totals.get(counselor_id, 0) + count
+                if status == 'completed':
+                    counselor_completed[counselor_id] = counselor_completed.get(counselor_id, 0) + count
+
+            analytics_data['total_appointments'] = sum(counselor_totals.values())
+            completed_appointments = sum(counselor_completed.values())
 
-        # Appointment statistics - try both models
-        try:
-            # Try AppointmentRequest first
-            analytics_data['total_appointments'] = AppointmentRequest.query.count()
-            completed_appointments = AppointmentRequest.query.filter_by(status='completed').count()
-            
             if analytics_data['total_appointments'] > 0:
                 analytics_data['completion_rate'] = round((completed_appointments / analytics_data['total_appointments']) * 100, 1)
-                
+
             # Calculate average appointments per counselor
             if analytics_data['active_counselors'] > 0:
                 analytics_data['avg_appointments_per_counselor'] = round(analytics_data['total_appointments'] / analytics_data['active_counselors'], 1)
-                
-        except Exception as e:
-            print(f"AppointmentRequest error: {e}")
-            # Fallback to Appointment model
-            try:
-                analytics_data['total_appointments'] = Appointment.query.count()
-                completed_appointments = Appointment.query.filter_by(status='completed').count()
-                
-                if analytics_data['total_appointments'] > 0:
-                    analytics_data['completion_rate'] = round((completed_appointments / analytics_data['total_appointments']) * 100, 1)
-            except Exception as e2:
-                print(f"Both appointment models failed: {e2}")
-
-        # Forum statistics with error handling
-        try:
-            analytics_data['forum_posts'] = ForumPost.query.count()
-            analytics_data['forum_replies'] = ForumReply.query.count()
-        except Exception as e:
-            print(f"Forum stats error: {e}")
-
-        # Active users in last 7 days
-        try:
-            week_ago = datetime.utcnow() - timedelta(days=7)
-            analytics_data['active_users_7days'] = User.query.filter(
-                User.last_login >= week_ago
-            ).count() if hasattr(User, 'last_login') else 0
-            
-            if analytics_data['total_students'] > 0:
-                analytics_data['user_engagement_rate'] = round((analytics_data['active_users_7days'] / analytics_data['total_students']) * 100, 1)
-        except Exception as e:
-            print(f"Active users error: {e}")
-
-        # User growth chart data (last 30 days)
-        try:
-            user_growth_labels = []
-            user_growth_data = []
-            
-            for i in range(30):
-                date = (datetime.utcnow() - timedelta(days=29-i)).date()
-                user_growth_labels.append(date.strftime('%m/%d'))
-                
-                start_of_day = datetime.combine(date, datetime.min.time())
-                end_of_day = datetime.combine(date, datetime.max.time())
-                
-                count = User.query.filter(
-                    User.role != 'admin',
-                    User.created_at >= start_of_day,
-                    User.created_at <= end_of_day
-                ).count()
-                user_growth_data.append(count)
-            
-            analytics_data['user_growth'] = {
-                'labels': user_growth_labels,
-                'data': user_growth_data
-            }
-        except Exception as e:
-            print(f"User growth chart error: {e}")
 
-        # Mood assessment distribution
-        try:
-            assessments = Assessment.query.all()
-            for assessment in assessments:
-                if assessment.score >= 8:
-                    analytics_data['mood_positive'] += 1
-                elif assessment.score >= 5:
-                    analytics_data['mood_neutral'] += 1
-                else:
-                    analytics_data['mood_needs_support'] += 1
-        except Exception as e:
-            print(f"Mood distribution error: {e}")
+            # Scheduled appointments only, by the day they take place
+            daily_appointments = dict(db.session.query(
+                DailyAppointmentStatus.day,
+                func.sum(DailyAppointmentStatus.scheduled_count)
+            ).filter(
+                DailyAppointmentStatus.day >= week_start
+            ).group_by(DailyAppointmentStatus.day).all())
 
-        # Weekly appointments data
-        try:
-            appointments_labels = []
-            appointments_data = []
-            
-            for i in range(7):
-                date = (datetime.utcnow() - timedelta(days=6-i)).date()
-                appointments_labels.append(date.strftime('%a'))
-                
-                start_of_day = datetime.combine(date, datetime.min.time())
-                end_of_day = datetime.combine(date, datetime.max.time())
-                
-                # Try AppointmentRequest first
-                try:
-                    count = AppointmentRequest.query.filter(
-                        AppointmentRequest.scheduled_date >= start_of_day,
-                        AppointmentRequest.scheduled_date <= end_of_day
-                    ).count()
-                except:
-                    count = Appointment.query.filter(
-                        Appointment.appointment_date >= start_of_day,
-                        Appointment.appointment_date <= end_of_day
-                    ).count()
-                
-                appointments_data.append(count)
-            
+            week_days = [week_start + timedelta(days=i) for i in range(7)]
             analytics_data['appointments'] = {
-                'labels': appointments_labels,
-                'data': appointments_data
+                'labels': [day.strftime('%a') for day in week_days],
+                'data': [int(daily_appointments.get(day, 0)) for day in week_days]
             }
-        except Exception as e:
-            print(f"Weekly appointments error: {e}")
 
-        # Counselor statistics
-        try:
             counselor_stats = []
             for counselor in Counselor.query.filter_by(is_active=True).all():
-                try:
-                    # Try AppointmentRequest first
-                    total_appointments_counselor = AppointmentRequest.query.filter_by(counselor_id=counselor.id).count()
-                    completed_appointments_counselor = AppointmentRequest.query.filter_by(
-                        counselor_id=counselor.id, 
-                        status='completed'
-                    ).count()
-                except:
-                    # Fallback to Appointment
-                    total_appointments_counselor = Appointment.query.filter_by(counselor_id=counselor.id).count()
-                    completed_appointments_counselor = Appointment.query.filter_by(
-                        counselor_id=counselor.id, 
-                        status='completed'
-                    ).count()
-                
+                total_appointments_counselor = counselor_totals.get(counselor.id, 0)
+                completed_appointments_counselor = counselor_completed.get(counselor.id, 0)
+
                 completion_rate_counselor = round((completed_appointments_counselor / max(1, total_appointments_counselor)) * 100, 1)
                 
                 workload_level = 'high' if total_appointments_counselor >= 20 else ('medium' if total_appointments_counselor >= 10 else 'normal')
@@ -11406,9 +13672,28 @@ def admin_analytics():
                     'workload_level': workload_level
                 })
             
-            analytics_data['counselor_stats'] = counselor_stats
+            analytics_data['counselor_stats'] = counselor_stats
+        except Exception as e:
+            app.logger.error(f"Appointment rollup error: {e}")
+
+        # Forum statistics with error handling
+        try:
+            analytics_data['forum_posts'] = ForumPost.query.count()
+            analytics_data['forum_replies'] = ForumReply.query.count()
+        except Exception as e:
+            app.logger.error(f"Forum stats error: {e}")
+
+        # Active users in last 7 days
+        try:
+            week_ago = datetime.utcnow() - timedelta(days=7)
+            analytics_data['active_users_7days'] = User.query.filter(
+                User.last_login >= week_ago
+            ).count() if hasattr(User, 'last_login') else 0
+            
+            if analytics_data['total_students'] > 0:
+                analytics_data['user_engagement_rate'] = round((analytics_data['active_users_7days'] / analytics_data['total_students']) * 100, 1)
         except Exception as e:
-            print(f"Counselor stats error: {e}")
+            app.logger.error(f"Active users error: {e}")
 
         # Course distribution
         try:
@@ -11425,15 +13710,12 @@ def admin_analytics():
                 })
             analytics_data['course_distribution'] = course_distribution
         except Exception as e:
-            print(f"Course distribution error: {e}")
+            app.logger.error(f"Course distribution error: {e}")
 
-        print("✅ Analytics data compiled successfully!")
         return render_template('admin_analytics.html', analytics_data=analytics_data)
         
     except Exception as e:
-        print(f"❌ Analytics error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Analytics error: {str(e)}")
         
         flash('Analytics loaded with limited data due to an error. Check console for details.', 'warning')
         
@@ -11579,10 +13861,12 @@ def save_settings():
     """Save system settings"""
     try:
         data = request.get_json()
+        if SETTINGS_VERSION_KEY in data:
+            # Bumped by set_settings to invalidate every worker's cache; never set directly
+            return jsonify({'success': False, 'message': f'{SETTINGS_VERSION_KEY} is reserved'}), 400
         
-        # Save each setting
-        for key, value in data.items():
-            set_setting(key, value)
+        # Save all settings in one transaction
+        set_settings(data)
         
         return jsonify({'success': True, 'message': 'Settings saved successfully'})
         
@@ -11734,19 +14018,41 @@ def admin_system_health():
         flash('Error loading system health data. Please try again.', 'error')
         return redirect(url_for('admin_dashboard'))
 
+@app.route('/admin/system-health/performance')
+@login_required
+@role_required('admin')
+def admin_performance_profile():
+    """Per-endpoint latency percentiles and recent slow requests with their queries"""
+    try:
+        return jsonify({
+            'success': True,
+            'summary': request_profiler.summary(),
+            'endpoints': request_profiler.endpoint_stats(sort_by=request.args.get('sort', 'p95_ms')),
+            'slow_requests': list(request_profiler.slow_requests),
+            'slow_request_ms': app.config['SLOW_REQUEST_MS'],
+            'n_plus_one': list(n_plus_one_reports) if app.config['N_PLUS_ONE_DETECTION'] else None
+        })
+    except Exception as e:
+        app.logger.error(f"Error loading performance profile: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to load performance profile'}), 500
+
 @app.route('/admin/system-health/check', methods=['POST'])
 @login_required
 @role_required('admin')
 def run_manual_health_check():
     """Run manual system health check"""
     try:
-        health_data = get_comprehensive_health_data()
-        app.logger.info("Manual health check completed")
+        health_data = get_comprehensive_health_data(refresh=True)
+        snapshot = health_sampler.latest()
+        app.logger.info(f"Manual health check completed in {snapshot['duration_ms']}ms")
         
         return jsonify({
             'success': True,
             'message': 'Health check completed successfully',
-            'overall_status': health_data['overall_status']
+            'overall_status': health_data['overall_status'],
+            'duration_ms': snapshot['duration_ms'],
+            'check_durations_ms': snapshot['check_durations_ms'],
+            'timed_out': snapshot['timed_out']
         })
         
     except Exception as e:
@@ -11757,21 +14063,80 @@ def run_manual_health_check():
 @login_required
 @role_required('admin')
 def get_system_logs():
-    """Get fresh system logs"""
+    """Tail the system log.
+
+    ?limit=100&level=error,warning&endpoint=&since=&until= (ISO times, UTC).
+    The JSON response holds 1 to 10000 entries. With ?format=ndjson the
+    entries are streamed one JSON object per line, and limit=0 streams all.
+    """
     try:
-        logs = get_recent_system_logs()
+        levels = [level for level in request.args.get('level', '').lower().split(',') if level]
+        if any(level not in LOG_LEVELS for level in levels):
+            return jsonify({'success': False, 'error': f"level must be one of {', '.join(LOG_LEVELS)}"}), 400
+        try:
+            since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+            until = datetime.fromisoformat(request.args['until']) if request.args.get('until') else None
+        except ValueError:
+            return jsonify({'success': False, 'error': 'since/until must be ISO 8601 timestamps'}), 400
+
+        limit = request.args.get('limit', 100, type=int)
+        streaming = request.args.get('format') == 'ndjson'
+        # The JSON body is built in memory, so only the stream may be unbounded (0)
+        limit = max(0, limit) if streaming else max(1, min(limit, 10000))
+
+        entries = tail_system_log(
+            limit=limit,
+            levels=levels,
+            endpoint=request.args.get('endpoint') or None,
+            since=since,
+            until=until
+        )
+        if streaming:
+            return Response(stream_with_context(json.dumps(entry) + '\n' for entry in entries),
+                            mimetype='application/x-ndjson')
+
+        logs = [dict(entry, timestamp=entry['ts'][11:19]) for entry in entries]
         return jsonify({'success': True, 'logs': logs})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/admin/system-health/debug-logging', methods=['GET', 'POST'])
+@login_required
+@role_required('admin')
+def debug_logging_settings():
+    """Read or change the share of requests that write DEBUG logs (0 turns them off)"""
+    try:
+        if request.method == 'POST':
+            data = request.get_json() or {}
+            try:
+                rate = float(data.get('sample_rate', 0))
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'message': 'sample_rate must be a number between 0 and 1'}), 400
+            rate = apply_debug_sample_rate(rate)
+            set_setting(DEBUG_SAMPLE_RATE_SETTING, str(rate))
+            app.logger.warning(f"Debug log sample rate set to {rate} by admin {current_user.id}")
+
+        return jsonify({
+            'success': True,
+            'sample_rate': log_state['debug_sample_rate'],
+            'level': logging.getLevelName(app.logger.level),
+            'redaction': app.config['LOG_REDACT'],
+            'queued': system_log_queue_size(),
+            'dropped': log_state['dropped']
+        })
+    except Exception as e:
+        app.logger.error(f"Debug logging settings error: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/admin/system-health/clear-logs', methods=['POST'])
 @login_required
 @role_required('admin')
 def clear_system_logs():
     """Clear system logs"""
     try:
-        app.logger.info("System logs cleared by admin")
-        return jsonify({'success': True, 'message': 'Logs cleared successfully'})
+        removed = clear_system_log_files()
+        app.logger.warning(f"System logs cleared by admin {current_user.id} ({format_file_size(removed)} removed)")
+        return jsonify({'success': True, 'message': 'Logs cleared successfully', 'bytes_removed': removed})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -11861,7 +14226,6 @@ def admin_add_counselor():
         license_number = request.form.get('license_number', '')
         temp_password = request.form.get('temp_password')
 
-        print(f"🔧 Creating counselor: {username}")
 
         # Validation
         if not all([first_name, last_name, email, username, temp_password]):
@@ -11904,10 +14268,10 @@ def admin_add_counselor():
         # VERIFICATION: Test the password immediately after creation
         verification_counselor = Counselor.query.filter_by(username=username).first()
         if verification_counselor and verification_counselor.check_password(temp_password):
-            print(f"✅ Counselor {username} created and verified successfully")
+            app.logger.info("Counselor %s created", verification_counselor.id)
             flash(f'Counselor {counselor.get_full_name()} created successfully! Temp password: {temp_password}', 'success')
         else:
-            print(f"❌ Counselor {username} creation verification failed")
+            app.logger.error("Counselor creation could not be verified after commit")
             # Delete the broken counselor
             db.session.delete(counselor)
             db.session.commit()
@@ -11916,7 +14280,6 @@ def admin_add_counselor():
     except Exception as e:
         db.session.rollback()
         app.logger.error(f"Error creating counselor: {str(e)}")
-        print(f"❌ Error creating counselor: {str(e)}")
         flash('Failed to add counselor. Please try again.', 'error')
     
     return redirect(url_for('admin_counselors'))
@@ -12162,6 +14525,7 @@ def submit_assessment():
             assessment.ai_insights = json.dumps(ai_analysis)
         
         db.session.add(assessment)
+        db.session.flush()  # assigns the id and records the assessment's risk signals
         
         # Trigger crisis intervention if high risk
         if risk_level == 'high':
@@ -12199,7 +14563,8 @@ def analyze_text_sentiment():
         sentiment_result = analyze_sentiment(text)
         
         # Check for crisis language
-        crisis_detected = detect_crisis_language(text)
+        crisis_matches = crisis_detector.find(text)
+        crisis_detected = bool(crisis_matches)
         
         # Generate contextual insight
         insight = generate_text_insight(text, sentiment_result)
@@ -12209,6 +14574,10 @@ def analyze_text_sentiment():
             'sentiment': sentiment_result['sentiment'],
             'confidence': sentiment_result['confidence'],
             'crisis_detected': crisis_detected,
+            'crisis_matches': [
+                {'phrase': match.phrase, 'category': match.category, 'start': match.start, 'end': match.end}
+                for match in crisis_matches
+            ],
             'insight': insight,
             'word_count': len(text.split())
         })
@@ -12449,44 +14818,569 @@ def request_crisis_callback():
 
 
 # =============================================================================
-# AI HELPER FUNCTIONS
+# CRISIS LANGUAGE DETECTION
 # =============================================================================
 
-def analyze_sentiment(text):
-    """Analyze sentiment of text input"""
-    # Simplified sentiment analysis (in production, use actual NLP service)
+CRISIS_PHRASES = {
+    'suicide': 'suicidal',
+    'suicidal': 'suicidal',
+    'kill myself': 'suicidal',
+    'want to die': 'suicidal',
+    'end my life': 'suicidal',
+    'end it all': 'suicidal',
+    'better off dead': 'suicidal',
+    'hurt myself': 'self_harm',
+    'harm myself': 'self_harm',
+    'self harm': 'self_harm',
+    'hopeless': 'hopelessness',
+    'no point': 'hopelessness',
+    "can't go on": 'hopelessness',
+    "can't take it": 'hopelessness',
+    'give up': 'hopelessness',
+    'not worth living': 'hopelessness'
+}
+
+CRISIS_NEGATORS = frozenset([
+    'not', 'no', 'never', "don't", 'dont', "didn't", 'didnt', "won't", 'wont',
+    "wouldn't", 'wouldnt', "isn't", "aren't"
+])
+
+# Words that may sit between a negator and the phrase it governs ("never ever hurt myself")
+CRISIS_NEGATION_AUXILIARIES = frozenset([
+    'would', 'will', 'ever', 'could', 'should', 'shall', 'might', 'do', 'does', 'did', 'even', 'really'
+])
+
+CRISIS_NEGATION_WINDOW = 3  # how far back a governing negator can be, counting the auxiliaries in between
+
+# Texts the detector must get right; `flask check-crisis-detector` fails when one regresses
+CRISIS_DETECTOR_CASES = [
+    ("Nothing matters I want to die", True),
+    ("Without her I want to die", True),
+    ("I no longer want to die", True),
+    ("I don't know I want to die", True),
+    ("Honestly I feel hopeless and I can't go on like this anymore.", True),
+    ("I would never hurt myself, I just need someone to talk to.", False),
+    ("I never hurt myself", False),
+    ("I don't want to die", False),
+    ("I will not ever hurt myself", False),
+    ("I'm not suicidal, just tired.", False),
+    ("I said no, but I want to die", True)
+]
+
+CrisisMatch = namedtuple('CrisisMatch', ['phrase', 'category', 'start', 'end', 'negated'])
+
+
+class CrisisLanguageDetector:
+    """Multi-pattern crisis phrase matcher compiled once and shared by every caller.
+
+    The phrases are folded into a word trie and compiled into a single
+    regular expression, so a scan is one pass of the C regex engine with
+    shared prefixes (the same idea as an Aho-Corasick automaton) instead of
+    one substring search per phrase. Matches respect word boundaries,
+    tolerate extra whitespace, hyphens and curly apostrophes, and are
+    marked negated only when a negator directly governs them: right before
+    the phrase, or separated from it only by auxiliaries ("I would never
+    hurt myself", "I don't want to die"). A negator earlier in the sentence
+    ("I don't know I want to die") does not count.
+    """
+
+    SEPARATOR = '\x00'  # joins batch texts; neither a word nor a whitespace character
+    CLAUSE_BREAKS = '.!?;:,\n\x00'
+    CLAUSE_BREAK_CHARS = frozenset(CLAUSE_BREAKS)
+
+    def __init__(self, phrases, negators=CRISIS_NEGATORS, negation_window=CRISIS_NEGATION_WINDOW,
+                 auxiliaries=CRISIS_NEGATION_AUXILIARIES):
+        self.categories = {}
+        trie = {}
+        for phrase, category in phrases.items():
+            words = phrase.lower().split()
+            self.categories[' '.join(words)] = category
+            node = trie
+            for word in words:
+                node = node.setdefault(word, {})
+            node[''] = True  # end of phrase
+
+        # Text is lowercased and apostrophe-normalized before scanning, so the
+        # pattern needs no IGNORECASE. It also starts with the phrase literals
+        # rather than \b or a lookbehind, which lets the regex engine skip ahead
+        # to candidate first letters; _search checks the word start instead
+        body = self._trie_regex(trie)
+        self.pattern = re.compile(r"(?:" + body + r")(?!\w)")
+        self.pattern_ignorecase = re.compile(r"(?:" + body + r")(?!\w)", re.IGNORECASE)
+        self.negators = negators
+        self.negation_window = negation_window
+        self.auxiliaries = auxiliaries
+        # A negation needs one of these directly before the phrase
+        self.governors = frozenset(negators) | frozenset(auxiliaries)
+        self.phrase_cache = {}
+        self.phrase_cache_hits = 0
+        self.phrase_cache_misses = 0
+
+    @staticmethod
+    def _word_regex(word):
+        return ''.join("'?" if char == "'" else re.escape(char) for char in word)
+
+    @classmethod
+    def _trie_regex(cls, node):
+        alternatives = []
+        for word, child in sorted(node.items(), key=lambda item: -len(item[0])):
+            if word == '':
+                continue
+            tail = cls._trie_regex(child) if any(key for key in child) else ''
+            if not tail:
+                alternatives.append(cls._word_regex(word))
+            elif '' in child:
+                alternatives.append(f"{cls._word_regex(word)}(?:[\\s-]+(?:{tail}))?")
+            else:
+                alternatives.append(f"{cls._word_regex(word)}[\\s-]+(?:{tail})")
+        return '|'.join(alternatives)
+
+    def _prepare(self, text):
+        """Lowercased, apostrophe-normalized copy of `text` and the pattern to scan it with"""
+        lowered = text.lower().replace('’', "'")
+        if len(lowered) == len(text):
+            return lowered, self.pattern
+        # A few characters change length when lowercased; scan the original so spans stay exact
+        return text.replace('’', "'"), self.pattern_ignorecase
+
+    def _phrase(self, matched):
+        phrase = self.phrase_cache.get(matched)
+        if phrase is not None:
+            self.phrase_cache_hits += 1
+        else:
+            self.phrase_cache_misses += 1
+            words = ' '.join(re.split(r"[\s-]+", matched.lower()))
+            phrase = next((p for p in self.categories if p.replace("'", '') == words.replace("'", '')), words)
+            self.phrase_cache[matched] = phrase
+        return phrase
+
+    @staticmethod
+    def _search(pattern, text, position=0):
+        """Next match at or after `position` that starts a word"""
+        while True:
+            match = pattern.search(text, position)
+            if match is None or match.start() == 0:
+                return match
+            previous = text[match.start() - 1]
+            if not (previous.isalnum() or previous == '_'):
+                return match
+            position = match.start() + 1
+
+    def _matches(self, pattern, text):
+        match = self._search(pattern, text)
+        while match is not None:
+            yield match
+            match = self._search(pattern, text, match.end())
+
+    def _is_negated(self, text, start):
+        window = text[max(0, start - 60):start]
+        preceding = window.split()
+        if not preceding:
+            return False
+        # Pre-screen: most matches are not preceded by a negator or auxiliary at all. A word
+        # glued to punctuation ("so.don't") goes through the clause split below instead
+        word = preceding[-1].strip("\"()[]")
+        if word.lower() not in self.governors and self.CLAUSE_BREAK_CHARS.isdisjoint(word):
+            return False
+        clause_start = max(window.rfind(char) for char in self.CLAUSE_BREAKS)
+        if clause_start >= 0:
+            window = window[clause_start + 1:]
+        words = window.lower().split()[-self.negation_window:]
+        # Walk back from the phrase: only auxiliaries may separate it from its negator
+        for word in reversed(words):
+            word = word.strip("\"()[]")
+            if word in self.negators:
+                return True
+            if word not in self.auxiliaries:
+                return False
+        return False
+
+    def _scan(self, text, include_negated):
+        prepared, pattern = self._prepare(text)
+        for match in self._matches(pattern, prepared):
+            negated = self._is_negated(prepared, match.start())
+            if negated and not include_negated:
+                continue
+            phrase = self._phrase(match.group(0))
+            yield CrisisMatch(phrase, self.categories.get(phrase, 'crisis'), match.start(), match.end(), negated)
+
+    def find(self, text, include_negated=False):
+        """All crisis phrase matches in `text` with their spans"""
+        return list(self._scan(text, include_negated)) if text else []
+
+    def detect(self, text):
+        """True on the first un-negated match"""
+        if not text:
+            return False
+        prepared, pattern = self._prepare(text)
+        return any(not self._is_negated(prepared, match.start()) for match in self._matches(pattern, prepared))
+
+    def _join(self, texts):
+        """Join texts for a single scan; returns the combined text and each text's offset"""
+        texts = [text or '' for text in texts]
+        starts = []
+        position = 0
+        for text in texts:
+            starts.append(position)
+            position += len(text) + len(self.SEPARATOR)
+        return self.SEPARATOR.join(texts), starts
+
+    def find_batch(self, texts, include_negated=False):
+        """Matches for many texts in one regex pass; spans are relative to each text"""
+        combined, starts = self._join(texts)
+        results = [[] for _ in starts]
+        for match in self._scan(combined, include_negated):
+            index = bisect.bisect_right(starts, match.start) - 1
+            offset = starts[index]
+            results[index].append(match._replace(start=match.start - offset, end=match.end - offset))
+        return results
+
+    def detect_batch(self, texts):
+        """One flag per text, from a single pass over all of them"""
+        combined, starts = self._join(texts)
+        flags = [False] * len(starts)
+        prepared, pattern = self._prepare(combined)
+        position = 0
+        while True:
+            match = self._search(pattern, prepared, position)
+            if match is None:
+                break
+            if self._is_negated(prepared, match.start()):
+                position = match.end()
+                continue
+            # Flagged: the rest of this text cannot change its result, resume at the next one
+            index = bisect.bisect_right(starts, match.start()) - 1
+            flags[index] = True
+            if index + 1 == len(starts):
+                break
+            position = starts[index + 1]
+        return flags
+
+    def levels_batch(self, texts):
+        """Per text: 'crisis' for an un-negated match, 'negated' when every match is negated, else None"""
+        levels = []
+        for matches in self.find_batch(texts, include_negated=True):
+            if any(not match.negated for match in matches):
+                levels.append('crisis')
+            else:
+                levels.append('negated' if matches else None)
+        return levels
+
+
+crisis_detector = CrisisLanguageDetector(CRISIS_PHRASES)
+
+
+def _legacy_detect_crisis_language(text, phrases=('hurt myself', 'end it all', 'no point', 'better off dead',
+                                                  "can't go on", 'suicide', 'kill myself', 'hopeless',
+                                                  'want to die', 'end my life', "can't take it", 'give up')):
+    """The previous per-phrase substring loop, kept only for the benchmark"""
+    text_lower = text.lower()
+    return any(phrase in text_lower for phrase in phrases)
+
+
+def _benchmark_texts(samples, text_count, from_db):
+    """Texts for the text-analysis benchmarks: free-text answers from stored assessments, or
+    `text_count` responses of one to four sentences drawn from `samples` with a fixed seed"""
+    if from_db:
+        texts = []
+        for (raw,) in db.session.query(Assessment.responses).filter(Assessment.responses.isnot(None)).limit(text_count):
+            try:
+                values = json.loads(raw).values()
+            except (ValueError, AttributeError):
+                continue
+            texts.extend(value for value in values if isinstance(value, str))
+        return texts
+    rng = random.Random(42)
+    return [' '.join(rng.choice(samples) for _ in range(rng.randint(1, 4))) for _ in range(text_count)]
+
+
+def _best_of(fn, repeat):
+    """Fastest of `repeat` runs of `fn` in seconds, with the result of the last run"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+@app.cli.command('benchmark-crisis-detector')
+@click.option('--texts', 'text_count', type=int, default=5000, help='Number of synthetic responses to scan.')
+@click.option('--repeat', type=int, default=3, help='Best-of-N timing.')
+@click.option('--from-db', is_flag=True, help='Scan stored assessment responses instead of synthetic text.')
+def benchmark_crisis_detector_command(text_count, repeat, from_db):
+    """Compare the old phrase loop with the compiled detector (single and batch)."""
+    samples = [
+        "I've been feeling stressed about exams but my friends are helping me cope.",
+        "Honestly I feel hopeless and I can't go on like this anymore.",
+        "Sleep has been bad this week, lots of assignments and group work due.",
+        "I would never hurt myself, I just need someone to talk to about my family.",
+        "Some days I think everyone would be better off dead without me around.",
+        "Looking forward to the holidays and seeing my family again soon."
+    ]
+    texts = _benchmark_texts(samples, text_count, from_db)
+
+    legacy_time, legacy = _best_of(lambda: [_legacy_detect_crisis_language(text) for text in texts], repeat)
+    single_time, single = _best_of(lambda: [crisis_detector.detect(text) for text in texts], repeat)
+    batch_time, batch = _best_of(lambda: crisis_detector.detect_batch(texts), repeat)
+
+    total_chars = sum(len(text) for text in texts)
+    click.echo(f"📊 {len(texts)} texts, {total_chars / 1e6:.2f}M characters, best of {repeat}")
+    for label, elapsed, flags in (('legacy loop', legacy_time, legacy),
+                                  ('detector.detect', single_time, single),
+                                  ('detector.detect_batch', batch_time, batch)):
+        click.echo(f"   {label:<22} {elapsed * 1000:8.1f} ms  {len(texts) / elapsed:10.0f} texts/s  flagged {sum(flags)}")
+    changed = sum(1 for old, new in zip(legacy, batch) if old != new)
+    click.echo(f"   {changed} text(s) classified differently (negation and word boundaries)")
+
+
+@app.cli.command('check-crisis-detector')
+def check_crisis_detector_command():
+    """Run the detector over CRISIS_DETECTOR_CASES; exits non-zero on any mismatch."""
+    texts = [text for text, _ in CRISIS_DETECTOR_CASES]
+    single = [crisis_detector.detect(text) for text in texts]
+    batch = crisis_detector.detect_batch(texts)
+    failures = 0
+    for (text, expected), got, got_batch in zip(CRISIS_DETECTOR_CASES, single, batch):
+        if got != expected or got_batch != expected:
+            failures += 1
+            click.echo(f"❌ {text!r}: expected {expected}, detect {got}, detect_batch {got_batch}")
+    if failures:
+        raise click.ClickException(f"{failures} of {len(texts)} crisis detector case(s) failed")
+    click.echo(f"✅ All {len(texts)} crisis detector cases pass")
+
+
+# =============================================================================
+# SENTIMENT ANALYSIS
+# =============================================================================
+
+# Word weights: positive values lean positive, negative values lean negative
+SENTIMENT_LEXICON = {
+    # positive
+    'good': 1.0, 'great': 1.5, 'happy': 1.5, 'better': 1.0, 'improve': 1.0,
+    'improved': 1.0, 'improving': 1.0, 'positive': 1.0, 'hope': 1.0, 'hopeful': 1.2,
+    'confident': 1.2, 'excited': 1.3, 'grateful': 1.3, 'glad': 1.2, 'calm': 1.0,
+    'relaxed': 1.0, 'peaceful': 1.2, 'proud': 1.2, 'motivated': 1.2, 'supported': 1.0,
+    'enjoy': 1.0, 'enjoying': 1.0, 'love': 1.3, 'okay': 0.5, 'fine': 0.5,
+    # negative
+    'bad': -1.0, 'terrible': -1.8, 'awful': -1.7, 'sad': -1.3, 'worse': -1.2,
+    'difficult': -0.8, 'problem': -0.8, 'problems': -0.8, 'worried': -1.2, 'anxious': -1.3,
+    'depressed': -1.8, 'hopeless': -2.0, 'stressed': -1.2, 'overwhelmed': -1.5, 'lonely': -1.4,
+    'alone': -0.8, 'tired': -0.7, 'exhausted': -1.2, 'scared': -1.3, 'afraid': -1.2,
+    'angry': -1.2, 'upset': -1.1, 'miserable': -1.8, 'worthless': -2.0, 'empty': -1.3,
+    'panic': -1.5, 'crying': -1.0, 'struggling': -1.2, 'hate': -1.5, 'hurt': -1.2,
+    'pain': -1.2
+}
+
+# Multipliers applied to a lexicon word by the word just before it
+SENTIMENT_INTENSIFIERS = {
+    'very': 1.5, 'really': 1.4, 'so': 1.3, 'too': 1.2, 'extremely': 1.8,
+    'incredibly': 1.7, 'totally': 1.5, 'completely': 1.5, 'quite': 1.2, 'always': 1.2,
+    'slightly': 0.6, 'somewhat': 0.7, 'little': 0.7
+}
+
+SENTIMENT_NEGATORS = CRISIS_NEGATORS | frozenset(['nothing', 'without', 'cannot', "can't", 'cant', "haven't",
+                                                  "wasn't", 'hardly', 'barely'])
+SENTIMENT_NEGATION_WINDOW = 3  # words before a lexicon word, within the same clause, that flip it
+SENTIMENT_NEGATION_FACTOR = -0.5  # "not happy" is mildly negative, not the opposite of "happy"
+SENTIMENT_LABELS = {1: 'positive', -1: 'negative', 0: 'neutral'}
+
+
+class SentimentEngine:
+    """Weighted-lexicon sentiment scorer built once and shared by every caller.
+
+    A text is tokenized with one compiled regex; each lexicon word adds its
+    weight, scaled by an intensifier directly before it ("very anxious") and
+    flipped and damped by a negator up to a few words earlier in the same
+    clause ("not happy"). The label and confidence follow the rules of the
+    original word-list scorer: neutral 0.5 without sentiment words, 0.6 on
+    a tie, otherwise 0.6 plus the net weight per word, capped at 0.9.
+
+    `score_batch` tokenizes all texts in one pass and does the window and
+    aggregate math with NumPy, so backfills and reports stay cheap.
+    """
+
+    SEPARATOR = '\x00'
+    TOKEN_PATTERN = re.compile(r"[\w']+|[.!?;:,\n\x00]")
+
+    # Vocabulary ids for the batch path
+    UNKNOWN, BREAK, SEPARATOR_ID = 0, 1, 2
+
+    def __init__(self, lexicon=SENTIMENT_LEXICON, intensifiers=SENTIMENT_INTENSIFIERS,
+                 negators=SENTIMENT_NEGATORS, negation_window=SENTIMENT_NEGATION_WINDOW,
+                 negation_factor=SENTIMENT_NEGATION_FACTOR):
+        self.lexicon = dict(lexicon)
+        self.intensifiers = dict(intensifiers)
+        self.negators = frozenset(negators)
+        self.negation_window = negation_window
+        self.negation_factor = negation_factor
+        self.breaks = frozenset('.!?;:,\n')
+
+        vocabulary = {token: self.BREAK for token in self.breaks}
+        vocabulary[self.SEPARATOR] = self.SEPARATOR_ID
+        for token in set(self.lexicon) | set(self.intensifiers) | self.negators:
+            vocabulary[token] = len(vocabulary) + 1  # ids 0-2 are reserved
+        size = max(vocabulary.values()) + 1
+        self.vocabulary = vocabulary
+        self.weights = np.zeros(size)
+        self.multipliers = np.ones(size)
+        self.negator_mask = np.zeros(size, dtype=np.int32)
+        for token, token_id in vocabulary.items():
+            self.weights[token_id] = self.lexicon.get(token, 0.0)
+            self.multipliers[token_id] = self.intensifiers.get(token, 1.0)
+            self.negator_mask[token_id] = token in self.negators
+
+    @staticmethod
+    def _prepare(text):
+        return text.lower().replace('’', "'")
+
+    @staticmethod
+    def _result(positive, negative, word_count):
+        if positive == 0 and negative == 0:
+            return 'neutral', 0.5
+        net = round(positive - negative, 9)
+        if net == 0:
+            return 'neutral', 0.6
+        confidence = min(0.9, 0.6 + abs(net) / word_count)
+        return ('positive' if net > 0 else 'negative'), confidence
+
+    def analyze(self, text):
+        """{'sentiment', 'confidence', 'score'} for one text; score is the net weight share, -1 to 1"""
+        tokens = self.TOKEN_PATTERN.findall(self._prepare(text or ''))
+        positive = negative = 0.0
+        word_count = 0
+        clause_start = 0
+        for index, token in enumerate(tokens):
+            if token in self.breaks:
+                clause_start = index + 1
+                continue
+            word_count += 1
+            weight = self.lexicon.get(token)
+            if not weight:
+                continue
+            if index > 0:
+                weight *= self.intensifiers.get(tokens[index - 1], 1.0)
+            window = tokens[max(index - self.negation_window, clause_start):index]
+            if any(word in self.negators for word in window):
+                weight *= self.negation_factor
+            if weight > 0:
+                positive += weight
+            else:
+                negative -= weight
+        sentiment, confidence = self._result(positive, negative, word_count)
+        total = positive + negative
+        return {'sentiment': sentiment, 'confidence': confidence,
+                'score': (positive - negative) / total if total else 0.0}
+
+    def score_batch(self, texts):
+        """Per-text NumPy arrays: positive, negative, words, score, label (1/0/-1) and confidence"""
+        texts = [(text or '').replace(self.SEPARATOR, ' ') for text in texts]
+        count = len(texts)
+        tokens = self.TOKEN_PATTERN.findall(self._prepare(self.SEPARATOR.join(texts)))
+        lookup = self.vocabulary.get
+        ids = np.fromiter((lookup(token, self.UNKNOWN) for token in tokens), dtype=np.int32, count=len(tokens))
+
+        positions = np.arange(len(ids))
+        is_break = (ids == self.BREAK) | (ids == self.SEPARATOR_ID)
+        text_ids = np.cumsum(ids == self.SEPARATOR_ID)
+
+        # A negator counts when it sits in the last few words of the same clause
+        last_break = np.maximum.accumulate(np.where(is_break, positions, -1)) if len(ids) else positions
+        window_start = np.minimum(np.maximum(positions - self.negation_window, last_break + 1), positions)
+        negators_seen = np.concatenate(([0], np.cumsum(self.negator_mask[ids])))
+        negated = negators_seen[positions] > negators_seen[window_start]
+
+        previous_multiplier = np.ones(len(ids))
+        previous_multiplier[1:] = self.multipliers[ids[:-1]]
+        contribution = self.weights[ids] * previous_multiplier
+        contribution = np.where(negated, contribution * self.negation_factor, contribution)
+
+        positive = np.bincount(text_ids, weights=np.clip(contribution, 0, None), minlength=count)[:count]
+        negative = np.bincount(text_ids, weights=np.clip(-contribution, 0, None), minlength=count)[:count]
+        words = np.bincount(text_ids, weights=~is_break, minlength=count)[:count]
+
+        total = positive + negative
+        net = np.round(positive - negative, 9)
+        label = np.sign(net).astype(np.int8)
+        confidence = np.where(total == 0, 0.5, np.where(
+            net == 0, 0.6, np.minimum(0.9, 0.6 + np.abs(net) / np.maximum(words, 1))))
+        score = np.divide(positive - negative, total, out=np.zeros(count), where=total > 0)
+        return {'positive': positive, 'negative': negative, 'words': words,
+                'score': score, 'label': label, 'confidence': confidence}
+
+    def analyze_batch(self, texts):
+        """`analyze` results for many texts, computed with `score_batch`"""
+        scores = self.score_batch(texts)
+        return [{'sentiment': SENTIMENT_LABELS[int(label)], 'confidence': float(confidence), 'score': float(score)}
+                for label, confidence, score in zip(scores['label'], scores['confidence'], scores['score'])]
+
+
+sentiment_engine = SentimentEngine()
+
+
+def _legacy_analyze_sentiment(text):
+    """The previous word-list scorer, kept only for the benchmark"""
     positive_words = ['good', 'great', 'happy', 'better', 'improve', 'positive', 'hope', 'confident', 'excited', 'grateful']
     negative_words = ['bad', 'terrible', 'sad', 'worse', 'difficult', 'problem', 'worried', 'anxious', 'depressed', 'hopeless', 'stressed']
-    
     words = re.findall(r'\b\w+\b', text.lower())
-    
     positive_score = sum(1 for word in words if word in positive_words)
     negative_score = sum(1 for word in words if word in negative_words)
-    
-    total_sentiment_words = positive_score + negative_score
-    
-    if total_sentiment_words == 0:
+    if positive_score + negative_score == 0:
         return {'sentiment': 'neutral', 'confidence': 0.5}
-    
     if positive_score > negative_score:
-        confidence = min(0.9, 0.6 + (positive_score - negative_score) / len(words))
-        return {'sentiment': 'positive', 'confidence': confidence}
-    elif negative_score > positive_score:
-        confidence = min(0.9, 0.6 + (negative_score - positive_score) / len(words))
-        return {'sentiment': 'negative', 'confidence': confidence}
-    else:
-        return {'sentiment': 'neutral', 'confidence': 0.6}
+        return {'sentiment': 'positive', 'confidence': min(0.9, 0.6 + (positive_score - negative_score) / len(words))}
+    if negative_score > positive_score:
+        return {'sentiment': 'negative', 'confidence': min(0.9, 0.6 + (negative_score - positive_score) / len(words))}
+    return {'sentiment': 'neutral', 'confidence': 0.6}
+
+
+@app.cli.command('benchmark-sentiment')
+@click.option('--texts', 'text_count', type=int, default=5000, help='Number of synthetic responses to score.')
+@click.option('--repeat', type=int, default=3, help='Best-of-N timing.')
+@click.option('--from-db', is_flag=True, help='Score stored assessment responses instead of synthetic text.')
+def benchmark_sentiment_command(text_count, repeat, from_db):
+    """Compare the old word-list scorer with the sentiment engine (single and batch)."""
+    samples = [
+        "I've been feeling really stressed about exams but my friends are helping me cope.",
+        "Honestly I feel hopeless and so tired, nothing seems to get better.",
+        "Sleep has been bad this week, lots of assignments and group work due.",
+        "I'm not happy with how things are going at home, but I'm hopeful.",
+        "Feeling calm and grateful today, the counseling sessions really improved things.",
+        "Looking forward to the holidays and seeing my family again soon."
+    ]
+    texts = _benchmark_texts(samples, text_count, from_db)
+
+    legacy_time, legacy = _best_of(lambda: [_legacy_analyze_sentiment(text) for text in texts], repeat)
+    single_time, single = _best_of(lambda: [sentiment_engine.analyze(text) for text in texts], repeat)
+    batch_time, batch = _best_of(lambda: sentiment_engine.score_batch(texts), repeat)
+
+    click.echo(f"📊 {len(texts)} texts, {sum(len(text) for text in texts) / 1e6:.2f}M characters, best of {repeat}")
+    for label, elapsed in (('legacy word lists', legacy_time),
+                           ('engine.analyze', single_time),
+                           ('engine.score_batch', batch_time)):
+        click.echo(f"   {label:<20} {elapsed * 1000:8.1f} ms  {len(texts) / elapsed:10.0f} texts/s")
+    mismatched = sum(1 for result, label, confidence in zip(single, batch['label'], batch['confidence'])
+                     if result['sentiment'] != SENTIMENT_LABELS[int(label)] or abs(result['confidence'] - confidence) > 1e-9)
+    changed = sum(1 for old, new in zip(legacy, single) if old['sentiment'] != new['sentiment'])
+    click.echo(f"   single vs batch mismatches: {mismatched}")
+    click.echo(f"   {changed} text(s) labelled differently from the old scorer (weights, negation, intensifiers)")
+
+
+# =============================================================================
+# AI HELPER FUNCTIONS
+# =============================================================================
+
+def analyze_sentiment(text):
+    """Analyze sentiment of text input"""
+    return sentiment_engine.analyze(text)
+
+def analyze_sentiment_batch(texts):
+    """Analyze sentiment of many texts in one pass"""
+    return sentiment_engine.analyze_batch(texts)
 
 def detect_crisis_language(text):
     """Detect crisis language in text"""
-    crisis_phrases = [
-        'hurt myself', 'end it all', 'no point', 'better off dead', 
-        'can\'t go on', 'suicide', 'kill myself', 'hopeless',
-        'want to die', 'end my life', 'can\'t take it', 'give up'
-    ]
-    
-    text_lower = text.lower()
-    return any(phrase in text_lower for phrase in crisis_phrases)
+    return crisis_detector.detect(text)
 
 def perform_ai_analysis(responses, assessment_type):
     """Perform comprehensive AI analysis of assessment responses"""
@@ -12516,11 +15410,14 @@ def perform_ai_analysis(responses, assessment_type):
     
     # Analyze text responses
     text_responses = [v for v in responses.values() if isinstance(v, str)]
-    for text in text_responses:
-        if detect_crisis_language(text):
+    crisis_levels = crisis_detector.levels_batch(text_responses)
+    sentiments = analyze_sentiment_batch(text_responses)
+    for crisis_level, sentiment in zip(crisis_levels, sentiments):
+        if crisis_level == 'crisis':
             analysis['risk_factors'].append('crisis_language_detected')
+        elif crisis_level == 'negated':
+            analysis['risk_factors'].append('negated_crisis_language')
         
-        sentiment = analyze_sentiment(text)
         if sentiment['sentiment'] == 'negative' and sentiment['confidence'] > 0.7:
             analysis['risk_factors'].append('negative_sentiment_strong')
     
@@ -12557,9 +15454,11 @@ def calculate_risk_level(score, assessment_type, responses):
     
     # Check for crisis language in text responses
     text_responses = [v for v in responses.values() if isinstance(v, str)]
-    for text in text_responses:
-        if detect_crisis_language(text):
-            return 'high'  # Override to high risk if crisis language detected
+    crisis_levels = crisis_detector.levels_batch(text_responses)
+    if 'crisis' in crisis_levels:
+        return 'high'  # Override to high risk if crisis language detected
+    if 'negated' in crisis_levels and base_risk == 'low':
+        return 'medium'  # Negated crisis language ("I would never hurt myself") still warrants a look
     
     return base_risk
 
@@ -12704,6 +15603,195 @@ def get_recommended_assessment_type(user_id):
         app.logger.error(f"Error getting recommended assessment: {str(e)}")
         return 'mood'
 
+# =============================================================================
+# ASSESSMENT RISK SIGNALS
+# =============================================================================
+
+ASSESSMENT_SIGNALS_VERSION = 3  # bump when the detector or sentiment scoring changes, then backfill --stale
+
+
+class AssessmentSignals(db.Model):
+    """Crisis, sentiment and risk features extracted from an assessment when it is written.
+
+    One row per assessment, so alert and caseload queries are indexed
+    lookups instead of re-parsing `Assessment.responses` JSON on every view.
+    user_id and created_at are copied from the assessment for the indexes.
+    """
+    __tablename__ = 'assessment_signals'
+    __table_args__ = (
+        db.Index('ix_assessment_signals_user_crisis', 'user_id', 'crisis_detected', 'created_at'),
+        db.Index('ix_assessment_signals_user_risk', 'user_id', 'risk_level', 'created_at'),
+    )
+
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessment.id'), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime)
+    assessment_type = db.Column(db.String(50))
+    score = db.Column(db.Integer)
+    risk_level = db.Column(db.String(20))  # lowercased Assessment.risk_level
+    crisis_detected = db.Column(db.Boolean, nullable=False, default=False)
+    crisis_match_count = db.Column(db.Integer, nullable=False, default=0)
+    negated_crisis_count = db.Column(db.Integer, nullable=False, default=0)  # matches a negator governs
+    crisis_phrases = db.Column(db.String(500))  # comma-separated
+    crisis_categories = db.Column(db.String(200))  # comma-separated
+    text_response_count = db.Column(db.Integer, nullable=False, default=0)
+    negative_text_count = db.Column(db.Integer, nullable=False, default=0)
+    sentiment_score = db.Column(db.Float)  # mean signed confidence, -1 (negative) to 1 (positive)
+    numeric_average = db.Column(db.Float)
+    analyzer_version = db.Column(db.Integer, nullable=False, default=ASSESSMENT_SIGNALS_VERSION)
+    analyzed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def compute_assessment_signals(assessments):
+    """Signal rows for (id, user_id, created_at, assessment_type, score, risk_level, responses) tuples.
+
+    All text responses in the batch go through the crisis detector in one pass.
+    """
+    parsed = []
+    texts = []
+    for assessment_id, user_id, created_at, assessment_type, score, risk_level, responses in assessments:
+        try:
+            values = json.loads(responses) if isinstance(responses, str) else (responses or {})
+            values = list(values.values()) if isinstance(values, dict) else []
+        except ValueError:
+            values = []
+        text_values = [value for value in values if isinstance(value, str) and value.strip()]
+        numeric_values = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        parsed.append((assessment_id, user_id, created_at, assessment_type, score, risk_level,
+                       len(texts), len(text_values), numeric_values))
+        texts.extend(text_values)
+
+    crisis_matches = crisis_detector.find_batch(texts, include_negated=True)
+    sentiments = sentiment_engine.score_batch(texts)
+    signed_confidence = sentiments['label'] * sentiments['confidence']
+
+    rows = []
+    now = datetime.utcnow()
+    for (assessment_id, user_id, created_at, assessment_type, score, risk_level,
+         first_text, text_count, numeric_values) in parsed:
+        found = [match for matches in crisis_matches[first_text:first_text + text_count] for match in matches]
+        matches = [match for match in found if not match.negated]
+        text_slice = slice(first_text, first_text + text_count)
+        rows.append({
+            'assessment_id': assessment_id,
+            'user_id': user_id,
+            'created_at': created_at,
+            'assessment_type': assessment_type,
+            'score': score,
+            'risk_level': (risk_level or 'unknown').lower(),
+            'crisis_detected': bool(matches),
+            'crisis_match_count': len(matches),
+            'negated_crisis_count': len(found) - len(matches),
+            'crisis_phrases': ','.join(sorted({match.phrase for match in matches}))[:500] or None,
+            'crisis_categories': ','.join(sorted({match.category for match in matches})) or None,
+            'text_response_count': text_count,
+            'negative_text_count': int((sentiments['label'][text_slice] == -1).sum()),
+            'sentiment_score': float(signed_confidence[text_slice].mean()) if text_count else None,
+            'numeric_average': sum(numeric_values) / len(numeric_values) if numeric_values else None,
+            'analyzer_version': ASSESSMENT_SIGNALS_VERSION,
+            'analyzed_at': now
+        })
+    return rows
+
+
+def upsert_assessment_signals(connection, rows):
+    if not rows:
+        return
+    statement = sqlite_insert(AssessmentSignals.__table__)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['assessment_id'],
+        set_={column: statement.excluded[column] for column in rows[0] if column != 'assessment_id'}
+    ), rows)
+
+
+_ASSESSMENT_SIGNAL_FIELDS = ('user_id', 'created_at', 'assessment_type', 'score', 'risk_level', 'responses')
+
+
+@event.listens_for(SQLAlchemySession, 'after_flush')
+def _record_assessment_signals(session, flush_context):
+    """Extract signals for new or re-scored assessments in the same transaction"""
+    changed = []
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Assessment):
+            continue
+        if obj not in session.new:
+            state = db.inspect(obj)
+            if not any(state.attrs[field].history.has_changes() for field in _ASSESSMENT_SIGNAL_FIELDS):
+                continue
+        changed.append((obj.id, obj.user_id, obj.created_at, obj.assessment_type, obj.score,
+                        obj.risk_level, obj.responses))
+
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Assessment)]
+    if deleted:
+        session.connection().execute(AssessmentSignals.__table__.delete().where(
+            AssessmentSignals.__table__.c.assessment_id.in_(deleted)))
+    if changed:
+        try:
+            upsert_assessment_signals(session.connection(), compute_assessment_signals(changed))
+        except Exception as e:
+            # Never block the assessment itself; the backfill picks it up later
+            app.logger.error(f"Error recording assessment signals: {str(e)}")
+
+
+def backfill_assessment_signals(batch_size=500, stale=False):
+    """Compute signals for assessments that have none (or an older analyzer version); returns rows written"""
+    written = 0
+    last_id = 0
+    while True:
+        query = db.session.query(
+            Assessment.id, Assessment.user_id, Assessment.created_at, Assessment.assessment_type,
+            Assessment.score, Assessment.risk_level, Assessment.responses
+        ).outerjoin(AssessmentSignals, AssessmentSignals.assessment_id == Assessment.id).filter(Assessment.id > last_id)
+        if stale:
+            query = query.filter(or_(AssessmentSignals.assessment_id.is_(None),
+                                     AssessmentSignals.analyzer_version < ASSESSMENT_SIGNALS_VERSION))
+        else:
+            query = query.filter(AssessmentSignals.assessment_id.is_(None))
+        batch = query.order_by(Assessment.id).limit(batch_size).all()
+        if not batch:
+            return written
+
+        rows = compute_assessment_signals([tuple(row) for row in batch])
+        upsert_assessment_signals(db.session.connection(), rows)
+        db.session.commit()
+        written += len(rows)
+        last_id = batch[-1][0]
+
+
+def create_assessment_signals_table():
+    """Create the signals table and backfill it the first time it is created"""
+    with app.app_context():
+        try:
+            existed = 'assessment_signals' in db.inspect(db.engine).get_table_names()
+            db.create_all()
+            if existed:
+                columns = {column['name'] for column in db.inspect(db.engine).get_columns('assessment_signals')}
+                if 'negated_crisis_count' not in columns:
+                    with db.engine.begin() as conn:
+                        conn.execute(text('ALTER TABLE assessment_signals '
+                                          'ADD COLUMN negated_crisis_count INTEGER NOT NULL DEFAULT 0'))
+                    print("✅ Added negated_crisis_count to assessment_signals (run backfill-assessment-signals --stale)")
+            else:
+                written = backfill_assessment_signals()
+                print(f"✅ Assessment signals backfilled for {written} assessment(s)")
+            return True
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error creating assessment signals table: {str(e)}")
+            return False
+
+create_assessment_signals_table()
+
+
+@app.cli.command('backfill-assessment-signals')
+@click.option('--stale', is_flag=True, help='Also recompute rows from an older analyzer version.')
+@click.option('--batch-size', type=int, default=500)
+def backfill_assessment_signals_command(stale, batch_size):
+    """Extract crisis/sentiment/risk signals for historical assessments."""
+    written = backfill_assessment_signals(batch_size=batch_size, stale=stale)
+    click.echo(f"🧠 Wrote signals for {written} assessment(s)")
+
+
 # =============================================================================
 # ADDITIONAL HELPER FUNCTIONS
 # =============================================================================
@@ -12910,12 +15998,15 @@ def calculate_crisis_score(responses, text_responses):
             crisis_score += 2
     
     # Check text responses for crisis language
-    for text in text_responses:
-        if detect_crisis_language(text):
+    crisis_levels = crisis_detector.levels_batch(text_responses)
+    sentiments = analyze_sentiment_batch(text_responses)
+    for crisis_level, sentiment in zip(crisis_levels, sentiments):
+        if crisis_level == 'crisis':
             crisis_score += 5
+        elif crisis_level == 'negated':
+            crisis_score += 1  # negated mentions weigh less but are not discarded
         
         # Check sentiment
-        sentiment = analyze_sentiment(text)
         if sentiment['sentiment'] == 'negative' and sentiment['confidence'] > 0.8:
             crisis_score += 2
     
@@ -13208,14 +16299,9 @@ def profile():
 @app.route('/update_profile', methods=['POST'])
 @login_required
 def update_profile():
-    """Update user profile information - Debug Version"""
-    print("=== Profile Update Debug ===")
-    print(f"Request method: {request.method}")
-    print(f"Form data: {dict(request.form)}")
-    print(f"Current user: {current_user.email}")
-    
+    """Update user profile information"""
     try:
-        # Get form data with debugging
+        # Get form data
         first_name = request.form.get('first_name', '').strip()
         last_name = request.form.get('last_name', '').strip()
         email = request.form.get('email', '').strip()
@@ -13223,17 +16309,9 @@ def update_profile():
         course = request.form.get('course', '').strip()
         year_of_study = request.form.get('year_of_study')
         
-        print(f"Extracted data:")
-        print(f"  First name: {first_name}")
-        print(f"  Last name: {last_name}")
-        print(f"  Email: {email}")
-        print(f"  Phone: {phone_number}")
-        print(f"  Course: {course}")
-        print(f"  Year: {year_of_study}")
-        
         # Basic validation
         if not first_name or not last_name or not email:
-            print("Validation failed: Missing required fields")
+            app.logger.debug("Profile update for user %s missing required fields", current_user.id)
             flash('Please fill in all required fields.', 'error')
             return redirect(url_for('profile'))
         
@@ -13243,12 +16321,6 @@ def update_profile():
         except (ValueError, TypeError):
             year_of_study = current_user.year_of_study
         
-        print(f"Before update - Current user data:")
-        print(f"  Name: {current_user.first_name} {current_user.last_name}")
-        print(f"  Email: {current_user.email}")
-        print(f"  Course: {current_user.course}")
-        print(f"  Year: {current_user.year_of_study}")
-        
         # Update user information
         current_user.first_name = first_name
         current_user.last_name = last_name
@@ -13257,26 +16329,17 @@ def update_profile():
         current_user.course = course
         current_user.year_of_study = year_of_study
         
-        print(f"After update - New user data:")
-        print(f"  Name: {current_user.first_name} {current_user.last_name}")
-        print(f"  Email: {current_user.email}")
-        print(f"  Course: {current_user.course}")
-        print(f"  Year: {current_user.year_of_study}")
-        
         # Commit to database
         db.session.commit()
-        print("Database commit successful")
+        app.logger.info("Profile updated for user %s", current_user.id)
         
         flash('Profile updated successfully!', 'success')
-        print("Success message flashed")
         
     except Exception as e:
-        print(f"ERROR occurred: {e}")
-        print(f"Error type: {type(e)}")
+        app.logger.error(f"Profile update failed for user {current_user.id}: {e}")
         db.session.rollback()
         flash('An error occurred while updating your profile. Please try again.', 'error')
     
-    print("Redirecting to profile page")
     return redirect(url_for('profile'))
 
 @app.route('/change_password', methods=['POST'])
@@ -13318,7 +16381,7 @@ def change_password():
     except Exception as e:
         db.session.rollback()
         flash('An error occurred while changing your password. Please try again.', 'error')
-        print(f"Password change error: {e}")
+        app.logger.error(f"Password change error: {e}")
     
     return redirect(url_for('profile'))
 
@@ -13415,7 +16478,7 @@ def get_counselor_students():
         })
         
     except Exception as e:
-        print(f"Error fetching counselor students: {e}")
+        app.logger.error(f"Error fetching counselor students: {e}")
         return jsonify({
             'success': False,
             'message': 'Internal server error'
@@ -13462,7 +16525,7 @@ def get_student_info(student_id):
         })
         
     except Exception as e:
-        print(f"Error fetching student info: {e}")
+        app.logger.error(f"Error fetching student info: {e}")
         return jsonify({
             'success': False,
             'message': 'Internal server error'
@@ -13515,7 +16578,7 @@ def get_current_assessment(student_id):
         })
         
     except Exception as e:
-        print(f"Error fetching current assessment: {e}")
+        app.logger.error(f"Error fetching current assessment: {e}")
         return jsonify({
             'success': False,
             'message': 'Internal server error'
@@ -13575,7 +16638,7 @@ def get_counselor_assessment_history(student_id):
         })
         
     except Exception as e:
-        print(f"Error fetching counselor assessment history: {e}")
+        app.logger.error(f"Error fetching counselor assessment history: {e}")
         return jsonify({
             'success': False,
             'message': 'Internal server error'
@@ -13588,7 +16651,7 @@ def get_student_alerts(student_id):
     """Get alerts and crisis indicators for the student"""
     try:
         # Ensure user is a counselor
-        if not hasattr(current_user, 'role') or current_user.role != 'counselor':
+        if not isinstance(current_user, Counselor):
             return jsonify({'success': False, 'message': 'Unauthorized'}), 403
         
         # Get student
@@ -13602,17 +16665,17 @@ def get_student_alerts(student_id):
         
         alerts = []
         
-        # Get recent high-risk assessments
-        high_risk_assessments = Assessment.query.filter(
-            Assessment.student_id == student.id,
-            Assessment.risk_level.in_(['High', 'Moderate']),
-            Assessment.created_at >= datetime.now() - timedelta(days=30)
-        ).order_by(desc(Assessment.created_at)).all()
+        # Recent high-risk assessments (indexed lookup on the precomputed signals)
+        high_risk_assessments = AssessmentSignals.query.filter(
+            AssessmentSignals.user_id == student.id,
+            AssessmentSignals.risk_level.in_(['high', 'medium', 'moderate']),
+            AssessmentSignals.created_at >= datetime.now() - timedelta(days=30)
+        ).order_by(desc(AssessmentSignals.created_at)).all()
         
         for assessment in high_risk_assessments:
-            severity = 'critical' if assessment.risk_level == 'High' else 'warning'
-            title = f'{assessment.risk_level} Risk Assessment'
-            message = f'Student scored {assessment.total_score} on {assessment.assessment_type} assessment indicating {assessment.risk_level.lower()} risk.'
+            severity = 'critical' if assessment.risk_level == 'high' else 'warning'
+            title = f'{assessment.risk_level.title()} Risk Assessment'
+            message = f'Student scored {assessment.score} on {assessment.assessment_type} assessment indicating {assessment.risk_level} risk.'
             
             alerts.append({
                 'alert_type': 'risk_assessment',
@@ -13622,30 +16685,22 @@ def get_student_alerts(student_id):
                 'created_at': assessment.created_at.isoformat()
             })
         
-        # Check for crisis language in responses
-        crisis_keywords = ['suicide', 'kill', 'die', 'harm', 'hurt', 'end it all', 'can\'t go on']
-        crisis_assessments = Assessment.query.filter(
-            Assessment.student_id == student.id,
-            Assessment.created_at >= datetime.now() - timedelta(days=90)
-        ).all()
+        # Most recent assessment with crisis language in its responses
+        crisis_assessment = AssessmentSignals.query.filter(
+            AssessmentSignals.user_id == student.id,
+            AssessmentSignals.crisis_detected == True,
+            AssessmentSignals.created_at >= datetime.now() - timedelta(days=90)
+        ).order_by(desc(AssessmentSignals.created_at)).first()
         
-        for assessment in crisis_assessments:
-            if hasattr(assessment, 'responses') and assessment.responses:
-                try:
-                    responses = json.loads(assessment.responses) if isinstance(assessment.responses, str) else assessment.responses
-                    responses_text = ' '.join(str(response).lower() for response in responses.values() if response)
-                    
-                    if any(keyword in responses_text for keyword in crisis_keywords):
-                        alerts.append({
-                            'alert_type': 'crisis_language',
-                            'severity': 'critical',
-                            'title': 'Crisis Language Detected',
-                            'message': 'Crisis-related language was detected in assessment responses. Immediate attention recommended.',
-                            'created_at': assessment.created_at.isoformat()
-                        })
-                        break  # Only add one crisis alert per student
-                except:
-                    pass  # Skip if responses can't be parsed
+        if crisis_assessment:
+            alerts.append({
+                'alert_type': 'crisis_language',
+                'severity': 'critical',
+                'title': 'Crisis Language Detected',
+                'message': 'Crisis-related language was detected in assessment responses. Immediate attention recommended.',
+                'matched_phrases': crisis_assessment.crisis_phrases.split(',') if crisis_assessment.crisis_phrases else [],
+                'created_at': crisis_assessment.created_at.isoformat()
+            })
         
         # Sort alerts by date (newest first)
         alerts.sort(key=lambda x: x['created_at'], reverse=True)
@@ -13656,7 +16711,7 @@ def get_student_alerts(student_id):
         })
         
     except Exception as e:
-        print(f"Error fetching alerts: {e}")
+        app.logger.error(f"Error fetching alerts: {e}")
         return jsonify({
             'success': False,
             'message': 'Internal server error'
@@ -13703,7 +16758,7 @@ def get_appointment_notes(appointment_id):
         })
         
     except Exception as e:
-        print(f"Error fetching notes: {e}")
+        app.logger.error(f"Error fetching notes: {e}")
         return jsonify({
             'success': False,
             'message': 'Internal server error'
@@ -13763,7 +16818,7 @@ def save_appointment_notes(appointment_id):
         })
         
     except Exception as e:
-        print(f"Error saving appointment notes: {e}")
+        app.logger.error(f"Error saving appointment notes: {e}")
         db.session.rollback()
         return jsonify({
             'success': False,
@@ -13818,7 +16873,7 @@ def save_student_notes(student_id):
         })
         
     except Exception as e:
-        print(f"Error saving student notes: {e}")
+        app.logger.error(f"Error saving student notes: {e}")
         db.session.rollback()
         return jsonify({
             'success': False,
@@ -13846,6 +16901,164 @@ def internal_error(error):
 def forbidden_error(error):
     return render_template('errors/403.html'), 403
 
+# =============================================================================
+# SCHEMA MIGRATIONS
+# =============================================================================
+
+# (version, description, statements) - append new steps, never edit applied ones
+SCHEMA_MIGRATIONS = [
+    (1, 'Indexes for hot filter columns', [
+        # Counselor schedule, calendar and conflict checks
+        'CREATE INDEX IF NOT EXISTS ix_appointment_request_counselor_scheduled ON appointment_request (counselor_id, scheduled_date)',
+        'CREATE INDEX IF NOT EXISTS ix_appointment_request_counselor_status ON appointment_request (counselor_id, status)',
+        # Student appointment lists
+        'CREATE INDEX IF NOT EXISTS ix_appointment_request_user_created ON appointment_request (user_id, created_at)',
+        # Admin status filters and dashboard counts
+        'CREATE INDEX IF NOT EXISTS ix_appointment_request_status_scheduled ON appointment_request (status, scheduled_date)',
+        'CREATE INDEX IF NOT EXISTS ix_appointment_request_scheduled_date ON appointment_request (scheduled_date)',
+        # Assessment history, trends and weekly counts
+        'CREATE INDEX IF NOT EXISTS ix_assessment_user_created ON assessment (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_assessment_user_type_created ON assessment (user_id, assessment_type, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_assessment_created_at ON assessment (created_at)',
+        # Forum feeds and oversight filters
+        'CREATE INDEX IF NOT EXISTS ix_forum_post_flagged_created ON forum_post (is_flagged, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_forum_post_category_created ON forum_post (category, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_forum_post_created_at ON forum_post (created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_forum_reply_post_created ON forum_reply (post_id, created_at)',
+        # User role filters and activity
+        'CREATE INDEX IF NOT EXISTS ix_user_role_created ON user (role, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_user_last_login ON user (last_login)',
+        # Blocked time lookups
+        'CREATE INDEX IF NOT EXISTS ix_schedule_block_counselor_date ON counselor_schedule_block (counselor_id, block_date)',
+    ]),
+    (2, 'Index for the due-reminder scan', [
+        'CREATE INDEX IF NOT EXISTS ix_appointment_reminder_sent_time ON appointment_reminder (sent, reminder_time)',
+    ]),
+]
+
+def run_schema_migrations():
+    """Apply pending schema migrations in version order"""
+    with app.app_context():
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text('''
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INTEGER PRIMARY KEY,
+                        description VARCHAR(200),
+                        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                '''))
+                applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations")).fetchall()}
+
+            for version, description, statements in SCHEMA_MIGRATIONS:
+                if version in applied:
+                    continue
+                
+                print(f"📝 Applying schema migration {version}: {description}...")
+                with db.engine.begin() as conn:
+                    for statement in statements:
+                        conn.execute(text(statement))
+                    conn.execute(text(
+                        "INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"
+                    ), {'version': version, 'description': description})
+                print(f"✅ Schema migration {version} applied")
+
+            return True
+
+        except Exception as e:
+            print(f"❌ Error applying schema migrations: {str(e)}")
+            return False
+
+def get_hot_queries():
+    """Representative queries from the route handlers, keyed by description"""
+    now = datetime.utcnow()
+    
+    return {
+        'counselor schedule for a day': AppointmentRequest.query.filter(
+            AppointmentRequest.counselor_id == 1,
+            day_range_filter(AppointmentRequest.scheduled_date, now.date())
+        ).order_by(AppointmentRequest.scheduled_date),
+        'counselor schedule for a week': AppointmentRequest.query.filter(
+            AppointmentRequest.counselor_id == 1,
+            day_range_filter(AppointmentRequest.scheduled_date, now.date(), now.date() + timedelta(days=6)),
+            AppointmentRequest.status.in_(['scheduled', 'assigned'])
+        ),
+        'same-hour conflict check': AppointmentRequest.query.filter(
+            AppointmentRequest.counselor_id == 1,
+            hour_range_filter(AppointmentRequest.scheduled_date, now),
+            AppointmentRequest.status.in_(['scheduled', 'assigned'])
+        ),
+        'counselor appointments by status': AppointmentRequest.query.filter(
+            AppointmentRequest.counselor_id == 1,
+            AppointmentRequest.status.in_(['scheduled', 'assigned'])
+        ),
+        'student appointments': AppointmentRequest.query.filter_by(user_id=1)
+            .order_by(AppointmentRequest.created_at.desc()),
+        'pending appointments': AppointmentRequest.query.filter_by(status='pending'),
+        'appointments today': AppointmentRequest.query.filter(
+            day_range_filter(AppointmentRequest.scheduled_date, now.date())
+        ),
+        'student assessment history': Assessment.query.filter_by(user_id=1)
+            .order_by(Assessment.created_at.desc()).limit(5),
+        'assessment trend by type': Assessment.query.filter_by(user_id=1, assessment_type='mood')
+            .order_by(Assessment.created_at.asc()),
+        'assessments this week': Assessment.query.filter(Assessment.created_at >= now - timedelta(days=7)),
+        'flagged forum posts': ForumPost.query.filter(ForumPost.is_flagged == True)
+            .order_by(ForumPost.created_at.desc()),
+        'forum posts by category': ForumPost.query.filter_by(category='general')
+            .order_by(ForumPost.created_at.desc()),
+        'replies for a post': ForumReply.query.filter_by(post_id=1).order_by(ForumReply.created_at.asc()),
+        'recent students': User.query.filter(User.role == 'student').order_by(User.created_at.desc()).limit(10),
+        'recently active users': User.query.filter(User.last_login >= now - timedelta(days=7)),
+        'counselor blocks for a day': CounselorScheduleBlock.query.filter(
+            CounselorScheduleBlock.counselor_id == 1,
+            CounselorScheduleBlock.block_date == now.date()
+        )
+    }
+
+def explain_query_plan(query):
+    """Return the EXPLAIN QUERY PLAN detail lines for a SQLAlchemy query"""
+    compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    params = compiled.construct_params()
+    positional = [params[name] for name in compiled.positiontup]
+    # The plan does not depend on exact values, only on their presence
+    positional = [value.isoformat(' ') if isinstance(value, datetime)
+                  else value.isoformat() if isinstance(value, date)
+                  else value for value in positional]
+    
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", tuple(positional)).fetchall()
+    return [row[-1] for row in rows]
+
+def check_query_plans(queries=None):
+    """Report which hot queries still fall back to a full table scan.
+
+    Returns a list of {'name', 'plan', 'table_scans'} dicts; a query is healthy
+    when table_scans is empty.
+    """
+    with app.app_context():
+        report = []
+        for name, query in (queries or get_hot_queries()).items():
+            plan = explain_query_plan(query)
+            table_scans = [line for line in plan if line.startswith('SCAN') and 'INDEX' not in line]
+            report.append({'name': name, 'plan': plan, 'table_scans': table_scans})
+        return report
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Print EXPLAIN QUERY PLAN results for the hot route queries."""
+    report = check_query_plans()
+    for entry in report:
+        marker = '❌' if entry['table_scans'] else '✅'
+        click.echo(f"{marker} {entry['name']}")
+        for line in entry['plan']:
+            click.echo(f"      {line}")
+    
+    scanning = [entry['name'] for entry in report if entry['table_scans']]
+    click.echo(f"\n{len(report) - len(scanning)}/{len(report)} hot queries use an index")
+    if scanning:
+        raise click.ClickException(f"{len(scanning)} hot query(ies) scan a table: {', '.join(scanning)}")
+
 # Initialize database
 def create_tables():
     """Create database tables and fix any missing columns - FIXED"""
@@ -13873,6 +17086,9 @@ def create_tables():
             except Exception as e:
                 print(f"⚠️ Column update error: {str(e)}")
             
+            # Apply versioned schema migrations (indexes etc.)
+            run_schema_migrations()
+            
             # Create default admin user if it doesn't exist
             try:
                 admin = User.query.filter_by(username='admin').first()
@@ -14035,24 +17251,32 @@ def api_search_resources():
         if category != 'all':
             search_query = search_query.filter_by(category=category)
         
-        # Apply search filters
-        search_query = search_query.filter(
-            db.or_(
-                WellnessResource.title.contains(query),
-                WellnessResource.content.contains(query),
-                WellnessResource.tags.contains(query)
+        # Apply search filters, ranked by relevance when the FTS index is available
+        hits = fts_search_subquery('wellness_resource_fts', query)
+        if hits is not None:
+            search_query = search_query.join(hits, hits.c.rowid == WellnessResource.id).order_by(
+                hits.c.rank,
+                WellnessResource.is_featured.desc(),
+                WellnessResource.created_at.desc()
+            )
+        else:
+            search_query = search_query.filter(
+                db.or_(
+                    WellnessResource.title.contains(query),
+                    WellnessResource.content.contains(query),
+                    WellnessResource.tags.contains(query)
+                )
+            ).order_by(
+                WellnessResource.is_featured.desc(),
+                WellnessResource.created_at.desc()
             )
-        )
         
-        # Order results
-        resources = search_query.order_by(
-            WellnessResource.is_featured.desc(),
-            WellnessResource.created_at.desc()
-        ).limit(20).all()
+        resources = search_query.limit(20).all()
+        snippets = fts_snippets('wellness_resource_fts', query, [r.id for r in resources]) if hits is not None else {}
         
         resources_data = []
         for resource in resources:
-            resources_data.append({
+            resource_data = {
                 'id': resource.id,
                 'title': resource.title,
                 'content': resource.content[:200] + '...' if len(resource.content) > 200 else resource.content,
@@ -14060,7 +17284,11 @@ def api_search_resources():
                 'is_featured': resource.is_featured,
                 'created_at': resource.created_at.strftime('%B %d, %Y'),
                 'tags': resource.tags.split(',') if resource.tags else []
-            })
+            }
+            if resource.id in snippets:
+                resource_data['title_highlight'] = snippets[resource.id]['title']
+                resource_data['snippet'] = snippets[resource.id]['content']
+            resources_data.append(resource_data)
         
         return jsonify({
             'success': True,
@@ -14776,6 +18004,10 @@ def create_schedule_tables():
 # Call this function once to create schedule tables
 create_schedule_tables()
 
+# Every table the migrations touch exists by now, so pending migrations are applied
+# on import (flask run, the CLI and WSGI servers), not only when app.py is run directly
+run_schema_migrations()
+
 
 def add_schedule_columns_to_existing_tables():
     """Add schedule-related columns to existing tables - RUN ONCE"""
@@ -14837,6 +18069,292 @@ add_schedule_columns_to_existing_tables()
 
 
 
+# =============================================================================
+# AVAILABILITY ENGINE
+# =============================================================================
+
+# Appointment statuses that occupy a counselor's time
+BUSY_APPOINTMENT_STATUSES = ('scheduled', 'assigned', 'blocked')
+
+# Candidate slots start on this grid, measured from the start of the working day
+SLOT_STEP_MINUTES = 30
+
+# Used for counselors who have not saved availability settings for a weekday
+DEFAULT_WORKING_HOURS = {
+    'start_time': datetime.strptime('08:00', '%H:%M').time(),
+    'end_time': datetime.strptime('17:00', '%H:%M').time(),
+    'lunch_start': datetime.strptime('12:00', '%H:%M').time(),
+    'lunch_end': datetime.strptime('13:00', '%H:%M').time(),
+    'session_duration': 60,
+    'buffer_time': 0
+}
+
+
+def merge_intervals(intervals):
+    """Sort and merge overlapping or touching (start, end) intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def subtract_intervals(window, busy):
+    """Return the parts of a (start, end) window not covered by merged busy intervals."""
+    free = []
+    cursor, window_end = window
+    for start, end in busy:
+        if end <= cursor:
+            continue
+        if start >= window_end:
+            break
+        if start > cursor:
+            free.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < window_end:
+        free.append((cursor, window_end))
+    return free
+
+
+class AvailabilityEngine:
+    """Free/busy calculator for a set of counselors over a date range.
+
+    Working hours, blocked time and booked appointments are loaded with one
+    query each; everything after that is interval arithmetic in memory, so
+    checking a slot or listing a day's slots issues no further queries.
+    """
+
+    def __init__(self, counselor_ids, first_day, last_day=None, exclude_appointment_ids=None):
+        self.counselor_ids = list(counselor_ids)
+        self.first_day = first_day
+        self.last_day = last_day or first_day
+        self._day_cache = {}
+
+        self.availability = {}
+        self.blocks = {}
+        self.appointments = {}
+        if self.counselor_ids:
+            self._load(exclude_appointment_ids or ())
+
+    def _load(self, exclude_appointment_ids):
+        for setting in CounselorAvailability.query.filter(
+            CounselorAvailability.counselor_id.in_(self.counselor_ids)
+        ).all():
+            self.availability[(setting.counselor_id, setting.day_of_week.lower())] = setting
+
+        for block in CounselorScheduleBlock.query.filter(
+            CounselorScheduleBlock.counselor_id.in_(self.counselor_ids),
+            CounselorScheduleBlock.block_date <= self.last_day,
+            or_(
+                CounselorScheduleBlock.block_date >= self.first_day,
+                CounselorScheduleBlock.is_recurring == True
+            )
+        ).all():
+            self.blocks.setdefault(block.counselor_id, []).append(block)
+
+        start, end = day_range(self.first_day, self.last_day)
+        appointment_query = db.session.query(
+            AppointmentRequest.id,
+            AppointmentRequest.counselor_id,
+            AppointmentRequest.scheduled_date,
+            AppointmentRequest.duration
+        ).filter(
+            AppointmentRequest.counselor_id.in_(self.counselor_ids),
+            datetime_range_filter(AppointmentRequest.scheduled_date, start, end),
+            AppointmentRequest.status.in_(BUSY_APPOINTMENT_STATUSES)
+        )
+        if exclude_appointment_ids:
+            appointment_query = appointment_query.filter(~AppointmentRequest.id.in_(list(exclude_appointment_ids)))
+        for row in appointment_query.all():
+            self.appointments.setdefault(row.counselor_id, []).append(
+                (row.scheduled_date, row.scheduled_date + timedelta(minutes=row.duration or 60))
+            )
+
+    def working_hours(self, counselor_id, day):
+        """Availability settings for a day as a dict, or None if the counselor is off."""
+        setting = self.availability.get((counselor_id, day.strftime('%A').lower()))
+        if setting is None:
+            return dict(DEFAULT_WORKING_HOURS)
+        if not setting.is_available:
+            return None
+        return {
+            'start_time': setting.start_time,
+            'end_time': setting.end_time,
+            'lunch_start': setting.lunch_start,
+            'lunch_end': setting.lunch_end,
+            'session_duration': setting.session_duration or DEFAULT_WORKING_HOURS['session_duration'],
+            'buffer_time': setting.buffer_time or 0
+        }
+
+    def _block_applies(self, block, day):
+        if block.block_date == day:
+            return True
+        if not block.is_recurring or block.block_date > day:
+            return False
+        pattern = (block.recurrence_pattern or 'weekly').lower()
+        if pattern == 'daily':
+            return True
+        if pattern == 'weekly':
+            return block.block_date.weekday() == day.weekday()
+        return False
+
+    def day_schedule(self, counselor_id, day):
+        """Return (hours, busy, free) for a counselor's day; busy and free are merged interval lists."""
+        key = (counselor_id, day)
+        if key in self._day_cache:
+            return self._day_cache[key]
+
+        hours = self.working_hours(counselor_id, day)
+        if hours is None:
+            result = (None, [], [])
+        else:
+            buffer = timedelta(minutes=hours['buffer_time'])
+            busy = []
+
+            if hours['lunch_start'] and hours['lunch_end']:
+                busy.append((datetime.combine(day, hours['lunch_start']), datetime.combine(day, hours['lunch_end'])))
+
+            for block in self.blocks.get(counselor_id, ()):
+                if self._block_applies(block, day):
+                    busy.append((datetime.combine(day, block.start_time), datetime.combine(day, block.end_time)))
+
+            day_start, day_end = day_range(day)
+            for start, end in self.appointments.get(counselor_id, ()):
+                if start < day_end and end > day_start:
+                    busy.append((start - buffer, end + buffer))
+
+            busy = merge_intervals(busy)
+            window = (datetime.combine(day, hours['start_time']), datetime.combine(day, hours['end_time']))
+            result = (hours, busy, subtract_intervals(window, busy))
+
+        self._day_cache[key] = result
+        return result
+
+    def free_slots(self, counselor_id, day, duration=None, step=SLOT_STEP_MINUTES, not_before=None):
+        """Start datetimes on the slot grid where a session of `duration` minutes fits."""
+        hours, busy, free = self.day_schedule(counselor_id, day)
+        if hours is None:
+            return []
+
+        length = timedelta(minutes=duration or hours['session_duration'])
+        step_delta = timedelta(minutes=step)
+        grid_origin = datetime.combine(day, hours['start_time'])
+
+        slots = []
+        for start, end in free:
+            if not_before and start < not_before:
+                start = not_before
+            offset = (start - grid_origin) % step_delta
+            candidate = start if not offset else start + (step_delta - offset)
+            while candidate + length <= end:
+                slots.append(candidate)
+                candidate += step_delta
+        return slots
+
+    def conflict(self, counselor_id, start, duration=None):
+        """Return a human readable reason the session cannot be booked, or None if it fits."""
+        day = start.date()
+        hours, busy, free = self.day_schedule(counselor_id, day)
+        if hours is None:
+            return f"Counselor not available on {start.strftime('%A')}s"
+
+        end = start + timedelta(minutes=duration or hours['session_duration'])
+        if start < datetime.combine(day, hours['start_time']) or end > datetime.combine(day, hours['end_time']):
+            return "Outside counselor's working hours"
+
+        index = bisect.bisect_right(free, (start, datetime.max)) - 1
+        if index >= 0 and free[index][0] <= start and end <= free[index][1]:
+            return None
+
+        if hours['lunch_start'] and hours['lunch_end'] and \
+                start < datetime.combine(day, hours['lunch_end']) and end > datetime.combine(day, hours['lunch_start']):
+            return 'Conflicts with lunch break'
+        buffer = timedelta(minutes=hours['buffer_time'])
+        for apt_start, apt_end in self.appointments.get(counselor_id, ()):
+            if start < apt_end + buffer and end > apt_start - buffer:
+                return f'Conflicts with existing appointment at {apt_start.strftime("%H:%M")}'
+        return 'Conflicts with blocked time'
+
+    def is_free(self, counselor_id, start, duration=None):
+        return self.conflict(counselor_id, start, duration) is None
+
+    def merged_slots(self, day, duration=None, step=SLOT_STEP_MINUTES, not_before=None):
+        """Slot times (as HH:MM strings) where at least one of the engine's counselors is free."""
+        times = set()
+        for counselor_id in self.counselor_ids:
+            times.update(self.free_slots(counselor_id, day, duration, step, not_before))
+        return [slot.strftime('%H:%M') for slot in sorted(times)]
+
+
+def active_counselor_ids():
+    return [row.id for row in db.session.query(Counselor.id).filter(Counselor.is_active == True).all()]
+
+
+def get_counselor_workloads(counselor_ids, target_date=None):
+    """Upcoming (and optionally per-day) booked session counts for many counselors in one query."""
+    counts = {counselor_id: {'upcoming': 0, 'on_date': 0} for counselor_id in counselor_ids}
+    if not counselor_ids:
+        return counts
+
+    columns = [
+        AppointmentRequest.counselor_id,
+        func.sum(case((AppointmentRequest.scheduled_date >= datetime.now(), 1), else_=0))
+    ]
+    if target_date:
+        day_start, day_end = day_range(target_date)
+        columns.append(func.sum(case((datetime_range_filter(AppointmentRequest.scheduled_date, day_start, day_end), 1), else_=0)))
+
+    rows = db.session.query(*columns).filter(
+        AppointmentRequest.counselor_id.in_(counselor_ids),
+        AppointmentRequest.status.in_(['scheduled', 'assigned'])
+    ).group_by(AppointmentRequest.counselor_id).all()
+
+    for row in rows:
+        counts[row[0]] = {'upcoming': row[1] or 0, 'on_date': (row[2] or 0) if target_date else 0}
+    return counts
+
+
+def build_availability_matrix(first_day, days=7, duration=None, counselor_ids=None):
+    """Free slots for every active counselor over `days` days, in a fixed number of queries.
+
+    Returns {'counselors': [...], 'days': {'YYYY-MM-DD': {'HH:MM': [counselor_id, ...]}}}.
+    """
+    counselor_query = Counselor.query.filter(Counselor.is_active == True)
+    if counselor_ids:
+        counselor_query = counselor_query.filter(Counselor.id.in_(counselor_ids))
+    counselors = counselor_query.order_by(Counselor.first_name, Counselor.last_name).all()
+    ids = [counselor.id for counselor in counselors]
+
+    last_day = first_day + timedelta(days=days - 1)
+    engine = AvailabilityEngine(ids, first_day, last_day)
+    workloads = get_counselor_workloads(ids)
+    not_before = datetime.now()
+
+    matrix = {}
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        slots = {}
+        for counselor_id in ids:
+            for slot in engine.free_slots(counselor_id, day, duration, not_before=not_before):
+                slots.setdefault(slot.strftime('%H:%M'), []).append(counselor_id)
+        matrix[day.isoformat()] = dict(sorted(slots.items()))
+
+    return {
+        'counselors': [{
+            'id': counselor.id,
+            'name': counselor.get_full_name(),
+            'specialization': counselor.specialization or 'General Counseling',
+            'workload': workloads[counselor.id]['upcoming']
+        } for counselor in counselors],
+        'days': matrix
+    }
+
+
 # =============================================================================
 # SCHEDULE UTILITY FUNCTIONS
 # =============================================================================
@@ -14869,75 +18387,14 @@ def get_counselor_availability(counselor_id, day_of_week):
 def check_counselor_conflicts(counselor_id, appointment_datetime, duration, exclude_appointment_id=None):
     """Enhanced conflict checking for counselor schedule"""
     try:
-        appointment_date = appointment_datetime.date()
-        appointment_time = appointment_datetime.time()
-        appointment_end = (appointment_datetime + timedelta(minutes=duration)).time()
-        
-        # Check for appointment conflicts
-        conflict_query = AppointmentRequest.query.filter(
-            AppointmentRequest.counselor_id == counselor_id,
-            func.date(AppointmentRequest.scheduled_date) == appointment_date,
-            AppointmentRequest.status.in_(['scheduled', 'assigned', 'blocked'])
+        engine = AvailabilityEngine(
+            [counselor_id],
+            appointment_datetime.date(),
+            exclude_appointment_ids=[exclude_appointment_id] if exclude_appointment_id else None
         )
-        
-        if exclude_appointment_id:
-            conflict_query = conflict_query.filter(AppointmentRequest.id != exclude_appointment_id)
-        
-        existing_appointments = conflict_query.all()
-        
-        for existing in existing_appointments:
-            if existing.scheduled_date:
-                existing_start = existing.scheduled_date.time()
-                existing_end = (existing.scheduled_date + timedelta(minutes=existing.duration or 60)).time()
-                
-                # Check for time overlap
-                if (appointment_time < existing_end and appointment_end > existing_start):
-                    return {
-                        'conflict': True,
-                        'message': f'Conflicts with existing appointment at {existing_start.strftime("%H:%M")}'
-                    }
-        
-        # Check for blocked time conflicts
-        day_of_week = appointment_datetime.strftime('%A').lower()
-        blocked_times = CounselorScheduleBlock.query.filter(
-            CounselorScheduleBlock.counselor_id == counselor_id,
-            CounselorScheduleBlock.block_date == appointment_date
-        ).all()
-        
-        for block in blocked_times:
-            if (appointment_time < block.end_time and appointment_end > block.start_time):
-                return {
-                    'conflict': True,
-                    'message': f'Conflicts with blocked time: {block.reason}'
-                }
-        
-        # Check availability settings
-        availability = get_counselor_availability(counselor_id, day_of_week)
-        if not availability['available']:
-            return {
-                'conflict': True,
-                'message': f'Counselor not available on {day_of_week.title()}s'
-            }
-        
-        # Check if within working hours
-        if (appointment_time < availability['start_time'] or 
-            appointment_end > availability['end_time']):
-            return {
-                'conflict': True,
-                'message': 'Outside counselor\'s working hours'
-            }
-        
-        # Check lunch break
-        if (availability.get('lunch_start') and availability.get('lunch_end')):
-            lunch_start = availability['lunch_start']
-            lunch_end = availability['lunch_end']
-            
-            if (appointment_time < lunch_end and appointment_end > lunch_start):
-                return {
-                    'conflict': True,
-                    'message': 'Conflicts with lunch break'
-                }
-        
+        reason = engine.conflict(counselor_id, appointment_datetime, duration)
+        if reason:
+            return {'conflict': True, 'message': reason}
         return {'conflict': False}
         
     except Exception as e:
@@ -14950,35 +18407,8 @@ def check_counselor_conflicts(counselor_id, appointment_datetime, duration, excl
 def get_available_time_slots(counselor_id, target_date, duration=60):
     """Get all available time slots for a counselor on a specific date"""
     try:
-        day_of_week = target_date.strftime('%A').lower()
-        
-        # Get availability settings
-        availability = get_counselor_availability(counselor_id, day_of_week)
-        if not availability['available']:
-            return []
-        
-        # Generate potential time slots
-        available_slots = []
-        current_time = datetime.combine(target_date, availability['start_time'])
-        end_time = datetime.combine(target_date, availability['end_time'])
-        slot_duration = timedelta(minutes=30)  # 30-minute intervals
-        
-        while current_time + timedelta(minutes=duration) <= end_time:
-            slot_end = current_time + timedelta(minutes=duration)
-            
-            # Check for conflicts
-            conflict_check = check_counselor_conflicts(
-                counselor_id, 
-                current_time, 
-                duration
-            )
-            
-            if not conflict_check['conflict']:
-                available_slots.append(current_time.time())
-            
-            current_time += slot_duration
-        
-        return available_slots
+        engine = AvailabilityEngine([counselor_id], target_date)
+        return [slot.time() for slot in engine.free_slots(counselor_id, target_date, duration)]
         
     except Exception as e:
         app.logger.error(f"Error getting available time slots: {str(e)}")
@@ -0,0 +1,115 @@
+// =============================================================================
+// REAL-TIME UPDATES (server-sent events from /api/events/stream)
+// =============================================================================
+//
+// MindConnectEvents.subscribe(['appointment.'], handler, { fallback, interval })
+// calls handler(eventType, data, events) when matching events arrive. Types ending
+// in '.' match by prefix. A burst is coalesced into one call (with the latest
+// event, plus the whole burst as `events`) after a short debounce. When the
+// browser has no EventSource support, `fallback` is polled every `interval` ms
+// instead, which is the behaviour the pages had before.
+
+(function () {
+    const subscriptions = [];
+    const boundTypes = new Set();
+    let source = null;
+
+    function matches(pattern, eventType) {
+        return pattern.endsWith('.') ? eventType.startsWith(pattern) : pattern === eventType;
+    }
+
+    function dispatch(eventType, data) {
+        subscriptions.forEach(subscription => {
+            if (eventType === 'resync' || subscription.types.some(type => matches(type, eventType))) {
+                subscription.notify(eventType, data);
+            }
+        });
+    }
+
+    function bindType(eventType) {
+        if (!source || boundTypes.has(eventType)) {
+            return;
+        }
+        boundTypes.add(eventType);
+        source.addEventListener(eventType, function (message) {
+            let data = {};
+            try {
+                data = JSON.parse(message.data);
+            } catch (error) {
+                console.error('Bad event payload:', error);
+            }
+            dispatch(eventType, data);
+        });
+    }
+
+    // EventSource only delivers named events to listeners for that exact name,
+    // so every concrete type the server sends is bound up front.
+    const KNOWN_TYPES = [
+        'appointment.created', 'appointment.updated', 'appointment.deleted',
+        'forum.post_created', 'forum.post_updated', 'forum.post_deleted',
+        'forum.reply_created', 'forum.reply_updated', 'forum.reply_deleted',
+        'assessment.submitted', 'resync'
+    ];
+
+    function connect() {
+        if (source || !window.EventSource) {
+            return;
+        }
+        source = new EventSource('/api/events/stream');
+        KNOWN_TYPES.forEach(bindType);
+    }
+
+    function subscribe(types, handler, options = {}) {
+        const debounceMs = options.debounce === undefined ? 1000 : options.debounce;
+        let timer = null;
+        let pending = [];
+
+        const subscription = {
+            types: types,
+            notify: function (eventType, data) {
+                pending.push({ type: eventType, data: data });
+                if (timer) {
+                    return;
+                }
+                timer = setTimeout(() => {
+                    const events = pending;
+                    pending = [];
+                    timer = null;
+                    const last = events[events.length - 1];
+                    handler(last.type, last.data, events);
+                }, debounceMs);
+            }
+        };
+
+        if (!window.EventSource) {
+            if (options.fallback) {
+                return { interval: setInterval(options.fallback, options.interval || 60000) };
+            }
+            return null;
+        }
+
+        subscriptions.push(subscription);
+        connect();
+        return subscription;
+    }
+
+    function unsubscribe(subscription) {
+        if (!subscription) {
+            return;
+        }
+        if (subscription.interval) {
+            clearInterval(subscription.interval);
+            return;
+        }
+        const index = subscriptions.indexOf(subscription);
+        if (index !== -1) {
+            subscriptions.splice(index, 1);
+        }
+    }
+
+    window.MindConnectEvents = {
+        supported: !!window.EventSource,
+        subscribe: subscribe,
+        unsubscribe: unsubscribe
+    };
+})();
@@ -4442,10 +4442,21 @@ class AppointmentManager {
     // ==========================================================================
 
     setupAutoRefresh() {
-        // Check for updates every 30 seconds
-        this.autoRefreshInterval = setInterval(async () => {
-            await this.checkForUpdates();
-        }, 30000);
+        if (this.autoRefreshInterval) {
+            return;
+        }
+
+        if (window.MindConnectEvents && MindConnectEvents.supported) {
+            // Appointment changes are pushed over SSE, so there is nothing to poll
+            this.autoRefreshInterval = MindConnectEvents.subscribe(['appointment.'], () => {
+                this.showUpdateNotification();
+            });
+        } else {
+            // Check for updates every 30 seconds
+            this.autoRefreshInterval = setInterval(async () => {
+                await this.checkForUpdates();
+            }, 30000);
+        }
         
         // Stop auto-refresh when page is hidden
         document.addEventListener('visibilitychange', () => {
@@ -4461,7 +4472,11 @@ class AppointmentManager {
 
     stopAutoRefresh() {
         if (this.autoRefreshInterval) {
-            clearInterval(this.autoRefreshInterval);
+            if (window.MindConnectEvents && MindConnectEvents.supported) {
+                MindConnectEvents.unsubscribe(this.autoRefreshInterval);
+            } else {
+                clearInterval(this.autoRefreshInterval);
+            }
             this.autoRefreshInterval = null;
         }
     }
@@ -6152,8 +6167,13 @@ function showFlaggedOnly() {
 // =============================================================================
 
 function setupAutoRefresh() {
-    // Check for updates every 30 seconds
-    autoRefreshInterval = setInterval(checkForUpdates, 30000);
+    if (window.MindConnectEvents && MindConnectEvents.supported) {
+        // Forum activity is pushed over SSE, so there is nothing to poll
+        autoRefreshInterval = MindConnectEvents.subscribe(['forum.'], showUpdateNotification);
+    } else {
+        // Check for updates every 30 seconds
+        autoRefreshInterval = setInterval(checkForUpdates, 30000);
+    }
 }
 
 function checkForUpdates() {